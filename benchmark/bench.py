@@ -0,0 +1,460 @@
+"""Benchmark scraperu nad lokálním fixture e-shopem.
+
+Lokální náhradní server skládá e-shop ze šablon v benchmark/fixtures
+(Shoptet, WooCommerce, PrestaShop, Shopify - výpis kategorie, dlaždice,
+detail) s nastavitelnou latencí a odpověďmi 429. Na každou platformu se
+scraper.py pustí v samostatném procesu a vypíše se: stránky/s, produkty/s,
+CPU na stránku, špičkové RSS a časy vybraných funkcí.
+
+Použití:
+    python benchmark/bench.py
+    python benchmark/bench.py --platform shoptet --latency 0.05 --throttle 20
+    python benchmark/bench.py --set CONCURRENT_WORKERS=8 --set PARSE_WORKERS=2
+    python benchmark/bench.py --save pred.json      # ... změna scraperu ...
+    python benchmark/bench.py --baseline pred.json  # porovnání v %
+    python benchmark/bench.py --case listing        # výchozí běh vs. záznamy z výpisů
+    python benchmark/bench.py --serve woocommerce --port 8800   # jen server
+"""
+
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from string import Template
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+FIXTURES = os.path.join(HERE, 'fixtures')
+SCRAPER = os.path.join(HERE, os.pardir, 'scraper.py')
+
+# Hranice v scraper.py - přepisy konfigurace se vkládají před známé kategorie,
+# měření začíná hlavní částí
+CONFIG_END = '# Známé kategorie'
+MAIN_MARKER = '# ===========================================================================\n# HLAVNÍ SCRAPING'
+
+# Měřené funkce scraperu (časy včetně vnořených volání)
+TIMED_FUNCTIONS = ['get_page', 'fetch_page', 'find_product_links',
+                   'extract_product_data', 'parse_product', 'clean_price']
+
+CATEGORIES = ['proteiny', 'vitaminy', 'kreatin', 'tycinky', 'gainery',
+              'aminokyseliny', 'napoje', 'superfood', 'obleceni', 'doplnky']
+
+# Tvar URL a stránkování podle platformy
+PLATFORMS = {
+    'shoptet': {
+        'category': '/{category}/',
+        'page': '/{category}/strana-{page}/',
+        'product': '/{slug}/',
+        'page_link': '<a href="{url}">{page}</a>',
+    },
+    'woocommerce': {
+        'category': '/kategorie-produktu/{category}/',
+        'page': '/kategorie-produktu/{category}/page/{page}/',
+        'product': '/produkt/{slug}/',
+        'page_link': '<li><a class="page-numbers" href="{url}">{page}</a></li>',
+    },
+    'prestashop': {
+        'category': '/{cid}-{category}',
+        'page': '/{cid}-{category}?page={page}',
+        'product': '/{category}/{id}-{slug}.html',
+        'page_link': '<li><a rel="nofollow" href="{url}" class="js-search-link">{page}</a></li>',
+    },
+    'shopify': {
+        'category': '/collections/{category}',
+        'page': '/collections/{category}?page={page}',
+        'product': '/products/{slug}',
+        'page_link': '<li><a href="{url}" class="pagination__item link">{page}</a></li>',
+    },
+}
+
+# Výchozí přepisy konfigurace - tempo omezuje jen server, výstupy do dočasné složky
+DEFAULT_OVERRIDES = {
+    'DELAY_MIN': 0.0,
+    'DELAY_MAX': 0.0,
+    'RATE_START': 1000.0,
+    'RATE_MAX': 1000.0,
+    'DISCOVERY_MODE': 'crawl',
+    'PLATFORM_API': False,
+}
+
+# Pojmenované varianty (--case) - každá se na platformě pustí vedle výchozího
+# běhu, v přehledu se porovnají i počty požadavků na server
+CASES = {
+    # Záznamy z dlaždic výpisu - EAN v dlaždici má jen Shoptet
+    'listing': {'LISTING_EXTRACTION': True},
+    # Bez EAN v povinných polích odpadnou detaily na všech platformách
+    'listing-bez-ean': {'LISTING_EXTRACTION': True, 'LISTING_REQUIRED_FIELDS': ['nazev', 'cena']},
+}
+
+FILLER = ('Kvalitní doplněk stravy pro sportovce i aktivní lidi. Obsahuje pečlivě '
+          'vybrané suroviny, neobsahuje přidaný cukr a je vhodný pro každodenní užívání. ')
+
+# ===========================================================================
+# FIXTURE E-SHOP
+# ===========================================================================
+
+def fixture_ean(slug):
+    """Stabilní 13místný EAN podle slugu"""
+    return str(int(hashlib.md5(slug.encode()).hexdigest()[:12], 16) % 10**12).rjust(12, '0') + '5'
+
+def filler(size):
+    """Odstavce textu zhruba o velikosti size bajtů (váha reálné stránky)"""
+    paragraphs = []
+    total = 0
+    while total < size:
+        paragraph = f'<p>{FILLER * 4}</p>'
+        paragraphs.append(paragraph)
+        total += len(paragraph.encode())
+    return '\n'.join(paragraphs)
+
+class FixtureShop:
+    """Všechny stránky jednoho fixture e-shopu, vyrenderované předem (URL -> bajty)"""
+
+    def __init__(self, platform, categories=4, per_category=40, per_page=12, page_kb=40):
+        self.platform = platform
+        self.scheme = PLATFORMS[platform]
+        self.templates = {}
+        for name in ('listing', 'tile', 'detail'):
+            with open(os.path.join(FIXTURES, platform, f'{name}.html'), encoding='utf-8') as f:
+                self.templates[name] = Template(f.read())
+        self.padding = filler(page_kb * 1024)
+        self.pages = {}
+        self.products = []
+
+        names = CATEGORIES[:categories]
+        category_urls = [self.url('category', category=c, cid=i + 3) for i, c in enumerate(names)]
+        self.nav = ''.join(f'<a href="{url}">{c.title()}</a>' for url, c in zip(category_urls, names))
+
+        self.pages['/'] = self.render('listing', title='Fixture Shop', tiles='', pagination='')
+        product_id = 100
+        for cid, (category, category_url) in enumerate(zip(names, category_urls), 3):
+            items = []
+            for i in range(per_category):
+                slug = f'{category}-produkt-{i:03d}'
+                items.append(self.product(slug, category, product_id, i))
+                product_id += 1
+            pages = [items[k:k + per_page] for k in range(0, len(items), per_page)]
+            page_urls = [category_url] + [self.url('page', category=category, cid=cid, page=n)
+                                          for n in range(2, len(pages) + 1)]
+            pagination = ''.join(self.scheme['page_link'].format(url=url, page=n)
+                                 for n, url in enumerate(page_urls, 1))
+            for url, tiles in zip(page_urls, pages):
+                self.pages[url] = self.render(
+                    'listing', title=category.title(), pagination=pagination,
+                    tiles='\n'.join(self.templates['tile'].safe_substitute(item) for item in tiles))
+
+        self.pages['/robots.txt'] = b'User-agent: *\nDisallow: /kosik/\nSitemap: {base}/sitemap.xml\n'
+        self.pages['/sitemap.xml'] = (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + ''.join(f'<url><loc>{{base}}{p["url"]}</loc></url>' for p in self.products)
+            + '</urlset>').encode()
+
+    def url(self, kind, **values):
+        return self.scheme[kind].format(**values)
+
+    def product(self, slug, category, product_id, i):
+        """Zaregistruje detail produktu; vrací hodnoty pro šablony"""
+        price = 199 + (product_id * 37) % 1800
+        item = {
+            'id': product_id,
+            'slug': slug,
+            'category': category,
+            'url': self.url('product', slug=slug, category=category, id=product_id),
+            'name': slug.replace('-', ' ').title(),
+            'ean': fixture_ean(slug),
+            'sku': f'FX-{product_id:05d}',
+            'price': f'{price:,}'.replace(',', ' '),
+            'price_decimal': f'{price}.00',
+            'old_price': f'{int(price * 1.2):,}'.replace(',', ' '),
+            'availability': 'Skladem' if i % 4 else 'Na objednávku',
+        }
+        self.products.append(item)
+        self.pages[item['url']] = self.render('detail', **item)
+        return item
+
+    def render(self, template, **values):
+        values = dict(values, nav=self.nav, padding=self.padding)
+        return self.templates[template].safe_substitute(values).encode('utf-8')
+
+class ShopHandler(BaseHTTPRequestHandler):
+    """Obsluha fixture e-shopu - latence a každý N-tý požadavek 429"""
+
+    protocol_version = 'HTTP/1.1'
+    # Hlavička a tělo jdou zvlášť - s Nagle by keep-alive čekal na zpožděné ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        if server.latency:
+            time.sleep(server.latency)
+        with server.lock:
+            server.requests += 1
+            throttled = server.throttle and server.requests % server.throttle == 0
+        if throttled:
+            server.throttled += 1
+            self.send_response(429)
+            self.send_header('Retry-After', str(server.retry_after))
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        body = server.shop.pages.get(self.path)
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        content_type = 'text/html; charset=utf-8'
+        if self.path in ('/sitemap.xml', '/robots.txt'):
+            # Absolutní URL podle adresy, na které server právě běží
+            body = body.replace(b'{base}', f'http://{self.headers["Host"]}'.encode())
+            content_type = 'application/xml' if self.path == '/sitemap.xml' else 'text/plain'
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def start_server(shop, port=0, latency=0.0, throttle=0, retry_after=1):
+    """Spustí server ve vlákně na pozadí; vrací server (adresa v server_address)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), ShopHandler)
+    server.daemon_threads = True
+    server.shop = shop
+    server.latency = latency
+    server.throttle = throttle
+    server.retry_after = retry_after
+    server.lock = threading.Lock()
+    server.requests = 0
+    server.throttled = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# ===========================================================================
+# BĚH SCRAPERU (v samostatném procesu)
+# ===========================================================================
+
+def timed(name, func, timings, lock):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - started
+            with lock:
+                entry = timings[name]
+                entry[0] += 1
+                entry[1] += elapsed
+    return wrapper
+
+def cpu_seconds():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+def run_scraper(url, overrides, verbose=False):
+    """Spustí scraper.py proti url a změří ho; vrací slovník metrik.
+
+    Scraper se spouští jako skutečný __main__ (kvůli pickle v procesovém
+    poolu PARSE_WORKERS), proto má každý běh vlastní proces.
+    """
+    with open(SCRAPER, encoding='utf-8') as f:
+        source = f.read()
+    settings = ''.join(f'{name} = {value!r}\n' for name, value in overrides.items())
+    source = source.replace(CONFIG_END, settings + CONFIG_END, 1)
+    split = source.index(MAIN_MARKER)
+    definitions = source[:split]
+    # Zachovat čísla řádků v tracebacku hlavní části
+    main = '\n' * definitions.count('\n') + source[split:]
+
+    module = types.ModuleType('__main__')
+    module.__file__ = SCRAPER
+    module.URL_WEBU = url
+    sys.modules['__main__'] = module
+    namespace = module.__dict__
+    output = contextlib.nullcontext() if verbose else contextlib.redirect_stdout(open(os.devnull, 'w'))
+
+    with output:
+        exec(compile(definitions, SCRAPER, 'exec'), namespace)
+        timings = {name: [0, 0.0] for name in TIMED_FUNCTIONS if name in namespace}
+        lock = threading.Lock()
+        for name in timings:
+            namespace[name] = timed(name, namespace[name], timings, lock)
+
+        cpu_start = cpu_seconds()
+        started = time.perf_counter()
+        exec(compile(main, SCRAPER, 'exec'), namespace)
+        wall = time.perf_counter() - started
+        cpu = cpu_seconds() - cpu_start
+
+    pages = timings.get('fetch_page', [0])[0]
+    products = len(namespace['products_data'])
+    peak_kb = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+                  resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    return {
+        'pages': pages,
+        'products': products,
+        'seconds': wall,
+        'pages_per_s': pages / wall if wall else 0.0,
+        'products_per_s': products / wall if wall else 0.0,
+        'cpu_ms_per_page': cpu * 1000 / pages if pages else 0.0,
+        'peak_rss_mb': peak_kb / 1024,
+        'functions': {name: {'calls': calls, 'seconds': total}
+                      for name, (calls, total) in timings.items()},
+    }
+
+def child_main(job):
+    """Vstup podprocesu - výsledek zapíše do job['result'] jako JSON"""
+    result = run_scraper(job['url'], job['overrides'], job.get('verbose'))
+    with open(job['result'], 'w') as f:
+        json.dump(result, f)
+
+def run_platform(platform, args, overrides):
+    shop = FixtureShop(platform, args.categories, args.products, args.per_page, args.page_kb)
+    server = start_server(shop, 0, args.latency, args.throttle, args.retry_after)
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    with tempfile.TemporaryDirectory() as workdir:
+        job = {
+            'url': url,
+            'overrides': dict(overrides,
+                              OUTPUT_PATH=os.path.join(workdir, 'vystup'),
+                              PROGRESS_EXCEL=os.path.join(workdir, 'vystup.xlsx')),
+            'result': os.path.join(workdir, 'result.json'),
+            'verbose': args.verbose,
+        }
+        try:
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--child', json.dumps(job)],
+                           check=True)
+            with open(job['result']) as f:
+                result = json.load(f)
+        finally:
+            server.shutdown()
+            server.server_close()
+    result['expected_products'] = len(shop.products)
+    result['requests'] = server.requests
+    result['throttled'] = server.throttled
+    return result
+
+# ===========================================================================
+# VÝSTUP
+# ===========================================================================
+
+SUMMARY_COLUMNS = [
+    # (klíč, nadpis, formát, vyšší = lepší)
+    ('pages_per_s', 'stránky/s', '{:9.1f}', True),
+    ('products_per_s', 'produkty/s', '{:10.1f}', True),
+    ('cpu_ms_per_page', 'CPU ms/str', '{:10.2f}', False),
+    ('peak_rss_mb', 'RSS MB', '{:7.1f}', False),
+]
+
+def print_report(results, baseline=None):
+    width = max([12] + [len(name) for name in results])
+    print('=' * 78)
+    print(f"{'platforma':<{width}} {'produkty':>9} {'stránky':>8} {'požadavky':>9} {'čas s':>7} "
+          + ' '.join(title for _, title, _, _ in SUMMARY_COLUMNS))
+    print('-' * 78)
+    for platform, r in results.items():
+        cells = [fmt.format(r[key]) for key, _, fmt, _ in SUMMARY_COLUMNS]
+        found = f"{r['products']}/{r['expected_products']}"
+        print(f"{platform:<{width}} {found:>9} {r['pages']:>8} {r['requests']:>9} {r['seconds']:>7.2f} "
+              + ' '.join(cells))
+        if r['throttled']:
+            print(f"{'':<{width}} 429 odpovědí: {r['throttled']} z {r['requests']} požadavků")
+        if baseline and platform in baseline:
+            deltas = []
+            for key, title, _, higher_better in SUMMARY_COLUMNS:
+                old = baseline[platform][key]
+                if old:
+                    change = (r[key] - old) / old * 100
+                    better = (change > 0) == higher_better
+                    deltas.append(f"{title} {change:+.1f} % {'✅' if better or not change else '⚠️'}")
+            print(f"{'':<{width}} vs. baseline: " + ', '.join(deltas))
+    print('=' * 78)
+
+    print(f"{'funkce':<22} " + ' '.join(f'{p[:12]:>20}' for p in results))
+    print(f"{'':<22} " + ' '.join(f"{'volání':>7} {'ms/volání':>12}" for _ in results))
+    for name in TIMED_FUNCTIONS:
+        cells = []
+        for r in results.values():
+            calls, seconds = r['functions'].get(name, {}).get('calls', 0), r['functions'].get(name, {}).get('seconds', 0.0)
+            cells.append(f"{calls:>7} {seconds * 1000 / calls if calls else 0:>12.3f}")
+        print(f"{name:<22} " + ' '.join(cells))
+    print('=' * 78)
+
+def parse_override(text):
+    name, _, value = text.partition('=')
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass  # Ponechat jako řetězec
+    return name.strip(), value
+
+def main():
+    if len(sys.argv) == 3 and sys.argv[1] == '--child':
+        child_main(json.loads(sys.argv[2]))
+        return
+
+    parser = argparse.ArgumentParser(description='Benchmark scraperu nad fixture e-shopem')
+    parser.add_argument('--platform', action='append', choices=list(PLATFORMS),
+                        help='platforma (opakovatelné); výchozí všechny')
+    parser.add_argument('--categories', type=int, default=4)
+    parser.add_argument('--products', type=int, default=40, help='produktů na kategorii')
+    parser.add_argument('--per-page', type=int, default=12, help='produktů na stránku výpisu')
+    parser.add_argument('--page-kb', type=int, default=40, help='přibližná váha stránky')
+    parser.add_argument('--latency', type=float, default=0.0, help='latence serveru (s)')
+    parser.add_argument('--throttle', type=int, default=0, help='každý N-tý požadavek 429')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After u 429 (s)')
+    parser.add_argument('--set', action='append', default=[], metavar='NAZEV=HODNOTA',
+                        help='přepis konfigurace scraperu, hodnota jako JSON')
+    parser.add_argument('--case', action='append', choices=list(CASES), default=[],
+                        help='pustit i pojmenovanou variantu a porovnat (opakovatelné)')
+    parser.add_argument('--save', help='uložit výsledky do JSON')
+    parser.add_argument('--baseline', help='porovnat s dříve uloženými výsledky')
+    parser.add_argument('--verbose', action='store_true', help='zobrazit výstup scraperu')
+    parser.add_argument('--serve', choices=list(PLATFORMS), help='jen spustit fixture server')
+    parser.add_argument('--port', type=int, default=8800)
+    args = parser.parse_args()
+
+    if args.serve:
+        shop = FixtureShop(args.serve, args.categories, args.products, args.per_page, args.page_kb)
+        server = start_server(shop, args.port, args.latency, args.throttle, args.retry_after)
+        print(f'🛒 {args.serve}: http://127.0.0.1:{args.port} ({len(shop.products)} produktů), Ctrl+C = konec')
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            server.shutdown()
+        return
+
+    overrides = dict(DEFAULT_OVERRIDES)
+    overrides.update(parse_override(item) for item in args.set)
+    results = {}
+    for platform in args.platform or list(PLATFORMS):
+        print(f'⏱️ {platform}...', flush=True)
+        results[platform] = run_platform(platform, args, overrides)
+        for case in args.case:
+            print(f'⏱️ {platform}/{case}...', flush=True)
+            results[f'{platform}/{case}'] = run_platform(platform, args, dict(overrides, **CASES[case]))
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+    print_report(results, baseline)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'settings': vars(args), 'overrides': overrides, 'results': results}, f, indent=2)
+        print(f'💾 Uloženo: {args.save}')
+
+if __name__ == '__main__':
+    main()
@@ -10,12 +10,15 @@
 #   3. Buňka 3: Zkopírujte tento celý soubor
 #   4. Buňka 4: Stažení výsledků
 #   5. Buňka 5: Reset pro nový web
+#   6. Buňka 6: Mikrobenchmark klasifikace URL (volitelné)
+#   7. Buňka 7: Dávka více e-shopů najednou (volitelné)
+#   8. Buňka 8: Změny cen od minulého běhu (volitelné)
 # =============================================================================
 
 # =============================================================================
 # BUŇKA 1: INSTALACE (spusťte jednou)
 # =============================================================================
-# !pip install requests beautifulsoup4 pandas openpyxl lxml -q
+# !pip install requests beautifulsoup4 pandas openpyxl lxml numpy -q
 # print("✅ Instalace dokončena")
 
 # =============================================================================
@@ -28,16 +31,48 @@
 # =============================================================================
 
 import requests
-from bs4 import BeautifulSoup
-import pandas as pd
+from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning, XMLParsedAsHTMLWarning
+import soupsieve as sv
 import re
 import time
 import json
 import random
-from urllib.parse import urljoin, urlparse, parse_qs, urlencode
-from datetime import datetime
+import threading
+import sys
+import zlib
+import gzip
+import uuid
+import hashlib
+import hmac
+import sqlite3
+import csv
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, FIRST_COMPLETED, wait, as_completed
+from collections import deque
+import multiprocessing
+import heapq
+import bisect
+import math
+from array import array
+import tempfile
+from urllib.parse import urljoin, urlparse, urlunparse, parse_qs, parse_qsl, urlencode
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from functools import lru_cache, partial
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from contextlib import contextmanager, nullcontext
+from html import unescape
+from http.client import responses as http_reasons
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import types
+import socket
+import linecache
 import warnings
-warnings.filterwarnings('ignore')
+# Jen upozornění BeautifulSoup na stránky, které nejsou HTML (XML, prázdné
+# nebo holá URL) - parsují se záměrně, ostatní varování procesu zůstávají
+warnings.filterwarnings('ignore', category=XMLParsedAsHTMLWarning)
+warnings.filterwarnings('ignore', category=MarkupResemblesLocatorWarning)
 
 # ===========================================================================
 # GLOBÁLNÍ PROMĚNNÉ - přežijí zastavení!
@@ -47,6 +82,16 @@ if 'all_product_urls' not in dir(): all_product_urls = set()
 if 'processed_urls' not in dir(): processed_urls = set()
 if 'visited_pages' not in dir(): visited_pages = set()
 if 'category_urls' not in dir(): category_urls = set()
+if 'site_platform' not in dir(): site_platform = None
+if 'platform_checked' not in dir(): platform_checked = False
+if 'platform_api_used' not in dir(): platform_api_used = None
+if 'url_lastmod' not in dir(): url_lastmod = {}
+if 'pages_to_visit' not in dir(): pages_to_visit = set()
+if 'crawl_state' not in dir(): crawl_state = None
+if 'canonical_forms' not in dir(): canonical_forms = {}   # otisk URL bez lomítka -> první podoba s lomítkem?
+if 'canonical_duplicates' not in dir(): canonical_duplicates = 0
+if 'metrics_server' not in dir(): metrics_server = None
+if 'metrics_dumper' not in dir(): metrics_dumper = None
 
 # ===========================================================================
 # KONFIGURACE
@@ -87,6 +132,149 @@ MAX_PAGES = 1000
 MAX_PRODUCTS = 100000
 MAX_RETRIES = 3
 
+# Objevování produktů - 'auto' = sitemap, bez ní procházení webu (crawler),
+# 'sitemap' = jen sitemap, 'crawl' = jen procházení kategorií jako dřív
+DISCOVERY_MODE = 'auto'
+MAX_SITEMAPS = 500         # Max. zpracovaných sitemap (včetně vnořených v indexu)
+
+# Fronta FÁZE 1 - menší číslo = dřív; stránkování před zanořením do kategorií
+PRIORITY_PAGINATION = 0
+PRIORITY_CATEGORY = 1
+FRONTIER_MEMORY_LIMIT = 50000   # Položek fronty v paměti, zbytek se odkládá do SQLite
+VISITED_MERGE_EVERY = 4096      # Po kolika nových otiscích se index navštívených slévá
+
+# Kanonizace URL - jeden produkt = jedna URL = jedno stažení
+TRACKING_PARAMS = [         # Odstraněné parametry (* = prefix)
+    'utm_*', 'gclid', 'gbraid', 'wbraid', 'dclid', 'fbclid', 'msclkid', 'sznclid',
+    'mc_cid', 'mc_eid', '_ga', '_gl', 'srsltid', 'ref', 'affiliate',
+]
+PRODUCT_IGNORED_PARAMS = [  # Navíc u produktů - varianta má stejnou detailní stránku
+    'variant', 'varianta', 'combination', 'id_product_attribute',
+]
+TRAILING_SLASH = 'auto'     # 'auto' = platí první viděná podoba, 'add' / 'strip' / 'keep'
+USE_REL_CANONICAL = True    # Respektovat <link rel="canonical"> na detailu produktu
+
+# Doplňková pravidla pro rozpoznání URL na konkrétním webu (klíč = doména)
+#   'product_exclude' / 'category_exclude' - další vyloučené podřetězce
+#   'product_pattern' - regex, který musí cesta produktu splňovat
+DOMAIN_URL_RULES = {
+    # 'example.cz': {'product_exclude': ['/akce-'], 'product_pattern': r'-p\d+/?$'},
+}
+URL_CACHE_SIZE = 65536      # Počet zapamatovaných verdiktů klasifikace URL
+
+# Záznamy rovnou z dlaždic výpisu kategorií (FÁZE 1 při procházení webu,
+# v režimu 'auto' se pak sitemap přeskočí); detail se stahuje jen produktům,
+# kterým chybí některé z povinných polí. EAN mají v dlaždicích jen některé
+# šablony (Shoptet v data-micro-identifier) - jinde se bez EAN v povinných
+# polích nic neušetří, pak ho odeberte (záznamy z výpisu zůstanou bez EAN)
+LISTING_EXTRACTION = False
+LISTING_REQUIRED_FIELDS = ['nazev', 'cena', 'ean']
+
+# Strukturovaná data napřed - kompletní JSON-LD / microdata / OpenGraph Product
+# vrátí záznam hned, CSS selektory a regexy se spustí jen pro chybějící pole.
+# Původní cena v nich často chybí - přidejte 'cena_puvodni', pokud potřebujete
+# slevy ze všech webů (pak se selektory spustí i pro ni)
+STRUCTURED_FIRST = True
+STRUCTURED_REQUIRED_FIELDS = ['nazev', 'ean', 'cena', 'dostupnost']
+
+# Katalogová API platforem (Shopify /products.json, WooCommerce Store API) -
+# pokud odpovídají, nahradí procházení webu i stahování detailů; jinak HTML
+PLATFORM_API = True
+API_PAGE_SIZE = 250        # Produktů na požadavek (WooCommerce max. 100)
+API_MAX_PAGES = 2000
+
+# Inkrementální stahování - neměněné stránky (304 / stejný hash / stejný <lastmod>)
+# se neparsují znovu; validátory se pamatují mezi běhy v SQLite souboru
+INCREMENTAL = False
+INCREMENTAL_DB = '/content/eshop_incremental.sqlite'
+TRUST_LASTMOD = True       # Stejný <lastmod> ze sitemap = stránku vůbec nestahovat
+
+# Cache odpovědí na disku - stránky se stáhnou jednou, další běhy je přehrají
+# bez sítě (ladění parseru, benchmarky nad stejným korpusem); None = vypnuto
+RESPONSE_CACHE = None      # Adresář, např. '/content/eshop_cache'
+CACHE_MODE = 'use'         # 'use' = čerstvé z cache, jinak stáhnout a uložit
+                           # 'record' = vždy stáhnout a uložit
+                           # 'replay' = jen z cache, bez sítě (chybějící = chyba)
+CACHE_TTL = 7 * 86400      # Stáří (s), po kterém 'use' stahuje znovu; None = navždy
+CACHE_MAX_BYTES = 2_000_000_000   # Po překročení se mažou nejdéle nepoužité
+CACHE_FORMAT = 'files'     # 'files' = komprimované soubory podle hashe obsahu,
+                           # 'warc' = segmenty .warc.gz (čitelné nástroji pro archivaci webu)
+WARC_SEGMENT_BYTES = 100_000_000
+
+# Metriky běhu - fáze, latence per host, stavové kódy, opakování, úspěšnost
+# selektorů, parsování vs. síť vs. čekání; sbírají se vždy, export volitelně
+METRICS_PORT = None        # Prometheus text na http://localhost:PORT/metrics (+ /metrics.json)
+METRICS_HOST = '127.0.0.1' # Adresa endpointu; '0.0.0.0' = dostupný i z jiných strojů (Prometheus)
+METRICS_JSON = None        # Průběžný JSON výpis, např. '/content/eshop_metrics.json'
+METRICS_INTERVAL = 30      # Jak často (s) se JSON přepisuje
+
+# Trvalý stav crawlu (fronta, navštívené, záznamy) v SQLite - přežije pád i restart
+# kernelu; None = jen globální proměnné v paměti jako dřív
+STATE_DB = None            # např. '/content/eshop_state.sqlite'
+STATE_BATCH = 200          # Počet zápisů na jeden commit
+
+# Průběžný výstup - nové záznamy se připisují do souboru, Excel vznikne jednou
+# na konci; 'jsonl' / 'csv' / 'parquet' (pyarrow), None = celý Excel každých 50
+OUTPUT_FORMAT = 'jsonl'
+OUTPUT_PATH = '/content/eshop_prubezne'    # Přípona podle formátu
+PROGRESS_EXCEL = '/content/eshop_prubezne.xlsx'
+EXCEL_EXPORT = True        # Excel z průběžného výstupu na konci (načte pandas + openpyxl)
+
+# Historie cen a dostupnosti mezi běhy (SQLite) - řádek jen při změně ceny,
+# původní ceny, slevy či dostupnosti; dotazy price_changes() / --changes
+PRICE_HISTORY_DB = None    # např. '/content/eshop_historie.sqlite'
+
+# Stahování stránek proudem - větší stránky se zkrátí, jiný Content-Type než
+# HTML (PDF, obrázky po přesměrování) se nestahuje vůbec
+MAX_PAGE_BYTES = 5_000_000
+DOWNLOAD_CHUNK = 65536
+# Předčasný konec detailu po kompletním JSON-LD Product (šetří přenos u
+# těžkých šablon); původní cena se pak bere jen ze strukturovaných dat
+EARLY_STOP = False
+
+# Parsování HTML - 'lxml' je výrazně rychlejší než vestavěný 'html.parser'
+HTML_PARSER = 'lxml'
+SELECTOR_PLAN = True       # False = původní kaskáda select_one() pro každý selektor
+
+# Platforma e-shopu - 'auto' = detekce z hlavní stránky, None = vždy všechny
+# rodiny selektorů, nebo ručně 'shoptet' / 'woocommerce' / 'prestashop' / 'shopify'
+PLATFORM = 'auto'
+
+# Souběžné stahování detailů (FÁZE 2) - 0 nebo 1 = sekvenčně jako dřív
+CONCURRENT_WORKERS = 0
+MAX_PER_HOST = 4           # Max. souběžných požadavků na jeden host
+# Parsování HTML v samostatných procesech (obchází GIL) - 0 = ve vláknech;
+# např. os.cpu_count(); stahování pak běží ve vláknech CONCURRENT_WORKERS
+PARSE_WORKERS = 0
+
+# Dávkový režim (run_batch / --batch) - více e-shopů naráz v jednom procesu;
+# každý web má vlastní stav i tempo, pauzy jednoho hostu tak nebrzdí ostatní
+BATCH_SITES = 16           # Kolik webů se stahuje současně
+BATCH_MAX_REQUESTS = 32    # Globální strop souběžných HTTP požadavků přes všechny weby
+BATCH_LOG_DIR = None       # Adresář s výpisem každého webu (<doména>.log); None = zahodit
+
+# Distribuované stahování detailů (FÁZE 2) - URL produktů se rozdělí přes sdílenou
+# frontu mezi více procesů / strojů (další: python scraper.py --worker FRONTA)
+WORK_QUEUE = None          # SQLite soubor fronty, např. '/content/eshop_queue.sqlite'
+QUEUE_PORT = None          # Fronta i přes HTTP pro workery na jiných strojích (http://stroj:PORT)
+QUEUE_TOKEN = None         # Sdílené heslo HTTP fronty (hlavička X-Queue-Token); bez něj
+                           # poslouchá fronta jen na 127.0.0.1 (workery na témže stroji)
+QUEUE_BIND = '0.0.0.0'     # Rozhraní HTTP fronty s QUEUE_TOKEN
+QUEUE_LEASE = 300          # Za kolik s se nevrácená URL rozdá jinému workeru
+QUEUE_LEASE_BATCH = 10     # URL na jednu výpůjčku
+QUEUE_MAX_ATTEMPTS = 3     # Po tolika propadlých výpůjčkách se URL vzdá
+QUEUE_HOST_RATE = None     # Společný strop požadavků/s na host za všechny workery; None = každý sám
+
+# Adaptivní omezení rychlosti (AIMD) per host - False = pevné DELAY_MIN/MAX pauzy
+ADAPTIVE_RATE_LIMIT = True
+RATE_START = 1.0           # Počáteční tempo (požadavků/s) ~ dosavadní průměrná pauza
+RATE_MIN = 0.1             # Nejpomalejší tempo po opakovaném brzdění
+RATE_MAX = 8.0             # Strop tempa i pro velmi rychlý server
+RATE_INCREASE = 0.25       # Aditivní zrychlení po rychlé odpovědi 200
+RATE_BACKOFF = 0.5         # Multiplikativní zpomalení při 429/403/5xx
+FAST_RESPONSE = 1.0        # Odpověď rychlejší než toto (s) = server stíhá
+MAX_RETRY_AFTER = 300      # Horní mez pro hlavičku Retry-After (s)
+
 # Známé kategorie pro různé e-shopy (rozšiřitelné)
 KNOWN_CATEGORIES = {
     'aktin.cz': [
@@ -103,39 +291,691 @@ KNOWN_CATEGORIES = {
     ],
 }
 
+# ===========================================================================
+# METRIKY BĚHU
+# ===========================================================================
+
+# Horní meze košů histogramů latence (s)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class Metrics:
+    """Čítače a histogramy s popisky (host, status, pole...) sdílené všemi vlákny.
+    
+    Export jako Prometheus text (/metrics) nebo JSON. Čas fází se měří
+    přepínáním phase() - čas předchozí fáze se připíše k jejímu čítači.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.current_phase = None
+        self.phase_started = 0.0
+    
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+    
+    def inc(self, name, amount=1, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+    
+    def observe(self, name, value, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                # Počty v jednotlivých koších (+Inf na konci), součet, počet
+                hist = self.histograms[key] = [[0] * (len(LATENCY_BUCKETS) + 1), 0.0, 0]
+            hist[0][bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+            hist[1] += value
+            hist[2] += 1
+    
+    def phase(self, name):
+        """Přepne aktuální fázi běhu (None = konec)"""
+        now = time.monotonic()
+        if self.current_phase:
+            self.inc('phase_seconds_total', now - self.phase_started, phase=self.current_phase)
+        self.current_phase = name
+        self.phase_started = now
+    
+    def total(self, name):
+        """Součet čítače přes všechny popisky (u histogramu součet hodnot)"""
+        with self.lock:
+            return (sum(v for (n, _), v in self.counters.items() if n == name)
+                    + sum(h[1] for (n, _), h in self.histograms.items() if n == name))
+    
+    def by_label(self, name, label):
+        """Čítač sečtený podle jednoho popisku - {hodnota: součet}"""
+        result = {}
+        with self.lock:
+            for (n, labels), value in self.counters.items():
+                if n == name:
+                    group = dict(labels).get(label)
+                    result[group] = result.get(group, 0) + value
+        return result
+    
+    def raw(self):
+        with self.lock:
+            return dict(self.counters), {k: [list(h[0]), h[1], h[2]] for k, h in self.histograms.items()}
+    
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+    
+    def merge(self, raw):
+        """Přičte metriky z procesu parseru (viz raw())"""
+        if not raw:
+            return
+        counters, histograms = raw
+        with self.lock:
+            for key, value in counters.items():
+                self.counters[key] = self.counters.get(key, 0) + value
+            for key, (counts, total, count) in histograms.items():
+                hist = self.histograms.setdefault(key, [[0] * len(counts), 0.0, 0])
+                hist[0] = [a + b for a, b in zip(hist[0], counts)]
+                hist[1] += total
+                hist[2] += count
+    
+    def snapshot(self):
+        """Všechny metriky jako slovník pro JSON"""
+        counters, histograms = self.raw()
+        return {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'web': BASE_URL,
+            'phase': self.current_phase,
+            'gauges': run_gauges(),
+            'stats': stats_tables(),
+            'counters': [{'name': n, 'labels': dict(l), 'value': v} for (n, l), v in counters.items()],
+            'histograms': [{'name': n, 'labels': dict(l), 'buckets': dict(zip(
+                                [str(b) for b in LATENCY_BUCKETS] + ['+Inf'], h[0])),
+                            'sum': h[1], 'count': h[2]}
+                           for (n, l), h in histograms.items()],
+        }
+    
+    def prometheus(self):
+        """Metriky v textovém formátu Prometheus"""
+        counters, histograms = self.raw()
+        lines = []
+        
+        def fmt(labels):
+            if not labels:
+                return ''
+            escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+                       for _, v in labels)
+            return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(labels, escaped)) + '}'
+        
+        for name, value in run_gauges().items():
+            lines += [f'# TYPE eshop_{name} gauge', f'eshop_{name} {value}']
+        for table, values in stats_tables().items():
+            lines.append(f'# TYPE eshop_{table}_total counter')
+            lines += [f'eshop_{table}_total{fmt((("kind", k),))} {v}' for k, v in values.items()]
+        for name in sorted({n for n, _ in counters}):
+            lines.append(f'# TYPE eshop_{name} counter')
+            lines += [f'eshop_{name}{fmt(l)} {v:g}' for (n, l), v in counters.items() if n == name]
+        for name in sorted({n for n, _ in histograms}):
+            lines.append(f'# TYPE eshop_{name} histogram')
+            for (n, l), (counts, total, count) in histograms.items():
+                if n != name:
+                    continue
+                cumulative = 0
+                for bound, c in zip([str(b) for b in LATENCY_BUCKETS] + ['+Inf'], counts):
+                    cumulative += c
+                    lines.append(f'eshop_{name}_bucket{fmt(l + (("le", bound),))} {cumulative}')
+                lines += [f'eshop_{name}_sum{fmt(l)} {total:g}', f'eshop_{name}_count{fmt(l)} {count}']
+        return '\n'.join(lines) + '\n'
+
+metrics = Metrics()
+
+def run_gauges():
+    """Okamžitý stav běhu"""
+    return {
+        'products': len(products_data),
+        'product_urls': len(all_product_urls),
+        'processed_urls': len(processed_urls),
+        'visited_pages': len(visited_pages),
+        'pages_to_visit': len(pages_to_visit),
+    }
+
+def stats_tables():
+    """Dosavadní statistiky jednotlivých částí (stahování, extrakce, cache...)"""
+    return {
+        'download': dict(download_stats),
+        'extraction': dict(extraction_stats),
+        'cache': dict(cache_stats),
+        'incremental': dict(incremental_stats),
+    }
+
+def count_wait(url, seconds, reason):
+    """Započítá čas čekání (limit tempa, backoff, pauza) k hostu"""
+    if seconds > 0:
+        metrics.inc('wait_seconds_total', seconds, host=urlparse(url).netloc, reason=reason)
+
+def backoff_sleep(url, seconds):
+    """time.sleep() při chybě/blokaci - započítaný jako čekání"""
+    time.sleep(seconds)
+    count_wait(url, seconds, 'backoff')
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """/metrics = Prometheus text, /metrics.json = JSON"""
+    
+    def do_GET(self):
+        if self.path.startswith('/metrics.json'):
+            body, content_type = json.dumps(metrics.snapshot(), ensure_ascii=False), 'application/json'
+        elif self.path.startswith('/metrics'):
+            body, content_type = metrics.prometheus(), 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        body = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type + '; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+def dump_metrics(path=None):
+    """Zapíše JSON s metrikami (přes dočasný soubor - čtenář nevidí půlku)"""
+    path = path or METRICS_JSON
+    if not path:
+        return
+    try:
+        with open(path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(metrics.snapshot(), f, ensure_ascii=False, indent=1)
+        os.replace(path + '.tmp', path)
+    except Exception as e:
+        print(f"\n   ⚠️ Metriky se nepodařilo zapsat: {e}")
+
+def metrics_dump_loop():
+    while True:
+        time.sleep(METRICS_INTERVAL)
+        dump_metrics()
+
+def start_metrics_export():
+    """Spustí endpoint a průběžný JSON výpis - jednou za kernel, přežijí opakované spuštění"""
+    global metrics_server, metrics_dumper
+    if METRICS_PORT and metrics_server is None:
+        try:
+            metrics_server = ThreadingHTTPServer((METRICS_HOST, METRICS_PORT), MetricsHandler)
+            metrics_server.daemon_threads = True
+            threading.Thread(target=metrics_server.serve_forever, daemon=True).start()
+            print(f"📈 Metriky: http://localhost:{METRICS_PORT}/metrics")
+        except OSError as e:
+            print(f"⚠️ Endpoint metrik nelze spustit: {e}")
+    if METRICS_JSON and metrics_dumper is None:
+        metrics_dumper = threading.Thread(target=metrics_dump_loop, daemon=True)
+        metrics_dumper.start()
+
+# ===========================================================================
+# CACHE ODPOVĚDÍ (soubory / WARC)
+# ===========================================================================
+
+# Hlavičky, které po rozbalení těla neplatí (tělo se ukládá už dekódované)
+CACHE_DROP_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding', 'connection'}
+WARC_REVISIT_PROFILE = 'http://netpreserve.org/warc/1.1/revisit/identical-payload-digest'
+
+cache_stats = {'hit': 0, 'miss': 0, 'stored': 0, 'evicted': 0}
+
+class ResponseCache:
+    """Cache odpovědí 200 na disku - index v SQLite, těla adresovaná hashem obsahu.
+    
+    Stejné tělo pod více URL se uloží jednou. Formát 'files' = soubor
+    zlib na každé tělo, 'warc' = záznamy WARC/1.1 v segmentech .warc.gz
+    (každý záznam je samostatný gzip člen, čte se přímo z offsetu).
+    Po překročení CACHE_MAX_BYTES se mažou nejdéle nepoužitá těla
+    (u WARC celé segmenty kromě právě zapisovaného).
+    """
+    
+    def __init__(self, directory, fmt='files', max_bytes=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.warc = fmt == 'warc'
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(os.path.join(directory, 'index.sqlite'), check_same_thread=False)
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS blobs (
+                digest TEXT PRIMARY KEY,
+                location TEXT,
+                offset INTEGER,
+                length INTEGER,
+                size INTEGER,
+                used REAL
+            );
+            CREATE INDEX IF NOT EXISTS blobs_used ON blobs(used);
+            CREATE TABLE IF NOT EXISTS responses (
+                url TEXT PRIMARY KEY,
+                digest TEXT,
+                status INTEGER,
+                headers TEXT,
+                encoding TEXT,
+                fetched REAL
+            );
+        ''')
+        self.conn.commit()
+        self.total = self.conn.execute('SELECT COALESCE(SUM(length), 0) FROM blobs').fetchone()[0]
+        self.pending = 0
+        self.segment = self.last_segment() if self.warc else None
+    
+    # --- úložiště těl ---
+    
+    def last_segment(self):
+        names = sorted(name for name in os.listdir(self.directory) if name.endswith('.warc.gz'))
+        return names[-1] if names else 'responses-00001.warc.gz'
+    
+    def next_segment(self):
+        """Aktuální WARC segment; po naplnění založí další"""
+        path = os.path.join(self.directory, self.segment)
+        if os.path.exists(path) and os.path.getsize(path) >= WARC_SEGMENT_BYTES:
+            number = int(re.search(r'(\d+)', self.segment).group(1)) + 1
+            self.segment = f'responses-{number:05d}.warc.gz'
+        return self.segment
+    
+    def write_file(self, digest, body):
+        location = os.path.join(digest[:2], digest[2:])
+        path = os.path.join(self.directory, location)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        packed = zlib.compress(body, 6)
+        # Nejdřív dočasný soubor - přerušený zápis nenechá poškozené tělo
+        with open(path + '.tmp', 'wb') as f:
+            f.write(packed)
+        os.replace(path + '.tmp', path)
+        return location, 0, len(packed)
+    
+    def warc_record(self, warc_type, url, http_block, extra):
+        """Jeden WARC/1.1 záznam jako samostatný gzip člen"""
+        fields = [
+            ('WARC-Type', warc_type),
+            ('WARC-Record-ID', f'<urn:uuid:{uuid.uuid4()}>'),
+            ('WARC-Date', datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')),
+            ('WARC-Target-URI', url),
+        ] + extra + [
+            ('Content-Type', 'application/http;msgtype=response'),
+            ('Content-Length', str(len(http_block))),
+        ]
+        head = 'WARC/1.1\r\n' + ''.join(f'{name}: {value}\r\n' for name, value in fields) + '\r\n'
+        return gzip.compress(head.encode('utf-8') + http_block + b'\r\n\r\n', 6)
+    
+    def append_warc(self, record):
+        location = self.next_segment()
+        with open(os.path.join(self.directory, location), 'ab') as f:
+            offset = f.tell()
+            f.write(record)
+        return location, offset, len(record)
+    
+    def http_head(self, status, headers):
+        lines = [f'HTTP/1.1 {status} {http_reasons.get(status, "")}']
+        lines += [f'{name}: {value}' for name, value in headers.items()]
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8', errors='replace')
+    
+    def read_blob(self, location, offset, length, size):
+        with open(os.path.join(self.directory, location), 'rb') as f:
+            f.seek(offset)
+            packed = f.read(length)
+        if not self.warc:
+            return zlib.decompress(packed)
+        record = gzip.decompress(packed)
+        # WARC hlavička, pak HTTP hlavička, pak tělo
+        start = record.index(b'\r\n\r\n') + 4
+        start = record.index(b'\r\n\r\n', start) + 4
+        return record[start:start + size]
+    
+    # --- veřejné API ---
+    
+    def get(self, url, max_age=None):
+        """Vrací (status, tělo, hlavičky, kódování) nebo None (chybí / je starší než max_age)"""
+        with self.lock:
+            row = self.conn.execute('''
+                SELECT r.status, r.headers, r.encoding, r.fetched, r.digest,
+                       b.location, b.offset, b.length, b.size
+                FROM responses r JOIN blobs b ON b.digest = r.digest
+                WHERE r.url = ?''', (url,)).fetchone()
+        body = None
+        if row and (max_age is None or time.time() - row[3] <= max_age):
+            try:
+                body = self.read_blob(*row[5:])
+            except (OSError, ValueError, zlib.error):
+                # Tělo smazané nebo poškozené - chová se jako chybějící
+                pass
+        with self.lock:
+            if body is None:
+                cache_stats['miss'] += 1
+                return None
+            self.conn.execute('UPDATE blobs SET used = ? WHERE digest = ?', (time.time(), row[4]))
+            self.tick()
+            cache_stats['hit'] += 1
+        return row[0], body, requests.structures.CaseInsensitiveDict(json.loads(row[1])), row[2]
+    
+    def put(self, url, status, body, headers, encoding):
+        """Uloží odpověď; stejné tělo (hash) se znovu nezapisuje"""
+        headers = {name: value for name, value in headers.items()
+                   if name.lower() not in CACHE_DROP_HEADERS}
+        digest = hashlib.sha256(body).hexdigest()
+        now = time.time()
+        with self.lock:
+            known = self.conn.execute('SELECT 1 FROM blobs WHERE digest = ?', (digest,)).fetchone()
+            if self.warc:
+                http_head = self.http_head(status, headers)
+                if known:
+                    # Totožné tělo už je v archivu - jen krátký záznam 'revisit'
+                    self.append_warc(self.warc_record('revisit', url, http_head, [
+                        ('WARC-Profile', WARC_REVISIT_PROFILE),
+                        ('WARC-Payload-Digest', f'sha256:{digest}')]))
+                else:
+                    location, offset, length = self.append_warc(self.warc_record(
+                        'response', url, http_head + body,
+                        [('WARC-Payload-Digest', f'sha256:{digest}')]))
+            elif not known:
+                location, offset, length = self.write_file(digest, body)
+            if known:
+                self.conn.execute('UPDATE blobs SET used = ? WHERE digest = ?', (now, digest))
+            else:
+                self.conn.execute('INSERT INTO blobs VALUES (?, ?, ?, ?, ?, ?)',
+                                  (digest, location, offset, length, len(body), now))
+                self.total += length
+            self.conn.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                              (url, digest, status, json.dumps(headers), encoding, now))
+            self.tick()
+            cache_stats['stored'] += 1
+            if self.total > self.max_bytes:
+                self.evict()
+    
+    def evict(self):
+        """Maže nejdéle nepoužitá těla (u WARC celé segmenty) na 90 % limitu"""
+        self.conn.commit()
+        if self.warc:
+            rows = self.conn.execute('''
+                SELECT location, SUM(length) FROM blobs WHERE location != ?
+                GROUP BY location ORDER BY MAX(used)''', (self.segment,)).fetchall()
+        else:
+            rows = self.conn.execute('SELECT location, length FROM blobs ORDER BY used').fetchall()
+        for location, length in rows:
+            if self.total <= self.max_bytes * 0.9:
+                break
+            try:
+                os.remove(os.path.join(self.directory, location))
+            except OSError:
+                pass
+            self.conn.execute('DELETE FROM responses WHERE digest IN '
+                              '(SELECT digest FROM blobs WHERE location = ?)', (location,))
+            self.conn.execute('DELETE FROM blobs WHERE location = ?', (location,))
+            self.total -= length
+            cache_stats['evicted'] += 1
+        self.conn.commit()
+        self.pending = 0
+    
+    def tick(self):
+        # Zápis po dávkách - commit na každou URL by brzdil
+        self.pending += 1
+        if self.pending >= 100:
+            self.conn.commit()
+            self.pending = 0
+    
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+
+def open_response_cache():
+    return ResponseCache(RESPONSE_CACHE, CACHE_FORMAT) if RESPONSE_CACHE else None
+
+response_cache = open_response_cache()
+# Zda poslední odpověď ve vlákně přišla z cache - pak se nečeká na pauzu
+fetch_origin = threading.local()
+# Globální strop souběžných požadavků - v dávkovém režimu semafor sdílený všemi weby
+request_slots = nullcontext()
+
+def cache_lookup(url):
+    """Odpověď z cache podle CACHE_MODE; ('miss',) = v režimu 'replay' nestahovat"""
+    if not response_cache or CACHE_MODE == 'record':
+        return None
+    cached = response_cache.get(url, None if CACHE_MODE == 'replay' else CACHE_TTL)
+    if cached is None and CACHE_MODE == 'replay':
+        return ('miss',)
+    return cached
+
 # ===========================================================================
 # POMOCNÉ FUNKCE
 # ===========================================================================
 
-session = requests.Session()
-session.headers.update(HEADERS)
+def open_session():
+    """HTTP session se společnými hlavičkami a poolem spojení pro všechna vlákna"""
+    session = requests.Session()
+    session.headers.update(HEADERS)
+    if CONCURRENT_WORKERS > 1:
+        # Pool spojení musí stačit všem vláknům, jinak se spojení zahazují
+        adapter = requests.adapters.HTTPAdapter(pool_connections=MAX_PER_HOST,
+                                                pool_maxsize=CONCURRENT_WORKERS)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+    return session
+
+session = open_session()
 
 def get_delay():
     """Náhodné zpoždění mezi požadavky"""
     return random.uniform(DELAY_MIN, DELAY_MAX)
 
-def get_page(url, retries=MAX_RETRIES):
-    """Stáhne stránku s opakováním a rotací User-Agent"""
+def pause():
+    """Pauza mezi stránkami (v adaptivním režimu tempo řídí rate_limiter)"""
+    if not ADAPTIVE_RATE_LIMIT and not getattr(fetch_origin, 'cached', False):
+        delay = get_delay()
+        time.sleep(delay)
+        count_wait(BASE_URL, delay, 'pause')
+
+def parse_retry_after(value):
+    """Převede hlavičku Retry-After (sekundy nebo HTTP datum) na sekundy"""
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            when = parsedate_to_datetime(value)
+            seconds = (when - datetime.now(timezone.utc)).total_seconds()
+        except (TypeError, ValueError):
+            return None
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+class AdaptiveRateLimiter:
+    """Token bucket s AIMD řízením tempa, zvlášť pro každý host.
+    
+    Dokud server odpovídá rychle a 200, tempo aditivně roste až k RATE_MAX.
+    Při 429/403/5xx nebo chybě spojení se tempo násobně sníží a Retry-After
+    zablokuje host na požadovanou dobu. Sdílí ho všechna vlákna.
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hosts = {}
+    
+    def host_state(self, host):
+        if host not in self.hosts:
+            self.hosts[host] = {
+                'rate': RATE_START,
+                'tokens': 1.0,
+                'updated': time.monotonic(),
+                'blocked_until': 0.0,
+            }
+        return self.hosts[host]
+    
+    def wait(self, url):
+        """Blokuje, dokud host nemá volný token"""
+        host = urlparse(url).netloc
+        while True:
+            with self.lock:
+                state = self.host_state(host)
+                now = time.monotonic()
+                # Doplnění tokenů podle tempa (bez nárazů - nejvýš 1 token)
+                state['tokens'] = min(1.0, state['tokens'] + (now - state['updated']) * state['rate'])
+                state['updated'] = now
+                if now >= state['blocked_until'] and state['tokens'] >= 1.0:
+                    state['tokens'] -= 1.0
+                    return
+                sleep_for = max(state['blocked_until'] - now,
+                                (1.0 - state['tokens']) / state['rate'])
+            time.sleep(sleep_for)
+    
+    def report(self, url, status, elapsed, retry_after=None):
+        """Upraví tempo hostu podle výsledku požadavku"""
+        host = urlparse(url).netloc
+        with self.lock:
+            state = self.host_state(host)
+            if status in (200, 304):
+                if elapsed < FAST_RESPONSE:
+                    state['rate'] = min(RATE_MAX, state['rate'] + RATE_INCREASE)
+            elif status is None or status in (403, 429) or status >= 500:
+                state['rate'] = max(RATE_MIN, state['rate'] * RATE_BACKOFF)
+                # Další požadavek až po celém (novém, delším) intervalu
+                state['tokens'] = min(state['tokens'], 0.0)
+                if retry_after:
+                    state['blocked_until'] = max(state['blocked_until'],
+                                                 time.monotonic() + retry_after)
+
+rate_limiter = AdaptiveRateLimiter()
+
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+JSON_CONTENT_TYPES = ('application/json', 'application/ld+json', 'text/json')
+
+download_stats = {'bytes': 0, 'truncated': 0, 'early_stop': 0, 'wrong_type': 0}
+download_lock = threading.Lock()
+
+def count_download(key, amount=1):
+    with download_lock:
+        download_stats[key] += amount
+
+def media_type(headers):
+    """Content-Type bez parametrů (charset...), malými písmeny"""
+    return headers.get('Content-Type', '').split(';')[0].strip().lower()
+
+def read_body(response, early_stop=None):
+    """Čte tělo odpovědi po kouscích - s limitem MAX_PAGE_BYTES a předčasným koncem.
+    
+    early_stop(buffer) se volá po každém kousku; True = zbytek stránky
+    už nepotřebujeme (spojení se zavře bez dočtení). Vrací (tělo, celé);
+    celé = False u zkráceného nebo předčasně ukončeného těla.
+    """
+    buffer = bytearray()
+    complete = True
+    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK):
+        buffer += chunk
+        # Zkrácení jen když za limitem opravdu něco je - tělo přesně o velikosti limitu je celé
+        if len(buffer) > MAX_PAGE_BYTES:
+            del buffer[MAX_PAGE_BYTES:]
+            count_download('truncated')
+            complete = False
+            break
+        if early_stop and early_stop(buffer):
+            count_download('early_stop')
+            complete = False
+            break
+    count_download('bytes', len(buffer))
+    return bytes(buffer), complete
+
+def fetch_page(url, retries=None, extra_headers=None, accept=HTML_CONTENT_TYPES, early_stop=None):
+    """Stáhne stránku - vrací (status, text, hlavičky); text jen u 200.
+    
+    Tělo se stahuje proudem: odpověď s jiným Content-Type než accept
+    (None = cokoliv) se vůbec nečte, větší než MAX_PAGE_BYTES se zkrátí.
+    early_stop je továrna na test předčasného konce (viz read_body()).
+    S RESPONSE_CACHE se odpověď 200 nejdřív hledá v cache a po stažení ukládá.
+    retries None = MAX_RETRIES.
+    """
+    if retries is None:
+        retries = MAX_RETRIES
+    cached = cache_lookup(url)
+    fetch_origin.cached = cached is not None
+    if cached:
+        if len(cached) == 1:
+            # 'replay' bez záznamu - síť nepoužíváme
+            return None, None, {}
+        status, body, headers, encoding = cached
+        if accept and media_type(headers) and media_type(headers) not in accept:
+            count_download('wrong_type')
+            return status, None, headers
+        return status, body.decode(encoding or 'utf-8', errors='replace'), headers
+    
+    status = None
+    host = urlparse(url).netloc
     for i in range(retries):
+        if i:
+            metrics.inc('fetch_retries_total', host=host)
+        if ADAPTIVE_RATE_LIMIT:
+            waiting = time.monotonic()
+            rate_limiter.wait(url)
+            count_wait(url, time.monotonic() - waiting, 'rate_limit')
+        started = time.monotonic()
         try:
-            # Rotace User-Agent
-            session.headers['User-Agent'] = random.choice(USER_AGENTS)
+            # Rotace User-Agent (per požadavek - session sdílí více vláken)
+            headers = {'User-Agent': random.choice(USER_AGENTS)}
+            if extra_headers:
+                headers.update(extra_headers)
             
-            response = session.get(url, timeout=30, allow_redirects=True)
-            
-            if response.status_code == 200:
-                return response.text
-            elif response.status_code == 403:
-                print(f"\n    ⚠️ Blokováno (403), zkouším znovu...")
-                time.sleep(5 * (i + 1))
-            elif response.status_code == 429:
-                print(f"\n    ⚠️ Rate limit, čekám...")
-                time.sleep(30)
-            else:
-                time.sleep(2)
+            with request_slots:
+                response = session.get(url, headers=headers, timeout=30, allow_redirects=True, stream=True)
         except Exception as e:
-            time.sleep(3 * (i + 1))
-    return None
+            metrics.inc('fetch_errors_total', host=host, error=type(e).__name__)
+            if ADAPTIVE_RATE_LIMIT:
+                rate_limiter.report(url, None, time.monotonic() - started)
+            else:
+                backoff_sleep(url, 3 * (i + 1))
+            continue
+        
+        status = response.status_code
+        metrics.inc('http_responses_total', host=host, status=status)
+        if ADAPTIVE_RATE_LIMIT:
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            rate_limiter.report(url, status, time.monotonic() - started, retry_after)
+        
+        if status == 200:
+            content_type = media_type(response.headers)
+            if accept and content_type and content_type not in accept:
+                # Přesměrování na PDF, obrázek, feed... - tělo nestahujeme
+                count_download('wrong_type')
+                response.close()
+                return status, None, response.headers
+            try:
+                with request_slots:
+                    body, complete = read_body(response, early_stop() if early_stop else None)
+            except Exception as e:
+                metrics.inc('fetch_errors_total', host=host, error=type(e).__name__)
+                response.close()
+                continue
+            response.close()
+            # Latence včetně čtení těla (u ostatních stavů jen do hlaviček níže)
+            metrics.observe('fetch_seconds', time.monotonic() - started, host=host)
+            encoding = response.encoding or 'utf-8'
+            if response_cache and complete:
+                # Zkrácené tělo by se přehrávalo jako celé i po zvýšení limitu
+                response_cache.put(url, status, body, response.headers, encoding)
+            return status, body.decode(encoding, errors='replace'), response.headers
+        
+        response.close()
+        metrics.observe('fetch_seconds', time.monotonic() - started, host=host)
+        if status == 304:
+            # Podmíněný požadavek - stránka se nezměnila
+            return status, None, response.headers
+        elif status == 403:
+            print("\n    ⚠️ Blokováno (403), zkouším znovu...")
+            if not ADAPTIVE_RATE_LIMIT:
+                backoff_sleep(url, 5 * (i + 1))
+        elif status == 429:
+            print("\n    ⚠️ Rate limit, čekám...")
+            if not ADAPTIVE_RATE_LIMIT:
+                backoff_sleep(url, 30)
+        elif not ADAPTIVE_RATE_LIMIT:
+            backoff_sleep(url, 2)
+    return status, None, {}
+
+def get_page(url, retries=None, accept=HTML_CONTENT_TYPES, early_stop=None):
+    """Stáhne stránku s opakováním a rotací User-Agent"""
+    status, text, headers = fetch_page(url, retries, accept=accept, early_stop=early_stop)
+    return text
 
 def clean_price(text):
     """Vyčistí cenu"""
@@ -151,7 +991,19 @@ def clean_price(text):
         price = parts[0].replace('.', '') + '.' + parts[1]
     else:
         price = price.replace('.', '')
-    return price
+    return normalize_price(price)
+
+def normalize_price(price):
+    """Jednotný tvar ceny z textu i strukturovaných dat (1299.00 -> 1299, 12.5 -> 12.50)"""
+    try:
+        number = Decimal(price)
+    except InvalidOperation:
+        return price
+    if not number.is_finite():
+        return price
+    if number == number.to_integral_value():
+        return str(int(number))
+    return f"{number.quantize(Decimal('0.01'), rounding=ROUND_HALF_UP):f}"
 
 def clean_text(text):
     """Odstraní neplatné znaky pro Excel"""
@@ -163,159 +1015,410 @@ def clean_text(text):
     text = text.encode('utf-8', errors='ignore').decode('utf-8')
     return text.strip()
 
+def get_known_categories():
+    """Vrátí známé kategorie pro daný web"""
+    for domain, categories in KNOWN_CATEGORIES.items():
+        if domain in DOMAIN:
+            return [BASE_URL + cat for cat in categories]
+    return []
+
+# ===========================================================================
+# KLASIFIKACE URL (produkt / kategorie)
+# ===========================================================================
+
+# Systémové stránky - URL obsahující některý vzor není produkt
+PRODUCT_URL_EXCLUDE = [
+    # Košík a objednávky
+    '/kosik', '/cart', '/basket', '/checkout', '/objednavka', '/order', '/pokladna',
+    # Účet
+    '/login', '/prihlaseni', '/registrace', '/register', '/ucet', '/account', '/profil',
+    '/zapomenute-heslo', '/odhlaseni', '/logout',
+    # Informační stránky
+    '/kontakt', '/contact', '/o-nas', '/about', '/o-spolecnosti', '/firma',
+    '/blog', '/clanek', '/article', '/magazin', '/clanky', '/recepty',
+    '/podminky', '/terms', '/gdpr', '/cookies', '/ochrana-udaju', '/privacy',
+    '/faq', '/pomoc', '/help', '/otazky', '/zakaznicka-podpora',
+    '/doprava', '/shipping', '/platba', '/payment', '/reklamace', '/return', '/vraceni',
+    '/jak-nakupovat', '/obchodni-podminky', '/vse-o-nakupu',
+    # Technické
+    '/sitemap', '/feed', '/rss', '/xml', '/json', '/api', '/ajax', '/graphql',
+    '/search', '/hledat', '/vyhledavani',
+    '/tag', '/znacka', '/brand', '/vyrobce', '/manufacturer',
+    '/kategorie', '/category', '/catalog', '/katalog',
+    '/page/', '/strana-', '/stranka-', '?page=', '&page=',
+    '/wp-admin', '/admin', '/wp-content', '/wp-includes', '/assets', '/static',
+    # Soubory
+    '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.css', '.js', '.xml', '.ico',
+    # Speciální
+    '/wishlist', '/porovnani', '/compare', '/hodnoceni', '/review',
+    '/sluzby', '/services', '/prodejny', '/stores', '/pobocky',
+    '/kariera', '/career', '/spoluprace', '/affiliate', '/partneri',
+]
+
+# Systémové stránky pro kategorie (striktnější filtr, jen cesta)
+CATEGORY_URL_EXCLUDE = [
+    '/kosik', '/cart', '/checkout', '/login', '/registrace', '/account',
+    '/kontakt', '/blog', '/clanek', '/podminky', '/gdpr', '/faq', '/sitemap',
+    '.pdf', '.jpg', '.png', '/wp-admin', '/admin', '/api',
+    '/objednavka', '/order', '/prihlaseni', '/odhlaseni',
+]
+
+def trie_regex(words):
+    """Zkompiluje seznam podřetězců do jednoho regexu tvaru prefixového stromu.
+    
+    Společné prefixy se sdílí, takže jedno search() projde URL jednou místo
+    samostatného hledání každého vzoru (obdoba Aho-Corasick).
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+    
+    def pattern(node):
+        # Konec slova - delší pokračování už na shodě nic nezmění
+        if '' in node:
+            return ''
+        branches = [re.escape(char) + pattern(child) for char, child in sorted(node.items())]
+        return branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+    
+    return re.compile(pattern(trie)) if trie else None
+
+class UrlClassifier:
+    """Pravidla pro rozpoznání URL produktu a kategorie zkompilovaná jednou.
+    
+    Doplňková pravidla pro konkrétní web se berou z DOMAIN_URL_RULES.
+    """
+    
+    URL_RE = re.compile(r'https?://([^/?#]*)([^?#]*)')
+    
+    def __init__(self, domain, rules=None):
+        rules = rules or {}
+        self.domain = domain
+        self.rules = rules
+        self.product_exclude = trie_regex(PRODUCT_URL_EXCLUDE + rules.get('product_exclude', []))
+        self.category_exclude = trie_regex(CATEGORY_URL_EXCLUDE + rules.get('category_exclude', []))
+        pattern = rules.get('product_pattern')
+        self.product_pattern = re.compile(pattern) if pattern else None
+    
+    @classmethod
+    def for_domain(cls, domain):
+        for rule_domain, rules in DOMAIN_URL_RULES.items():
+            if rule_domain in domain:
+                return cls(domain, rules)
+        return cls(domain)
+    
+    def split(self, url):
+        """(host, cesta malými písmeny) nebo None pro cizí/ne-HTTP URL"""
+        if not url:
+            return None
+        match = self.URL_RE.match(url)
+        if not match or self.domain not in match.group(1):
+            return None
+        return match.group(1), match.group(2).lower()
+    
+    def is_product(self, url):
+        parts = self.split(url)
+        if not parts:
+            return False
+        path = parts[1]
+        
+        if self.product_exclude and self.product_exclude.search(url.lower()):
+            return False
+        
+        # URL nesmí být příliš krátká
+        if len(path) < 5 or path == '/':
+            return False
+        
+        # Produkt má obvykle delší URL s názvem
+        # A neobsahuje více než jeden parametr
+        if url.count('?') > 1:
+            return False
+        
+        if self.product_pattern and not self.product_pattern.search(path):
+            return False
+        return True
+    
+    def is_category(self, url):
+        parts = self.split(url)
+        if not parts:
+            return False
+        return not (self.category_exclude and self.category_exclude.search(parts[1]))
+
+url_classifier = UrlClassifier.for_domain(DOMAIN)
+
+# Stejné odkazy (menu, patička, dlaždice) se opakují na každé stránce výpisu
+@lru_cache(maxsize=URL_CACHE_SIZE)
 def is_product_url(url):
     """Heuristika - je to URL produktu?"""
+    return url_classifier.is_product(url)
+
+@lru_cache(maxsize=URL_CACHE_SIZE)
+def is_category_url(url):
+    """Je to URL kategorie?"""
+    return url_classifier.is_category(url)
+
+def is_product_url_linear(url):
+    """Původní lineární průchod vzory - reference pro benchmark_url_classifier()"""
     if not url or not url.startswith(('http://', 'https://')):
         return False
-    
     parsed = urlparse(url)
     if DOMAIN not in parsed.netloc:
         return False
-    
     path = parsed.path.lower()
-    
-    # Vyloučit systémové stránky
-    excluded_patterns = [
-        # Košík a objednávky
-        '/kosik', '/cart', '/basket', '/checkout', '/objednavka', '/order', '/pokladna',
-        # Účet
-        '/login', '/prihlaseni', '/registrace', '/register', '/ucet', '/account', '/profil',
-        '/zapomenute-heslo', '/odhlaseni', '/logout',
-        # Informační stránky
-        '/kontakt', '/contact', '/o-nas', '/about', '/o-spolecnosti', '/firma',
-        '/blog', '/clanek', '/article', '/magazin', '/clanky', '/recepty',
-        '/podminky', '/terms', '/gdpr', '/cookies', '/ochrana-udaju', '/privacy',
-        '/faq', '/pomoc', '/help', '/otazky', '/zakaznicka-podpora',
-        '/doprava', '/shipping', '/platba', '/payment', '/reklamace', '/return', '/vraceni',
-        '/jak-nakupovat', '/obchodni-podminky', '/vse-o-nakupu',
-        # Technické
-        '/sitemap', '/feed', '/rss', '/xml', '/json', '/api', '/ajax', '/graphql',
-        '/search', '/hledat', '/vyhledavani',
-        '/tag', '/znacka', '/brand', '/vyrobce', '/manufacturer',
-        '/kategorie', '/category', '/catalog', '/katalog',
-        '/page/', '/strana-', '/stranka-', '?page=', '&page=',
-        '/wp-admin', '/admin', '/wp-content', '/wp-includes', '/assets', '/static',
-        # Soubory
-        '.pdf', '.jpg', '.jpeg', '.png', '.gif', '.svg', '.css', '.js', '.xml', '.ico',
-        # Speciální
-        '/wishlist', '/porovnani', '/compare', '/hodnoceni', '/review',
-        '/sluzby', '/services', '/prodejny', '/stores', '/pobocky',
-        '/kariera', '/career', '/spoluprace', '/affiliate', '/partneri',
-    ]
-    
-    for excl in excluded_patterns:
+    for excl in PRODUCT_URL_EXCLUDE:
         if excl in path or excl in url.lower():
             return False
-    
-    # URL nesmí být příliš krátká
     if len(path) < 5 or path == '/':
         return False
-    
-    # Produkt má obvykle delší URL s názvem
-    # A neobsahuje více než jeden parametr
     if url.count('?') > 1:
         return False
-    
     return True
 
-def is_category_url(url):
-    """Je to URL kategorie?"""
-    if not url or not url.startswith(('http://', 'https://')):
-        return False
+def benchmark_url_classifier(urls=None, rounds=5):
+    """Mikrobenchmark - původní lineární průchod vs. zkompilovaný klasifikátor"""
+    if urls is None:
+        # Typická směs odkazů z výpisu: produkty, menu, systémové stránky, cizí weby
+        samples = list(all_product_urls)[:2000] or [
+            f'{BASE_URL}/produkt-{i}/' for i in range(1000)
+        ]
+        samples += [f'{BASE_URL}{path}' for path in PRODUCT_URL_EXCLUDE]
+        samples += [f'{BASE_URL}/kategorie-{i}/strana-{i % 5}/' for i in range(200)]
+        samples += ['https://www.facebook.com/eshop', 'mailto:info@eshop.cz', 'javascript:void(0)']
+        urls = samples
+    urls = list(urls)
+    # Bez pravidel z DOMAIN_URL_RULES musí oba přístupy souhlasit
+    if not url_classifier.rules:
+        mismatches = [u for u in urls if is_product_url_linear(u) != url_classifier.is_product(u)]
+        if mismatches:
+            print(f"   ⚠️ Rozdílné výsledky: {len(mismatches)} (např. {mismatches[0]})")
     
+    def measure(func):
+        best = float('inf')
+        for _ in range(rounds):
+            start = time.perf_counter()
+            for url in urls:
+                func(url)
+            best = min(best, time.perf_counter() - start)
+        return best / len(urls) * 1e6
+    
+    linear = measure(is_product_url_linear)
+    compiled = measure(url_classifier.is_product)
+    is_product_url.cache_clear()
+    measure(is_product_url)             # První průchod naplní cache
+    cached = measure(is_product_url)
+    
+    print(f"   URL v testu:          {len(urls)}")
+    print(f"   Lineární průchod:     {linear:.2f} µs/URL")
+    print(f"   Zkompilovaný regex:   {compiled:.2f} µs/URL ({linear / compiled:.1f}×)")
+    print(f"   + LRU cache:          {cached:.2f} µs/URL ({linear / cached:.1f}×)")
+    return {'linear_us': linear, 'compiled_us': compiled, 'cached_us': cached}
+
+# ===========================================================================
+# KANONIZACE URL
+# ===========================================================================
+
+def normalize_url(url):
+    """Základní kanonizace URL - malé schéma a host, bez výchozího portu,
+    fragmentu a se seřazenými parametry"""
     parsed = urlparse(url)
-    if DOMAIN not in parsed.netloc:
-        return False
+    scheme = parsed.scheme.lower()
+    host = parsed.netloc.lower()
+    if (scheme == 'http' and host.endswith(':80')) or (scheme == 'https' and host.endswith(':443')):
+        host = host.rsplit(':', 1)[0]
+    query = urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True)))
+    return urlunparse((scheme, host, parsed.path or '/', parsed.params, query, ''))
+
+def is_tracking_param(name, ignored):
+    """Je parametr v seznamu ignorovaných (vzor s * = prefix)?"""
+    name = name.lower()
+    for pattern in ignored:
+        if pattern.endswith('*') and name.startswith(pattern[:-1]):
+            return True
+        if name == pattern:
+            return True
+    return False
+
+def canonical_url(url, product=False):
+    """Kanonická podoba URL pro deduplikaci i stahování.
     
-    path = parsed.path.lower()
+    Nad normalize_url() navíc odstraní sledovací parametry (u produktů
+    i parametry variant), sjednotí http/https a www. podle BASE_URL
+    a koncové lomítko podle TRAILING_SLASH.
+    """
+    parsed = urlparse(normalize_url(url))
     
-    # Vyloučit systémové stránky (striktnější filtr)
-    excluded = [
-        '/kosik', '/cart', '/checkout', '/login', '/registrace', '/account',
-        '/kontakt', '/blog', '/clanek', '/podminky', '/gdpr', '/faq', '/sitemap',
-        '.pdf', '.jpg', '.png', '/wp-admin', '/admin', '/api',
-        '/objednavka', '/order', '/prihlaseni', '/odhlaseni',
-    ]
+    ignored = TRACKING_PARAMS + (PRODUCT_IGNORED_PARAMS if product else [])
+    params = [(k, v) for k, v in parse_qsl(parsed.query, keep_blank_values=True)
+              if not is_tracking_param(k, ignored)]
     
-    for excl in excluded:
-        if excl in path:
-            return False
+    # Stejný web přes http/https nebo s/bez www. = schéma a host z BASE_URL
+    scheme, host = parsed.scheme, parsed.netloc
+    base = urlparse(BASE_URL)
+    if host.removeprefix('www.') == base.netloc.lower().removeprefix('www.'):
+        scheme, host = base.scheme, base.netloc.lower()
     
-    return True
+    path = parsed.path
+    if path != '/' and TRAILING_SLASH != 'keep':
+        if TRAILING_SLASH == 'add' and not path.endswith('/') and '.' not in path.rsplit('/', 1)[-1]:
+            path += '/'
+        elif TRAILING_SLASH == 'strip':
+            path = path.rstrip('/') or '/'
+    
+    query = urlencode(params)
+    result = urlunparse((scheme, host, path, parsed.params, query, ''))
+    
+    if TRAILING_SLASH == 'auto' and path != '/':
+        # Podoba s lomítkem i bez něj vede na stejnou stránku - platí první viděná.
+        # Pamatuje se jen 8bajtový otisk podoby bez lomítka a zda první lomítko měla
+        # (jako VisitedIndex - celé řetězce URL by paměť vracely zpět)
+        key = urlunparse((scheme, host, path.rstrip('/'), parsed.params, query, ''))
+        fp = int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+        slash = path.endswith('/')
+        if canonical_forms.setdefault(fp, slash) != slash:
+            path = path + '/' if not slash else path.rstrip('/')
+            result = urlunparse((scheme, host, path, parsed.params, query, ''))
+    return result
 
-def get_known_categories():
-    """Vrátí známé kategorie pro daný web"""
-    for domain, categories in KNOWN_CATEGORIES.items():
-        if domain in DOMAIN:
-            return [BASE_URL + cat for cat in categories]
-    return []
+def remember_canonical_forms(urls):
+    """Naučí TRAILING_SLASH='auto' podoby URL z předchozího běhu / stavu"""
+    for url in urls:
+        canonical_url(url)
 
-def find_product_links(soup, base_url):
-    """Najde odkazy na produkty na stránce"""
-    urls = set()
-    
+# ===========================================================================
+# DETEKCE PLATFORMY
+# ===========================================================================
+
+# Znaky platformy v HTML hlavní stránky (generator, cesty k assetům, JS objekty)
+PLATFORM_SIGNATURES = {
+    'shoptet': [
+        r'<meta[^>]+content="shoptet', r'cdn\.myshoptet\.com', r'shoptet\.(?:cz|sk)/',
+        r'\bvar shoptet\b', r'\bshoptet\.',
+    ],
+    'woocommerce': [
+        r'<meta[^>]+content="woocommerce', r'/wp-content/plugins/woocommerce/',
+        r'\bwoocommerce-(?:page|no-js|js)\b', r'\bwc-(?:cart|add-to-cart)\b',
+    ],
+    'prestashop': [
+        r'<meta[^>]+content="prestashop', r'\bvar prestashop\b', r'/modules/ps_\w+/',
+        r'/themes/[\w-]+/assets/(?:css|js)/',
+    ],
+    'shopify': [
+        r'cdn\.shopify\.com', r'\bShopify\.shop\b', r'myshopify\.com', r'/cdn/shop/',
+    ],
+}
+PLATFORM_SIGNATURE_RES = {
+    platform: [re.compile(p, re.I) for p in patterns]
+    for platform, patterns in PLATFORM_SIGNATURES.items()
+}
+
+# Prefixy cookies, které platformy nastavují
+PLATFORM_COOKIES = {
+    'shoptet': ['shoptet'],
+    'woocommerce': ['woocommerce_', 'wp_woocommerce_session_'],
+    'prestashop': ['PrestaShop-'],
+    'shopify': ['_shopify_', 'cart_currency', 'localization'],
+}
+
+def detect_platform(html, cookie_names=()):
+    """Určí platformu e-shopu podle HTML a cookies (None = neznámá)"""
+    scores = {}
+    for platform, patterns in PLATFORM_SIGNATURE_RES.items():
+        score = sum(1 for pattern in patterns if pattern.search(html))
+        score += sum(1 for name in cookie_names
+                     for prefix in PLATFORM_COOKIES[platform] if name.startswith(prefix))
+        if score:
+            scores[platform] = score
+    if not scores:
+        return None
+    return max(scores, key=scores.get)
+
+def ensure_platform():
+    """Jednou pro web zjistí platformu z hlavní stránky (viz PLATFORM)"""
+    global site_platform, platform_checked
+    if PLATFORM != 'auto':
+        site_platform = PLATFORM
+        return site_platform
+    if platform_checked:
+        return site_platform
+    html = get_page(BASE_URL)
+    if html:
+        site_platform = detect_platform(html, session.cookies.keys())
+        platform_checked = True
+        print(f"   🧭 Platforma: {site_platform or 'neznámá - všechny selektory'}")
+    return site_platform
+
+# Selektory odkazů na produkty podle platformy
+LINK_SELECTORS = {
     # Shoptet specifické selektory
-    shoptet_selectors = [
+    'shoptet': [
         'a.p-name', 'a.p-item-title', '.p-item a.p-name',
         '.p-info a', '.product-name a', 'a.product-name',
         '.p h2 a', '.p h3 a', '.p-item h2 a',
         'a[data-product-name]', '[data-product] a',
-    ]
-    
+    ],
     # WooCommerce selektory
-    woo_selectors = [
+    'woocommerce': [
         '.woocommerce-loop-product__link',
         '.woocommerce-LoopProduct-link',
         'ul.products li.product a',
         '.product-item-link', '.product a.product-item-link',
-    ]
-    
+    ],
     # PrestaShop selektory
-    presta_selectors = [
+    'prestashop': [
         '.product-title a', '.product_name a',
         '.product-miniature a.thumbnail',
         '.product-container a.product-name',
-    ]
-    
+    ],
     # Shopify selektory
-    shopify_selectors = [
+    'shopify': [
         '.product-card a', '.product-card__link',
         '.product-item a', '.product-link',
         '.grid-product__link', '.card__link',
-    ]
-    
+    ],
     # Obecné selektory
-    generic_selectors = [
+    'generic': [
         '.product a', '.products a', '[class*="product"] a',
         '.item a', '.card a', '.grid-item a',
         'h2 a', 'h3 a', 'h4 a',
         'article a', '.product-list a',
         '.collection-product a', '.product-grid a',
-    ]
+    ],
+}
+
+def find_product_links(soup, base_url):
+    """Najde odkazy na produkty na stránce"""
+    urls = set()
     
-    all_selectors = (shoptet_selectors + woo_selectors + 
-                     presta_selectors + shopify_selectors + generic_selectors)
+    def collect(families):
+        for family in families:
+            for selector in LINK_SELECTORS[family]:
+                try:
+                    for link in soup.select(selector):
+                        href = link.get('href', '')
+                        if href and not href.startswith('#') and not href.startswith('javascript:'):
+                            full_url = canonical_url(urljoin(base_url, href), product=True)
+                            if is_product_url(full_url):
+                                urls.add(full_url)
+                except:
+                    pass
     
-    for selector in all_selectors:
-        try:
-            for link in soup.select(selector):
-                href = link.get('href', '')
-                if href and not href.startswith('#') and not href.startswith('javascript:'):
-                    full_url = urljoin(base_url, href)
-                    # Odstranit fragment a normalizovat
-                    full_url = full_url.split('#')[0]
-                    if is_product_url(full_url):
-                        urls.add(full_url)
-        except:
-            pass
+    # Známá platforma = jen její profil, jinak všechny rodiny selektorů
+    if site_platform in LINK_SELECTORS:
+        collect([site_platform])
+        # Profil nic nenašel - zkusíme obecná pravidla
+        if len(urls) < 3 and site_platform != 'generic':
+            collect(['generic'])
+    else:
+        collect(list(LINK_SELECTORS))
     
     # Záložní metoda - všechny odkazy
     if len(urls) < 3:
         for a in soup.find_all('a', href=True):
             href = a.get('href', '')
             if href and not href.startswith('#'):
-                full_url = urljoin(base_url, href)
-                full_url = full_url.split('#')[0]
+                full_url = canonical_url(urljoin(base_url, href), product=True)
                 if is_product_url(full_url):
                     urls.add(full_url)
     
@@ -345,8 +1448,7 @@ def find_category_links(soup, base_url):
             for link in soup.select(selector):
                 href = link.get('href', '')
                 if href and not href.startswith('#'):
-                    full_url = urljoin(base_url, href)
-                    full_url = full_url.split('#')[0]
+                    full_url = canonical_url(urljoin(base_url, href))
                     if is_category_url(full_url) and full_url not in visited_pages:
                         urls.add(full_url)
         except:
@@ -377,8 +1479,7 @@ def find_pagination_links(soup, base_url):
             for link in soup.select(selector):
                 href = link.get('href', '')
                 if href and not href.startswith('#'):
-                    full_url = urljoin(base_url, href)
-                    full_url = full_url.split('#')[0]
+                    full_url = canonical_url(urljoin(base_url, href))
                     if DOMAIN in full_url and full_url not in visited_pages:
                         urls.add(full_url)
         except:
@@ -386,384 +1487,3354 @@ def find_pagination_links(soup, base_url):
     
     return urls
 
-def extract_product_data(url):
-    """Extrahuje data z produktové stránky"""
-    html = get_page(url)
-    if not html:
-        return None
+# ===========================================================================
+# FRONTA STRÁNEK (FÁZE 1)
+# ===========================================================================
+
+def url_fingerprint(url):
+    """63bitový otisk kanonické URL (vejde se do SQLite INTEGER)"""
+    digest = hashlib.blake2b(canonical_url(url).encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') >> 1
+
+class VisitedIndex:
+    """Kompaktní množina navštívených URL - jen 8bajtové otisky.
     
-    soup = BeautifulSoup(html, 'html.parser')
+    Otisky leží v setříděném numpy poli (8 B na URL) a v malé sadě
+    nejnovějších, která se po VISITED_MERGE_EVERY položkách slije do pole.
+    Místo celého řetězce URL tak zabere zlomek paměti.
+    """
     
-    data = {
-        'nazev': '',
-        'ean': '',
-        'cena': '',
-        'cena_puvodni': '',
-        'sleva': '',
-        'dostupnost': '',
-        'url': url,
-    }
+    def __init__(self, urls=(), state=None):
+        import numpy as np
+        self.sorted = np.empty(0, dtype=np.int64)
+        self.recent = set()
+        self.state = None
+        for url in urls:
+            self.add(url)
+        self.state = state
     
+    def __contains__(self, url):
+        return self.contains_fingerprint(url_fingerprint(url))
+    
+    def __len__(self):
+        return len(self.sorted) + len(self.recent)
+    
+    def contains_fingerprint(self, fp):
+        if fp in self.recent:
+            return True
+        idx = self.sorted.searchsorted(fp)
+        return idx < len(self.sorted) and self.sorted[idx] == fp
+    
+    def add(self, url):
+        self.add_fingerprint(url_fingerprint(url))
+    
+    def add_fingerprint(self, fp):
+        if self.contains_fingerprint(fp):
+            return
+        self.recent.add(fp)
+        if self.state:
+            self.state.add_fingerprint(fp)
+        if len(self.recent) >= VISITED_MERGE_EVERY:
+            import numpy as np
+            self.sorted = np.union1d(self.sorted, np.fromiter(self.recent, dtype=np.int64))
+            self.recent = set()
+    
+    def fingerprints(self):
+        yield from self.sorted.tolist()
+        yield from self.recent
+
+class CrawlFrontier:
+    """Prioritní fronta stránek FÁZE 1 s omezenou pamětí.
+    
+    Pořadí je (priorita, hloubka, pořadí vložení) - stránkování
+    (PRIORITY_PAGINATION) jde před zanořováním do dalších kategorií,
+    takže limit MAX_PAGES se nevyplýtvá na hluboké větve. Nad
+    FRONTIER_MEMORY_LIMIT položek se fronta odkládá do SQLite; s trvalým
+    stavem (STATE_DB) je celá fronta v databázi a po pádu se obnoví.
+    """
+    
+    def __init__(self, store=None, memory_limit=None):
+        self.heap = []
+        self.seen = VisitedIndex()     # Vše, co kdy prošlo frontou
+        self.store = store             # CrawlState s tabulkou frontier_queue
+        self.memory_limit = 0 if store else (memory_limit or FRONTIER_MEMORY_LIMIT)
+        self.stored = 0
+        self.seq = 0
+        self.spill = None              # Vlastní dočasný soubor přetečení (bez STATE_DB)
+        if store:
+            for url in store.queue_urls():
+                self.seen.add(url)
+            self.stored = store.queue_count()
+            self.seq = store.queue_max_seq() + 1
+    
+    def __len__(self):
+        return len(self.heap) + self.stored
+    
+    def __bool__(self):
+        return len(self) > 0
+    
+    def add(self, url, priority=PRIORITY_CATEGORY, depth=0):
+        url = canonical_url(url)
+        if url in self.seen:
+            return
+        self.seen.add(url)
+        entry = (priority, depth, self.seq, url)
+        self.seq += 1
+        if len(self.heap) < self.memory_limit:
+            heapq.heappush(self.heap, entry)
+        else:
+            if self.store is None:
+                # Přetečení paměti - zbytek fronty do dočasného souboru
+                fd, self.spill = tempfile.mkstemp(suffix='.sqlite', prefix='frontier_')
+                os.close(fd)
+                self.store = CrawlState(self.spill)
+            self.store.queue_push(entry)
+            self.stored += 1
+    
+    def update(self, urls, priority=PRIORITY_CATEGORY, depth=0):
+        for url in urls:
+            self.add(url, priority, depth)
+    
+    def pop_entry(self):
+        """Vyjme nejlepší položku - (priorita, hloubka, url)"""
+        stored_head = self.store.queue_head() if self.stored else None
+        if stored_head and (not self.heap or stored_head < self.heap[0]):
+            self.store.queue_remove(stored_head[2])
+            self.stored -= 1
+            entry = stored_head
+        else:
+            entry = heapq.heappop(self.heap)
+        return entry[0], entry[1], entry[3]
+    
+    def pop(self):
+        """Vyjme další stránku k návštěvě - (url, hloubka)"""
+        priority, depth, url = self.pop_entry()
+        return url, depth
+    
+    def clear(self):
+        self.heap = []
+        if self.stored:
+            self.store.queue_clear()
+        self.stored = 0
+        self.close()
+    
+    def close(self):
+        """Zavře a smaže dočasný soubor přetečení i s odloženými položkami
+        (frontu v trvalém STATE_DB nechává být)"""
+        if self.spill is None:
+            return
+        self.store.close()
+        for suffix in ['', '-wal', '-shm']:
+            if os.path.exists(self.spill + suffix):
+                os.remove(self.spill + suffix)
+        self.store = None
+        self.spill = None
+        self.stored = 0
+
+def prepare_frontier():
+    """Převede visited_pages / pages_to_visit z obyčejných množin (starší běh,
+    reset) na kompaktní index a prioritní frontu"""
+    global visited_pages, pages_to_visit
+    if not isinstance(visited_pages, VisitedIndex):
+        visited_pages = VisitedIndex(visited_pages)
+    if not isinstance(pages_to_visit, CrawlFrontier):
+        frontier = CrawlFrontier()
+        frontier.update(pages_to_visit)
+        pages_to_visit = frontier
+
+# ===========================================================================
+# OBJEVOVÁNÍ PŘES SITEMAP
+# ===========================================================================
+
+# Obvyklá umístění sitemap, když je robots.txt neuvádí
+SITEMAP_CANDIDATES = ['/sitemap.xml', '/sitemap_index.xml', '/wp-sitemap.xml', '/sitemap-index.xml']
+
+# Vnořené sitemapy bez produktů (WordPress/Yoast, Shopify, blogy)
+SITEMAP_SKIP_RE = re.compile(
+    r'(?:post|page|product_cat|category|categories|tag|author|blog|article|clank|collection|'
+    r'taxonomies|users|kategori|znack|brand)[\w-]*(?:sitemap|\.xml)', re.I)
+
+def sitemaps_from_robots():
+    """Vrátí sitemapy uvedené v robots.txt"""
+    text = get_page(BASE_URL + '/robots.txt', retries=1, accept=None)
+    if not text:
+        return []
+    return [line.split(':', 1)[1].strip() for line in text.splitlines()
+            if line.lower().startswith('sitemap:') and ':' in line]
+
+def open_sitemap(url):
+    """Stáhne sitemapu jako proud (stream=True) - vrací response nebo None"""
+    host = urlparse(url).netloc
+    if ADAPTIVE_RATE_LIMIT:
+        waiting = time.monotonic()
+        rate_limiter.wait(url)
+        count_wait(url, time.monotonic() - waiting, 'rate_limit')
+    started = time.monotonic()
+    try:
+        with request_slots:
+            response = session.get(url, headers={'User-Agent': random.choice(USER_AGENTS)},
+                                    timeout=30, stream=True)
+    except Exception as e:
+        metrics.inc('fetch_errors_total', host=host, error=type(e).__name__)
+        if ADAPTIVE_RATE_LIMIT:
+            rate_limiter.report(url, None, time.monotonic() - started)
+        return None
+    metrics.inc('http_responses_total', host=host, status=response.status_code)
+    metrics.observe('fetch_seconds', time.monotonic() - started, host=host)
+    if ADAPTIVE_RATE_LIMIT:
+        rate_limiter.report(url, response.status_code, time.monotonic() - started,
+                            parse_retry_after(response.headers.get('Retry-After')))
+    if response.status_code != 200:
+        response.close()
+        return None
+    return response
+
+def sitemap_chunks(url):
+    """Kousky sitemapy ze sítě, nebo z RESPONSE_CACHE (dočtená sitemapa se uloží)"""
+    cached = cache_lookup(url)
+    fetch_origin.cached = cached is not None
+    if cached:
+        body = cached[1] if len(cached) > 1 else b''
+        for start in range(0, len(body), 64 * 1024):
+            yield body[start:start + 64 * 1024]
+        return
+    response = open_sitemap(url)
+    if response is None:
+        return
+    recorded = bytearray() if response_cache else None
+    try:
+        for chunk in response.iter_content(64 * 1024):
+            if recorded is not None:
+                recorded += chunk
+            yield chunk
+    finally:
+        response.close()
+    if recorded is not None:
+        response_cache.put(url, 200, bytes(recorded), response.headers, None)
+
+def iter_sitemap(url):
+    """Streamově prochází sitemapu - vrací ('url'|'sitemap', loc, lastmod)"""
+    parser = ET.XMLPullParser(events=('end',))
+    decompressor = None
+    loc = lastmod = None
+    chunks = sitemap_chunks(url)
+    try:
+        for i, chunk in enumerate(chunks):
+            # .xml.gz bývá posláno bez Content-Encoding - rozbalíme sami
+            if i == 0 and chunk[:2] == b'\x1f\x8b':
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            parser.feed(decompressor.decompress(chunk) if decompressor else chunk)
+            for event, elem in parser.read_events():
+                tag = elem.tag.rsplit('}', 1)[-1]
+                if tag == 'loc':
+                    loc = (elem.text or '').strip()
+                elif tag == 'lastmod':
+                    lastmod = (elem.text or '').strip()
+                elif tag in ('url', 'sitemap'):
+                    if loc:
+                        yield tag, loc, lastmod
+                    loc = lastmod = None
+                    # Uvolnit zpracované elementy - paměť nezávisí na velikosti sitemapy
+                    elem.clear()
+    except (ET.ParseError, zlib.error, requests.RequestException):
+        pass
+    finally:
+        chunks.close()
+
+def discover_from_sitemaps():
+    """Naplní all_product_urls ze sitemap; vrací počet nových URL"""
+    queue = sitemaps_from_robots()
+    # Bez záznamu v robots.txt zkusíme obvyklá umístění - stačí první existující
+    candidates = [] if queue else [BASE_URL + path for path in SITEMAP_CANDIDATES]
+    queue = queue or list(candidates)
+    print(f"   🗺️ Sitemapy: {len(queue)} {'(hledám)' if candidates else 'z robots.txt'}")
+    
+    seen = set()
+    before = len(all_product_urls)
+    while queue and len(seen) < MAX_SITEMAPS:
+        sitemap_url = queue.pop(0)
+        if sitemap_url in seen:
+            continue
+        seen.add(sitemap_url)
+        
+        found = 0
+        for kind, loc, lastmod in iter_sitemap(sitemap_url):
+            found += 1
+            if kind == 'sitemap':
+                if not SITEMAP_SKIP_RE.search(urlparse(loc).path):
+                    queue.append(loc)
+            else:
+                loc = canonical_url(loc, product=True)
+                if is_product_url(loc):
+                    all_product_urls.add(loc)
+                    if lastmod:
+                        url_lastmod[loc] = lastmod
+        
+        if found:
+            print(f"   ✅ {sitemap_url[:65]} ({found} záznamů, celkem produktů: {len(all_product_urls)})")
+            if sitemap_url in candidates:
+                queue = [u for u in queue if u not in candidates]
+        pause()
+        
+        if len(all_product_urls) >= MAX_PRODUCTS:
+            print(f"\n   ⚠️ Dosažen limit {MAX_PRODUCTS} produktů")
+            break
+    
+    return len(all_product_urls) - before
+
+def lastmod_order(urls):
+    """Seřadí URL podle <lastmod> - nejnověji změněné první, bez data na konec"""
+    return sorted(urls, key=lambda u: url_lastmod.get(u, ''), reverse=True)
+
+# ===========================================================================
+# EXTRAKCE DAT PRODUKTU
+# ===========================================================================
+
+# Selektory polí v pořadí priority - první použitelná shoda vyhrává
+PRODUCT_SELECTORS = {
     # === NÁZEV ===
-    name_selectors = [
+    'nazev': [
         'h1', 'h1.product-title', 'h1.product-name', 'h1.product_title',
         '[itemprop="name"]', '.p-detail-title', '.p-detail-inner h1',
         '.product-title', '.product-name', '.entry-title',
         '.product-detail h1', '.product-info h1', '.product-header h1',
         'h1.title', 'h1.name', '[data-product-name]',
-    ]
+    ],
+    # === EAN - meta tagy ===
+    'ean_meta': [
+        'meta[itemprop="gtin13"]', 'meta[itemprop="gtin"]', 'meta[itemprop="gtin8"]',
+        'meta[itemprop="ean"]', 'meta[property="product:ean"]', 'meta[property="og:ean"]',
+        'meta[name="ean"]', 'meta[name="gtin"]',
+    ],
+    # === EAN - data atributy (pořadí odpovídá EAN_DATA_ATTRS) ===
+    'ean_attr': [
+        '[data-ean]', '[data-gtin]', '[data-gtin13]', '[data-barcode]', '[data-product-ean]',
+        '[data-micro-identifier]',
+    ],
+    # === CENA ===
+    'cena': [
+        '[itemprop="price"]', 'meta[itemprop="price"]',
+        '.price-final', '.p-final', '.p-detail-price', '.p-main-price',
+        '.current-price', '.product-price', '.price', '.price-box .price',
+        '.woocommerce-Price-amount', '.amount',
+        '.price-new', '.special-price', '.offer-price', '.sale-price',
+        'ins .amount', '.price ins', '.final-price',
+        '[data-price]', '.product-price-value',
+    ],
+    # === PŮVODNÍ CENA ===
+    'cena_puvodni': [
+        '.price-standard', '.p-standard', '.p-before-price',
+        '.original-price', '.old-price', '.price-old', '.was-price',
+        '.regular-price', '.list-price', '.compare-price',
+        'del .amount', '.price del', 'del.price', 's.price', 's .amount',
+        '.price-before-discount', '.crossed-price',
+    ],
+    # === DOSTUPNOST ===
+    'dostupnost': [
+        '.availability', '.p-availability', '.stock', '.stock-status',
+        '[itemprop="availability"]', '.in-stock', '.out-of-stock',
+        '.product-availability', '.delivery-info', '.skladem', '.dostupnost',
+        '.stock-info', '.availability-status', '.product-stock',
+        '[data-availability]', '.inventory-status',
+    ],
+}
+
+EAN_DATA_ATTRS = ['data-ean', 'data-gtin', 'data-gtin13', 'data-barcode', 'data-product-ean',
+                  'data-micro-identifier']
+
+JSON_LD_SELECTOR = 'script[type="application/ld+json"]'
+
+PARAM_CONTAINER_SELECTOR = ('table, .params, .product-params, .parameters, '
+                            '.specifications, .attributes, dl, .p-params, '
+                            '.product-properties, .product-attributes')
+
+EAN_KEYS = ['gtin13', 'gtin', 'gtin8', 'gtin12', 'gtin14', 'ean', 'mpn', 'sku', 'productID']
+
+EAN_RE = re.compile(r'^\d{8,14}$')
+EAN_PARAM_RE = re.compile(r'(?:EAN|GTIN|Čárový\s*kód|Barcode)[:\s]*(\d{8,14})', re.I)
+EAN_HTML_PATTERNS = [re.compile(p) for p in [
+    r'"gtin13"\s*:\s*"?(\d{13})"?',
+    r'"gtin"\s*:\s*"?(\d{8,14})"?',
+    r'"ean"\s*:\s*"?(\d{8,14})"?',
+    r'data-ean="(\d{8,14})"',
+    r'data-gtin="(\d{8,14})"',
+    r'>EAN[:\s]*(\d{8,14})<',
+]]
+
+class SelectorPlan:
+    """Předkompilovaný plán selektorů - všechna pole jedním průchodem dokumentem.
+    
+    Selektory jsou zaindexované podle klíče své nejpravější části (třída,
+    atribut nebo tag). Při průchodu se každý element zkouší jen proti
+    selektorům, jejichž klíč na něm je, místo ~90 samostatných select_one().
+    Pro každý selektor vrací první shodu v pořadí dokumentu - totéž co
+    soup.select_one(selector). Selektory, jejichž nejpravější část není
+    prostá kombinace tagu, tříd, id a atributů (seznamy s čárkou,
+    pseudotřídy, kombinátory bez mezer...), jdou mimo index přes select_one().
+    """
+    
+    # Prostá nejpravější část: tag / * a za ním .třída, #id, [atribut] nebo [atribut=hodnota]
+    SIMPLE_COMPOUND_RE = re.compile(
+        r'(?:[\w-]+|\*)?(?:\.[\w-]+|#[\w-]+|\[[\w-]+(?:[~|^$*]?=(?:"[^"\]\s]*"|\'[^\'\]\s]*\'|[\w-]+))?\])*')
+    
+    def __init__(self, fields, collect_all=None):
+        self.sizes = {field: len(selectors) for field, selectors in fields.items()}
+        # Pole, kde potřebujeme všechny shody (např. všechny JSON-LD skripty)
+        self.collect_all = list(collect_all or {})
+        self.index = {}
+        self.generic = []   # Selektory mimo index - samostatné select_one()
+        for field, selectors in list(fields.items()) + list((collect_all or {}).items()):
+            for idx, selector in enumerate(selectors):
+                key = self.selector_key(selector)
+                entry = (field, idx, sv.compile(selector))
+                if key is None:
+                    self.generic.append(entry)
+                else:
+                    self.index.setdefault(key, []).append(entry)
+    
+    @classmethod
+    def selector_key(cls, selector):
+        """Klíč nejpravější části selektoru - ('class'|'attr'|'tag', název),
+        None = selektor nejde spolehlivě zaindexovat"""
+        parts = selector.split()
+        if not parts or ',' in selector or not cls.SIMPLE_COMPOUND_RE.fullmatch(parts[-1]):
+            return None
+        # Třída/atribut jen mimo hodnoty atributů ([data-x="a.b"])
+        bare = re.sub(r'=[^\]]*\]', ']', parts[-1])
+        match = re.search(r'\.([\w-]+)', bare)
+        if match:
+            return ('class', match.group(1).lower())
+        match = re.search(r'#([\w-]+)', bare)
+        if match:
+            return ('attr', 'id')
+        match = re.search(r'\[([\w-]+)', bare)
+        if match:
+            return ('attr', match.group(1).lower())
+        match = re.match(r'[\w-]+', bare)
+        return ('tag', match.group(0).lower()) if match else None
+    
+    def element_keys(self, el):
+        yield ('tag', el.name)
+        for name, value in el.attrs.items():
+            yield ('attr', name.lower())
+            if name == 'class':
+                for cls in (value if isinstance(value, list) else value.split()):
+                    yield ('class', cls.lower())
+    
+    def match(self, soup):
+        """Vrátí {pole: [první element pro každý selektor nebo None]}"""
+        result = {field: [None] * size for field, size in self.sizes.items()}
+        result.update({field: [] for field in self.collect_all})
+        index = self.index
+        
+        for el in soup.descendants:
+            if el.name is None:
+                continue  # Text, komentáře
+            for key in self.element_keys(el):
+                for field, idx, selector in index.get(key, ()):
+                    if field in self.collect_all:
+                        if selector.match(el):
+                            result[field].append(el)
+                    elif result[field][idx] is None and selector.match(el):
+                        result[field][idx] = el
+        for field, idx, selector in self.generic:
+            if field in self.collect_all:
+                result[field].extend(selector.select(soup))
+            else:
+                result[field][idx] = selector.select_one(soup)
+        return result
+
+# Selektory detailu, které patří jen dané platformě - v profilu jiné
+# platformy se vynechají. Nezařazené selektory jsou obecné a platí vždy.
+PLATFORM_PRODUCT_SELECTORS = {
+    'shoptet': {
+        '.p-detail-title', '.p-detail-inner h1', '.price-final', '.p-final',
+        '.p-detail-price', '.p-main-price', '.price-standard', '.p-standard',
+        '.p-before-price', '.p-availability',
+    },
+    'woocommerce': {
+        'h1.product_title', '.entry-title', '.woocommerce-Price-amount', '.amount',
+        'ins .amount', '.price ins', 'del .amount', '.price del', 's .amount',
+        '.stock', '.in-stock', '.out-of-stock',
+    },
+    'prestashop': {
+        '.current-price', '.regular-price', '.product-availability',
+        '.price-before-discount',
+    },
+    'shopify': {
+        '.sale-price', '.compare-price', '.was-price', '.product-price-value',
+        '.inventory-status',
+    },
+}
+
+# Pole, která musí profil platformy najít - jinak se zkusí všechny selektory
+PROFILE_REQUIRED_FIELDS = ['nazev', 'cena']
+
+selector_profiles = {}
+selector_plans = {}
+
+def product_selector_profile(platform):
+    """PRODUCT_SELECTORS bez selektorů, které patří jen jiným platformám"""
+    if platform not in PLATFORM_PRODUCT_SELECTORS:
+        return PRODUCT_SELECTORS
+    if platform not in selector_profiles:
+        own = PLATFORM_PRODUCT_SELECTORS[platform]
+        foreign = set().union(*(selectors for other, selectors in PLATFORM_PRODUCT_SELECTORS.items()
+                                if other != platform))
+        selector_profiles[platform] = {
+            field: [sel for sel in selectors if sel in own or sel not in foreign]
+            for field, selectors in PRODUCT_SELECTORS.items()
+        }
+    return selector_profiles[platform]
+
+def get_selector_plan(platform):
+    """Zkompilovaný plán pro profil platformy (kompiluje se jednou, při prvním použití)"""
+    if platform not in selector_plans:
+        selector_plans[platform] = SelectorPlan(
+            product_selector_profile(platform),
+            collect_all={'ld_json': [JSON_LD_SELECTOR]},
+        )
+    return selector_plans[platform]
+
+def field_candidates(soup, matches, profile, field):
+    """Kandidátní elementy pole v pořadí selektorů (None = selektor nic nenašel)"""
+    if matches is not None:
+        return matches[field]
+    # Původní chování - samostatné select_one() pro každý selektor
+    return (soup.select_one(sel) for sel in profile[field])
+
+def find_ean_recursive(obj):
+    """Najde EAN/GTIN v libovolně zanořených JSON-LD datech"""
+    if isinstance(obj, dict):
+        for key in EAN_KEYS:
+            if key in obj and obj[key]:
+                val = str(obj[key]).strip()
+                if EAN_RE.match(val):
+                    return val
+        for v in obj.values():
+            result = find_ean_recursive(v)
+            if result:
+                return result
+    elif isinstance(obj, list):
+        for item in obj:
+            result = find_ean_recursive(item)
+            if result:
+                return result
+    return None
+
+def count_selector(field, selector):
+    metrics.inc('selector_hits_total', field=field, selector=selector)
+
+def resolve_fields(soup, matches, profile, data):
+    """Doplní do data prázdná pole z kandidátů selektorového profilu.
+    
+    Do metrik jde, kolikrát se pole hledalo a který selektor ho našel.
+    """
+    # === NÁZEV ===
+    if not data['nazev']:
+        metrics.inc('selector_lookups_total', field='nazev')
+        for idx, el in enumerate(field_candidates(soup, matches, profile, 'nazev')):
+            try:
+                if el:
+                    # Preferuj atribut nebo přímý text
+                    text = el.get('content') or el.get('data-product-name') or el.get_text(strip=True)
+                    if text and len(text) > 2 and len(text) < 500:
+                        data['nazev'] = clean_text(text)
+                        count_selector('nazev', profile['nazev'][idx])
+                        break
+            except:
+                pass
+    
+    if not data['nazev']:
+        return
+    
+    # === EAN / GTIN ===
+    # 1. JSON-LD strukturovaná data
+    if not data['ean']:
+        metrics.inc('selector_lookups_total', field='ean')
+        scripts = matches['ld_json'] if matches is not None else soup.select(JSON_LD_SELECTOR)
+        for script in scripts:
+            try:
+                json_text = script.string or ''
+                if not json_text.strip():
+                    continue
+                ean = find_ean_recursive(json.loads(json_text))
+                if ean:
+                    data['ean'] = ean
+                    count_selector('ean', JSON_LD_SELECTOR)
+                    break
+            except:
+                pass
+    
+    # 2. Meta tagy
+    if not data['ean']:
+        for idx, el in enumerate(field_candidates(soup, matches, profile, 'ean_meta')):
+            try:
+                if el and el.get('content'):
+                    val = el.get('content').strip()
+                    if EAN_RE.match(val):
+                        data['ean'] = val
+                        count_selector('ean', profile['ean_meta'][idx])
+                        break
+            except:
+                pass
+    
+    # 3. Data atributy
+    if not data['ean']:
+        for idx, (attr, el) in enumerate(zip(EAN_DATA_ATTRS, field_candidates(soup, matches, profile, 'ean_attr'))):
+            try:
+                if el:
+                    val = el.get(attr, '').strip()
+                    if EAN_RE.match(val):
+                        data['ean'] = val
+                        count_selector('ean', profile['ean_attr'][idx])
+                        break
+            except:
+                pass
+    
+    # === CENA ===
+    if not data['cena']:
+        metrics.inc('selector_lookups_total', field='cena')
+        for idx, el in enumerate(field_candidates(soup, matches, profile, 'cena')):
+            try:
+                if el:
+                    # Zkus content atribut, data atribut, nebo text
+                    price = el.get('content') or el.get('data-price') or el.get_text(strip=True)
+                    cleaned = clean_price(price)
+                    if cleaned:
+                        try:
+                            if float(cleaned) > 0:
+                                data['cena'] = cleaned
+                                count_selector('cena', profile['cena'][idx])
+                                break
+                        except:
+                            pass
+            except:
+                pass
+    
+    # === PŮVODNÍ CENA ===
+    if not data['cena_puvodni']:
+        metrics.inc('selector_lookups_total', field='cena_puvodni')
+        for idx, el in enumerate(field_candidates(soup, matches, profile, 'cena_puvodni')):
+            try:
+                if el:
+                    price = clean_price(el.get_text(strip=True))
+                    if price:
+                        try:
+                            if float(price) > 0:
+                                data['cena_puvodni'] = price
+                                count_selector('cena_puvodni', profile['cena_puvodni'][idx])
+                                break
+                        except:
+                            pass
+            except:
+                pass
+    
+    # === DOSTUPNOST ===
+    if not data['dostupnost']:
+        metrics.inc('selector_lookups_total', field='dostupnost')
+        for idx, el in enumerate(field_candidates(soup, matches, profile, 'dostupnost')):
+            try:
+                if el:
+                    text = el.get('content') or el.get('data-availability') or el.get_text(strip=True)
+                    if text:
+                        data['dostupnost'] = clean_text(text)[:100]  # Omezit délku
+                        count_selector('dostupnost', profile['dostupnost'][idx])
+                        break
+            except:
+                pass
+
+# --- Strukturovaná data (JSON-LD / microdata / OpenGraph) ---
+
+SCHEMA_AVAILABILITY = {
+    'instock': 'Skladem', 'outofstock': 'Vyprodáno', 'preorder': 'Předobjednávka',
+    'backorder': 'Na objednávku', 'limitedavailability': 'Omezená dostupnost',
+    'discontinued': 'Nedostupné', 'in stock': 'Skladem', 'out of stock': 'Vyprodáno',
+}
+
+# JSON-LD se z HTML vytáhne regexem - pro rychlou cestu se DOM vůbec nestaví
+JSON_LD_RE = re.compile(
+    r'<script[^>]+type=["\']?application/ld\+json["\']?[^>]*>(.*?)</script>', re.S | re.I)
+CANONICAL_LINK_RE = re.compile(r'<link\b[^>]*\brel=["\']?canonical\b[^>]*>', re.I)
+HREF_RE = re.compile(r'\bhref=["\']?([^"\'\s>]+)', re.I)
+
+MICRODATA_PRODUCT_SELECTOR = '[itemtype*="schema.org/Product"]'
+MICRODATA_GTIN_PROPS = ['gtin13', 'gtin', 'gtin8', 'gtin12', 'gtin14']
+OPENGRAPH_EAN_PROPS = ['product:ean', 'product:gtin', 'product:upc', 'og:upc']
+
+extraction_stats = {'json-ld': 0, 'microdata': 0, 'opengraph': 0, 'selektory': 0,
+                    'ean_tabulka': 0, 'ean_regex': 0}
+extraction_lock = threading.Lock()
+
+def count_extraction(strategy):
+    with extraction_lock:
+        extraction_stats[strategy] += 1
+
+def schema_price(value):
+    """Cena ze strukturovaných dat ve stejném tvaru jako z textu stránky.
+    
+    Číslo s desetinnou tečkou (schema.org, API) se bere doslova - 12.345
+    není 12345 jako v textu s tečkou jako oddělovačem tisíců; ostatní
+    hodnoty ('1 299,00 Kč') projdou clean_price().
+    """
+    text = str(value).strip() if value is not None else ''
+    if re.fullmatch(r'\d+(?:\.\d+)?', text):
+        return normalize_price(text)
+    return clean_price(value)
+
+def schema_availability(value):
+    """schema.org / OpenGraph dostupnost -> text jako na webu"""
+    key = str(value or '').strip().rstrip('/').rsplit('/', 1)[-1]
+    return SCHEMA_AVAILABILITY.get(key.lower(), key)
+
+def is_schema_product(obj):
+    kind = obj.get('@type')
+    kinds = kind if isinstance(kind, list) else [kind]
+    return any(k in ('Product', 'ProductGroup', 'IndividualProduct') for k in kinds)
+
+def find_schema_product(obj):
+    """První Product v JSON-LD (i v @graph nebo seznamu)"""
+    if isinstance(obj, list):
+        for item in obj:
+            found = find_schema_product(item)
+            if found:
+                return found
+    elif isinstance(obj, dict):
+        if is_schema_product(obj):
+            return obj
+        return find_schema_product(obj.get('@graph'))
+    return None
+
+def fill_from_schema(item, data):
+    """Doplní prázdná pole záznamu z JSON-LD položky typu Product"""
+    if not data['nazev'] and item.get('name'):
+        # Stejná mez jako u selektorů - prázdný název ani celý popis nestačí
+        name = clean_text(str(item['name']))
+        if 2 < len(name) < 500:
+            data['nazev'] = name
+    if not data['ean']:
+        data['ean'] = find_ean_recursive(item) or ''
+    
+    offers = item.get('offers') or {}
+    if isinstance(offers, list):
+        offers = offers[0] if offers else {}
+    if not isinstance(offers, dict):
+        return
+    if not data['cena']:
+        data['cena'] = schema_price(offers.get('price') or offers.get('lowPrice') or '')
+    if not data['cena_puvodni']:
+        specs = offers.get('priceSpecification') or []
+        for spec in specs if isinstance(specs, list) else [specs]:
+            if isinstance(spec, dict) and str(spec.get('priceType', '')).endswith(('StrikethroughPrice', 'ListPrice')):
+                data['cena_puvodni'] = schema_price(spec.get('price'))
+                break
+    if not data['dostupnost'] and offers.get('availability'):
+        data['dostupnost'] = schema_availability(offers['availability'])
+
+def fill_from_jsonld(html, data):
+    """JSON-LD Product přímo z HTML (bez BeautifulSoup)"""
+    for block in JSON_LD_RE.findall(html):
+        try:
+            item = find_schema_product(json.loads(block))
+        except ValueError:
+            continue
+        if item:
+            fill_from_schema(item, data)
+            return
+
+def fill_from_microdata(soup, data, html):
+    """Doplní pole z microdata itemtype="schema.org/Product\""""
+    if 'schema.org/Product' not in html:
+        return
+    scope = soup.select_one(MICRODATA_PRODUCT_SELECTOR)
+    if not scope:
+        return
+    
+    def prop(name):
+        el = scope.find(attrs={'itemprop': name})
+        if not el:
+            return ''
+        return (el.get('content') or el.get('href') or el.get_text(strip=True) or '').strip()
+    
+    if not data['nazev']:
+        name = prop('name')
+        if 2 < len(name) < 500:
+            data['nazev'] = clean_text(name)
+    if not data['ean']:
+        for name in MICRODATA_GTIN_PROPS:
+            val = prop(name)
+            if EAN_RE.match(val):
+                data['ean'] = val
+                break
+    if not data['cena']:
+        data['cena'] = schema_price(prop('price'))
+    if not data['dostupnost']:
+        data['dostupnost'] = schema_availability(prop('availability'))
+
+def fill_from_opengraph(soup, data, html):
+    """Doplní pole z OpenGraph meta tagů (og:type product)"""
+    if 'og:type' not in html:
+        return
+    meta = {}
+    for el in (soup.head or soup).find_all('meta', property=True):
+        meta.setdefault(el['property'].lower(), (el.get('content') or '').strip())
+    if not meta.get('og:type', '').startswith('product'):
+        return
+    
+    if not data['nazev']:
+        title = clean_text(meta.get('og:title', ''))
+        if 2 < len(title) < 500:
+            data['nazev'] = title
+    if not data['ean']:
+        for name in OPENGRAPH_EAN_PROPS:
+            if EAN_RE.match(meta.get(name, '')):
+                data['ean'] = meta[name]
+                break
+    if not data['cena']:
+        data['cena'] = schema_price(meta.get('product:price:amount') or meta.get('og:price:amount'))
+    if not data['dostupnost'] and meta.get('product:availability'):
+        data['dostupnost'] = schema_availability(meta['product:availability'])
+
+def structured_complete(data):
+    return all(data[field] for field in STRUCTURED_REQUIRED_FIELDS)
+
+def selector_hints(selector):
+    """Vzory, které HTML musí obsahovat, aby selektor mohl něco najít"""
+    hints = [re.escape(name.lower()) for name in re.findall(r'\.([\w-]+)', selector)]
+    hints += [f'<{tag.lower()}[\\s/>]' for tag in re.findall(r'(?:^|[\s>+~])([a-zA-Z][\w-]*)', selector)]
+    return [re.compile(hint) for hint in hints]
+
+# Původní cena bývá jen v HTML - bez jejích tříd/tagů na stránce ji selektory nenajdou
+ORIGINAL_PRICE_HINTS = [selector_hints(sel) for sel in PRODUCT_SELECTORS['cena_puvodni']]
+
+def may_have_original_price(html):
+    """Mohou selektory původní ceny na stránce něco najít? (rychlý test bez DOM)"""
+    lowered = html.lower()
+    return any(all(hint.search(lowered) for hint in hints) for hints in ORIGINAL_PRICE_HINTS)
+
+def structured_done(data, html):
+    """Strukturovaná data stačí - povinná pole jsou a původní cenu nemá kde hledat"""
+    return bool(data['cena_puvodni']) or not may_have_original_price(html)
+
+def finish_record(html, url, data):
+    """Společný závěr - sleva a kanonická URL"""
+    fill_discount(data)
+    if USE_REL_CANONICAL:
+        link = CANONICAL_LINK_RE.search(html)
+        href = HREF_RE.search(link.group(0)) if link else None
+        if href:
+            canonical = canonical_url(urljoin(url, unescape(href.group(1))), product=True)
+            if urlparse(canonical).netloc == urlparse(url).netloc:
+                data['url'] = canonical
+    return data
+
+class JsonLdEarlyStop:
+    """Test předčasného konce stahování detailu (EARLY_STOP).
+    
+    Jakmile je za </head> kompletní JSON-LD Product se všemi poli
+    STRUCTURED_REQUIRED_FIELDS, zbytek stránky (inline JS, patička)
+    se už nestahuje. Prochází jen nově přijaté bloky, ne celý buffer.
+    """
+    
+    def __init__(self):
+        self.pos = 0
+        self.head_closed = False
+        self.complete = False
+    
+    def __call__(self, buffer):
+        if not self.head_closed:
+            self.head_closed = buffer.find(b'</head>') >= 0 or buffer.find(b'</HEAD>') >= 0
+        while not self.complete:
+            start = buffer.find(b'application/ld+json', self.pos)
+            if start < 0:
+                # Značka může být rozdělená mezi dva kousky
+                self.pos = max(self.pos, len(buffer) - 32)
+                break
+            body_start = buffer.find(b'>', start)
+            end = buffer.find(b'</script>', body_start) if body_start >= 0 else -1
+            if end < 0:
+                break                   # Blok ještě nedorazil celý
+            self.pos = end
+            try:
+                item = find_schema_product(json.loads(bytes(buffer[body_start + 1:end]).decode('utf-8', 'ignore')))
+            except ValueError:
+                continue
+            if item:
+                data = empty_record('')
+                fill_from_schema(item, data)
+                self.complete = structured_complete(data)
+        return self.complete and self.head_closed
+
+def product_early_stop():
+    """Továrna na test předčasného konce pro detail produktu (None = číst celé)"""
+    return JsonLdEarlyStop if EARLY_STOP and STRUCTURED_FIRST else None
+
+def fill_discount(data):
+    """Dopočítá slevu z aktuální a původní ceny"""
+    if data['cena'] and data['cena_puvodni']:
+        try:
+            curr = float(data['cena'])
+            orig = float(data['cena_puvodni'])
+            if orig > curr > 0:
+                discount = ((orig - curr) / orig) * 100
+                data['sleva'] = f"{discount:.0f}%"
+        except:
+            pass
+
+def empty_record(url):
+    """Prázdný záznam produktu se všemi výstupními poli"""
+    return {'nazev': '', 'ean': '', 'cena': '', 'cena_puvodni': '', 'sleva': '',
+            'dostupnost': '', 'url': url}
+
+def parse_product(html, url):
+    """Extrahuje data produktu z již stažené HTML stránky (čas jde do metrik)"""
+    started = time.perf_counter()
+    try:
+        return parse_product_fields(html, url)
+    finally:
+        metrics.observe('parse_seconds', time.perf_counter() - started)
+
+def parse_product_fields(html, url):
+    """Strukturovaná data, selektory a záložní regexy - viz parse_product()"""
+    data = empty_record(url)
+    strategy = None
+    
+    # Rychlá cesta - kompletní JSON-LD Product, DOM se vůbec nestaví
+    if STRUCTURED_FIRST:
+        fill_from_jsonld(html, data)
+        if structured_complete(data):
+            strategy = 'json-ld'
+            if structured_done(data, html):
+                count_extraction(strategy)
+                return finish_record(html, url, data)
+    
+    soup = BeautifulSoup(html, HTML_PARSER)
+    
+    if STRUCTURED_FIRST and not strategy:
+        for name, fill in (('microdata', fill_from_microdata), ('opengraph', fill_from_opengraph)):
+            fill(soup, data, html)
+            if structured_complete(data):
+                strategy = name
+                if structured_done(data, html):
+                    count_extraction(strategy)
+                    return finish_record(html, url, data)
+                break
+    
+    # Nejdřív jen selektory detekované platformy
+    profile = product_selector_profile(site_platform)
+    matches = get_selector_plan(site_platform).match(soup) if SELECTOR_PLAN else None
+    resolve_fields(soup, matches, profile, data)
+    
+    # Profil platformy minul - chybějící pole doplní všechny selektory
+    if profile is not PRODUCT_SELECTORS and not all(data[f] for f in PROFILE_REQUIRED_FIELDS):
+        matches = get_selector_plan(None).match(soup) if SELECTOR_PLAN else None
+        resolve_fields(soup, matches, PRODUCT_SELECTORS, data)
+    
+    if not data['nazev']:
+        return None
+    # Selektory doplnily jen chybějící pole - zdrojem je první úplná strukturovaná data
+    count_extraction(strategy or 'selektory')
+    
+    # === EAN / GTIN - záložní metody bez selektorového profilu ===
+    # 4. Tabulka parametrů
+    if not data['ean']:
+        for container in soup.select(PARAM_CONTAINER_SELECTOR):
+            try:
+                text = container.get_text(separator=' ')
+                match = EAN_PARAM_RE.search(text)
+                if match:
+                    data['ean'] = match.group(1)
+                    count_extraction('ean_tabulka')
+                    break
+            except:
+                pass
+    
+    # 5. Regex v celém HTML
+    if not data['ean']:
+        for pattern in EAN_HTML_PATTERNS:
+            match = pattern.search(html)
+            if match:
+                data['ean'] = match.group(1)
+                count_extraction('ean_regex')
+                break
+    
+    # === SLEVA A KANONICKÁ URL ===
+    return finish_record(html, url, data)
+
+# ===========================================================================
+# EXTRAKCE Z VÝPISU KATEGORIÍ (bez stahování detailů)
+# ===========================================================================
+
+# Dlaždice produktu ve výpisu podle platformy
+TILE_SELECTORS = {
+    'shoptet': ['.products .product', '.product[data-micro="product"]'],
+    'woocommerce': ['ul.products li.product', '.products .type-product'],
+    'prestashop': ['.product-miniature', '.js-product-miniature'],
+    'shopify': ['.product-card', '.grid-product', '.card-wrapper'],
+    'generic': ['[itemtype*="schema.org/Product"]', '.product-item', '.product-card',
+                '.product-tile', '.product-box'],
+}
+
+# Pole uvnitř dlaždice (stejné klíče jako PRODUCT_SELECTORS pro resolve_fields)
+TILE_FIELD_SELECTORS = {
+    'nazev': [
+        '[itemprop="name"]', '.p-name', '.woocommerce-loop-product__title',
+        '.product-title', '.product-name', '.product-card__title', '.name', 'h2', 'h3',
+    ],
+    'ean_meta': ['meta[itemprop="gtin13"]', 'meta[itemprop="gtin"]', 'meta[itemprop="gtin8"]'],
+    'ean_attr': [
+        '[data-ean]', '[data-gtin]', '[data-gtin13]', '[data-barcode]', '[data-product-ean]',
+        '[data-micro-identifier]',
+    ],
+    'cena': [
+        '[itemprop="price"]', '.price-final', '.price ins .amount', '.price .amount',
+        '.product-price', '.price-item--sale', '.price',
+    ],
+    'cena_puvodni': [
+        '.price-standard', '.price del .amount', '.regular-price', '.price-old',
+        '.price-item--regular', 'del',
+    ],
+    'dostupnost': ['.availability', '.stock', '[itemprop="availability"]', '.product-availability'],
+}
+
+def listing_tile_record(tile, page_url):
+    """Záznam z jedné dlaždice výpisu (None = dlaždice bez odkazu na produkt)"""
+    product_url = None
+    for link in tile.find_all('a', href=True):
+        candidate = canonical_url(urljoin(page_url, link['href']), product=True)
+        if is_product_url(candidate):
+            product_url = candidate
+            break
+    if not product_url:
+        return None
+    
+    data = empty_record(product_url)
+    resolve_fields(tile, None, TILE_FIELD_SELECTORS, data)
+    # EAN bývá přímo na dlaždici nebo na vnořeném prvku (Shoptet .p) - první
+    # shoda selektoru nemusí být EAN, proto se projdou všechny prvky s atributem
+    if not data['ean']:
+        for attr in EAN_DATA_ATTRS:
+            for el in [tile] + tile.find_all(attrs={attr: True}):
+                val = (el.get(attr) or '').strip()
+                if EAN_RE.match(val):
+                    data['ean'] = val
+                    break
+            if data['ean']:
+                break
+    return data
+
+def itemlist_records(soup, page_url):
+    """Záznamy z JSON-LD ItemList (Product položky výpisu)"""
+    records = {}
+    
+    def collect(obj):
+        if isinstance(obj, list):
+            for item in obj:
+                collect(item)
+        elif isinstance(obj, dict):
+            if obj.get('@type') == 'ItemList':
+                for element in obj.get('itemListElement') or []:
+                    if isinstance(element, dict):
+                        add(element.get('item') if isinstance(element.get('item'), dict) else element)
+            else:
+                collect(obj.get('@graph'))
+    
+    def add(item):
+        if not item.get('url') or not item.get('name'):
+            return
+        product_url = canonical_url(urljoin(page_url, item['url']), product=True)
+        if not is_product_url(product_url):
+            return
+        data = empty_record(product_url)
+        fill_from_schema(item, data)
+        records[product_url] = data
+    
+    for script in soup.select(JSON_LD_SELECTOR):
+        try:
+            collect(json.loads(script.string or ''))
+        except:
+            pass
+    return records
+
+def extract_listing_products(soup, page_url):
+    """Záznamy produktů přímo z výpisu kategorie - {url: záznam}.
+    
+    Strukturovaný JSON-LD ItemList má přednost, dlaždice doplní chybějící
+    pole (typicky původní cenu a dostupnost).
+    """
+    records = itemlist_records(soup, page_url)
+    
+    families = [site_platform, 'generic'] if site_platform in TILE_SELECTORS else list(TILE_SELECTORS)
+    seen_tiles = set()
+    for family in families:
+        for selector in TILE_SELECTORS[family]:
+            for tile in soup.select(selector):
+                if id(tile) in seen_tiles:
+                    continue
+                seen_tiles.add(id(tile))
+                data = listing_tile_record(tile, page_url)
+                if not data:
+                    continue
+                known = records.setdefault(data['url'], data)
+                for field, value in data.items():
+                    if value and not known[field]:
+                        known[field] = value
+        if records and family == site_platform:
+            break
+    
+    for data in records.values():
+        fill_discount(data)
+    return records
+
+def record_listing_products(soup, page_url):
+    """Uloží kompletní záznamy z výpisu; vrací počet, kterým odpadne stažení detailu"""
+    recorded = 0
+    for product_url, data in extract_listing_products(soup, page_url).items():
+        all_product_urls.add(product_url)
+        if product_url in processed_urls:
+            continue
+        if data['nazev'] and all(data[field] for field in LISTING_REQUIRED_FIELDS):
+            record_product(product_url, data)
+            recorded += 1
+    return recorded
+
+# ===========================================================================
+# INKREMENTÁLNÍ STAHOVÁNÍ (ETag / Last-Modified / hash / lastmod)
+# ===========================================================================
+
+class PageValidators:
+    """Trvalý záznam validátorů a posledního výsledku pro každou URL (SQLite).
+    
+    Ukládá ETag, Last-Modified, hash obsahu, <lastmod> ze sitemap a poslední
+    extrahovaný záznam, aby další běh mohl neměněné stránky přeskočit.
+    """
+    
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                etag TEXT,
+                last_modified TEXT,
+                content_hash TEXT,
+                lastmod TEXT,
+                record TEXT,
+                checked_at TEXT
+            )''')
+        self.conn.commit()
+        self.pending = 0
+    
+    def get(self, url):
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT etag, last_modified, content_hash, lastmod, record FROM pages WHERE url = ?',
+                (url,)).fetchone()
+        if not row:
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'content_hash': row[2],
+            'lastmod': row[3],
+            'record': json.loads(row[4]) if row[4] else None,
+        }
+    
+    def put(self, url, etag, last_modified, content_hash, lastmod, record):
+        with self.lock:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (url, etag, last_modified, content_hash, lastmod,
+                 json.dumps(record, ensure_ascii=False) if record else None,
+                 datetime.now().isoformat(timespec='seconds')))
+            self.pending += 1
+            # Zápis po dávkách - commit na každou URL by brzdil
+            if self.pending >= 100:
+                self.conn.commit()
+                self.pending = 0
+    
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+
+def open_page_validators():
+    return PageValidators(INCREMENTAL_DB) if INCREMENTAL else None
+
+page_validators = open_page_validators()
+
+# Kolik produktů se díky inkrementálnímu režimu nemuselo znovu zpracovat
+incremental_stats = {'lastmod': 0, '304': 0, 'hash': 0, 'changed': 0}
+incremental_lock = threading.Lock()
+
+def count_incremental(reason):
+    with incremental_lock:
+        incremental_stats[reason] += 1
+
+def fetch_product_incremental(url):
+    """Síťová část inkrementálního režimu - neměněné stránky nestahuje/neparsuje.
+    
+    Vrací (záznam, None, None) bez parsování, nebo (None, html, validátory)
+    pro stránku, kterou je třeba parsovat a pak uložit přes store_product().
+    """
+    known = page_validators.get(url)
+    lastmod = url_lastmod.get(url)
+    previous = known['record'] if known else None
+    
+    # 1. Sitemap hlásí stejný <lastmod> jako minule - ani nestahujeme
+    if previous and TRUST_LASTMOD and lastmod and lastmod == known['lastmod']:
+        count_incremental('lastmod')
+        return previous, None, None
+    
+    # 2. Podmíněný požadavek - server odpoví 304 bez těla
+    conditional = {}
+    if previous and known['etag']:
+        conditional['If-None-Match'] = known['etag']
+    if previous and known['last_modified']:
+        conditional['If-Modified-Since'] = known['last_modified']
+    status, html, headers = fetch_page(url, extra_headers=conditional, early_stop=product_early_stop())
+    
+    if status == 304 and previous:
+        count_incremental('304')
+        page_validators.put(url, known['etag'], known['last_modified'],
+                            known['content_hash'], lastmod, previous)
+        return previous, None, None
+    if not html:
+        return None, None, None
+    
+    # 3. Stejný obsah (server neposílá validátory) - neparsujeme znovu
+    content_hash = hashlib.blake2b(html.encode('utf-8', errors='ignore'), digest_size=16).hexdigest()
+    validators = (headers.get('ETag'), headers.get('Last-Modified'), content_hash, lastmod)
+    if previous and content_hash == known['content_hash']:
+        count_incremental('hash')
+        page_validators.put(url, *validators, previous)
+        return previous, None, None
+    
+    count_incremental('changed')
+    return None, html, validators
+
+def fetch_product(url):
+    """Síťová část FÁZE 2 - (hotový záznam, None, None) nebo (None, html, validátory)"""
+    if page_validators:
+        return fetch_product_incremental(url)
+    return None, get_page(url, early_stop=product_early_stop()), None
+
+def store_product(url, data, validators):
+    """Po parsování uloží validátory inkrementálního režimu"""
+    if validators and page_validators:
+        page_validators.put(url, *validators, data)
+
+def extract_product_data(url):
+    """Extrahuje data z produktové stránky"""
+    data, html, validators = fetch_product(url)
+    if not html:
+        return data
+    data = parse_product(html, url)
+    store_product(url, data, validators)
+    return data
+
+def record_product(url, data):
+    """Zapíše výsledek jedné URL z FÁZE 2.
+    
+    Detail s jinou <link rel="canonical"> se zapíše pod kanonickou URL;
+    je-li ta už zpracovaná, jde o duplicitu a záznam se zahodí.
+    """
+    global canonical_duplicates
+    # Záznam i všechny značky zpracování v jednom commitu STATE_DB - jinak by
+    # po pádu mezi nimi pokračování produkt stáhlo a zapsalo znovu
+    with crawl_state.deferred() if crawl_state else nullcontext():
+        if data and data['nazev']:
+            canonical = data['url']
+            if canonical != url and canonical in processed_urls:
+                canonical_duplicates += 1
+            else:
+                products_data.append(data)
+                if canonical != url:
+                    # Kanonickou URL už nestahovat, pokud na ni ještě dojde řada
+                    all_product_urls.add(canonical)
+                    processed_urls.add(canonical)
+        processed_urls.add(url)
+
+# ===========================================================================
+# ZÁZNAMY PRODUKTŮ (sloupcové úložiště)
+# ===========================================================================
+
+class ProductStore:
+    """products_data po sloupcích místo seznamu slovníků.
+    
+    Ceny jsou float64 (NaN = chybí) s počtem desetinných míst původního
+    textu, sleva celé procento (-1 = není), dostupnost kód do tabulky
+    internovaných textů; název, EAN a URL jsou seznamy řetězců. Text, který
+    čísla přesně nevrátí, se drží zvlášť v texts - záznam se tak vrací
+    znak po znaku stejný, jak ho vytvořil parse_product(). Navenek se
+    chová jako dřívější seznam slovníků (append, len, iterace, index i řez
+    vrací slovníky), souhrn a export běží nad celými sloupci.
+    """
+    
+    def __init__(self, records=()):
+        self.nazev = []
+        self.ean = []
+        self.url = []
+        self.cena = array('d')
+        self.cena_puvodni = array('d')
+        self.places = {'cena': array('b'), 'cena_puvodni': array('b')}   # -1 = bez tečky
+        self.sleva = array('i')
+        self.dostupnost = array('I')
+        self.availability = []          # kód -> text dostupnosti
+        self.availability_codes = {}    # text -> kód
+        self.texts = {}                 # (pole, index) -> původní text, který sloupec nevyjádří
+        for record in records:
+            self.add(record)
+    
+    @staticmethod
+    def parse_price(text):
+        try:
+            return float(text) if text else math.nan
+        except ValueError:
+            return math.nan
+    
+    @staticmethod
+    def format_price(value, places=-1):
+        """Cena zpět jako text se stejným počtem desetinných míst jako vstup"""
+        if not math.isfinite(value):
+            return ''
+        return str(int(value)) if places < 0 else f'{value:.{places}f}'
+    
+    def add_price(self, field, text):
+        text = text or ''
+        value = self.parse_price(text)
+        places = len(text) - text.index('.') - 1 if '.' in text else -1
+        places = min(places, 127)
+        index = len(self)
+        getattr(self, field).append(value)
+        self.places[field].append(places)
+        if self.format_price(value, places) != text:
+            self.texts[(field, index)] = text
+    
+    def add(self, record):
+        index = len(self)
+        self.add_price('cena', record.get('cena'))
+        self.add_price('cena_puvodni', record.get('cena_puvodni'))
+        discount = record.get('sleva') or ''
+        number = discount[:-1] if discount.endswith('%') else ''
+        if number.isdigit() and int(number) < 2 ** 31 and f'{int(number)}%' == discount:
+            self.sleva.append(int(number))
+        else:
+            self.sleva.append(-1)
+            if discount:
+                self.texts[('sleva', index)] = discount
+        availability = record.get('dostupnost') or ''
+        code = self.availability_codes.get(availability)
+        if code is None:
+            code = self.availability_codes[availability] = len(self.availability)
+            self.availability.append(availability)
+        self.dostupnost.append(code)
+        self.nazev.append(record.get('nazev') or '')
+        self.ean.append(record.get('ean') or '')
+        self.url.append(record.get('url') or '')
+    
+    append = add
+    
+    def text(self, field, i, default):
+        return self.texts.get((field, i), default) if self.texts else default
+    
+    def record(self, i):
+        """Jeden záznam jako slovník (stejná pole a tvar jako z parse_product)"""
+        discount = self.sleva[i]
+        return {'nazev': self.nazev[i], 'ean': self.ean[i],
+                'cena': self.text('cena', i, self.format_price(self.cena[i], self.places['cena'][i])),
+                'cena_puvodni': self.text('cena_puvodni', i, self.format_price(
+                    self.cena_puvodni[i], self.places['cena_puvodni'][i])),
+                'sleva': self.text('sleva', i, f'{discount}%' if discount >= 0 else ''),
+                'dostupnost': self.availability[self.dostupnost[i]], 'url': self.url[i]}
+    
+    def __len__(self):
+        return len(self.url)
+    
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.record(i) for i in range(*index.indices(len(self)))]
+        return self.record(range(len(self))[index])
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.record(i)
+    
+    def summary(self):
+        """Počty pro souhrn běhu - nad celými sloupci (neprázdná pole jako dřív)"""
+        import numpy as np
+        prices = ~np.isnan(np.array(self.cena))
+        discounts = np.array(self.sleva) >= 0
+        for (field, i), text in self.texts.items():
+            if field == 'cena':
+                prices[i] = bool(text)
+            elif field == 'sleva':
+                discounts[i] = True
+        return {
+            'products': len(self),
+            'ean': len(self) - self.ean.count(''),
+            'cena': int(np.count_nonzero(prices)),
+            'sleva': int(np.count_nonzero(discounts)),
+        }
+    
+    def dataframe(self):
+        """DataFrame pro export - ceny jako čísla, dostupnost jako kategorie"""
+        import numpy as np
+        import pandas as pd
+        discount = np.array(self.sleva)
+        sleva = np.where(discount >= 0, percent_texts(discount), '').astype(object)
+        for (field, i), text in self.texts.items():
+            if field == 'sleva':
+                sleva[i] = text
+        return pd.DataFrame({
+            'nazev': self.nazev,
+            'ean': self.ean,
+            'cena': np.array(self.cena),
+            'cena_puvodni': np.array(self.cena_puvodni),
+            'sleva': sleva,
+            'dostupnost': pd.Categorical.from_codes(np.array(self.dostupnost, dtype=np.int64),
+                                                    self.availability),
+            'url': self.url,
+        })
+
+def percent_texts(values):
+    """Sloupec čísel -> texty 'N%' (NaN -> '')"""
+    import numpy as np
+    import pandas as pd
+    series = pd.Series(values, dtype=np.float64)
+    return (series.fillna(0).astype(np.int64).astype(str) + '%').where(series.notna(), '').to_numpy()
+
+def prepare_products():
+    """Převede products_data ze seznamu slovníků (starší běh, reset) na ProductStore"""
+    global products_data
+    if not isinstance(products_data, ProductStore):
+        products_data = ProductStore(products_data)
+
+# ===========================================================================
+# SOUBĚŽNÉ STAHOVÁNÍ (FÁZE 2)
+# ===========================================================================
+
+class PolitenessBudget:
+    """Sdílený rozpočet zdvořilosti - rozestupy a souběžnost na jeden host"""
+    
+    def __init__(self, max_per_host=None):
+        self.max_per_host = max_per_host or MAX_PER_HOST
+        self.lock = threading.Lock()
+        self.next_slot = {}      # host -> nejbližší čas dalšího požadavku
+        self.host_slots = {}     # host -> semafor souběžnosti
+    
+    def acquire(self, url):
+        """Počká na volný slot pro host; vrací host pro release()"""
+        host = urlparse(url).netloc
+        with self.lock:
+            if host not in self.host_slots:
+                self.host_slots[host] = threading.BoundedSemaphore(self.max_per_host)
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, now))
+            # Pevné pauzy jako sekvenční režim, rozložené mezi vlákna;
+            # v adaptivním režimu tempo hlídá rate_limiter uvnitř get_page()
+            if not ADAPTIVE_RATE_LIMIT and not (response_cache and CACHE_MODE == 'replay'):
+                self.next_slot[host] = slot + get_delay()
+        self.host_slots[host].acquire()
+        wait_time = slot - time.monotonic()
+        if wait_time > 0:
+            time.sleep(wait_time)
+            count_wait(url, wait_time, 'pause')
+        return host
+    
+    def release(self, host):
+        self.host_slots[host].release()
+
+def print_progress(i, total, start_time):
+    """Průběžný stav FÁZE 2 s odhadem zbývajícího času"""
+    elapsed = time.time() - start_time
+    rate = i / elapsed if elapsed > 0 else 0
+    eta = (total - i) / rate if rate > 0 else 0
+    
+    print(f"\r   [{i}/{total}] {(i/total)*100:.1f}% | "
+          f"Produktů: {len(products_data)} | "
+          f"ETA: {int(eta//60)}m {int(eta%60)}s   ", end="", flush=True)
+
+def parse_in_worker(html, url):
+    """Parsování v procesu parseru - vrací (záznam, přírůstek extraction_stats, metriky)"""
+    before = dict(extraction_stats)
+    # Metriky procesu parseru patří jen této stránce - hlavní proces je přičte
+    metrics.reset()
+    data = parse_product(html, url)
+    return (data, {k: v - before[k] for k, v in extraction_stats.items() if v != before[k]},
+            metrics.raw())
+
+def init_parser_worker():
+    """Start procesu parseru - zámek metrik zděděný forkem je zamčený (viz open_parser_pool)"""
+    metrics.lock = threading.Lock()
+
+def open_parser_pool(workers=None):
+    """Pool procesů pro parsování (None = parsovat ve vláknech jako dřív).
+    
+    Procesy vznikají forkem - zdědí konfiguraci, detekovanou platformu
+    i zkompilované selektory. Spouští se hned, dokud ještě neběží
+    stahovací vlákna, aby fork nezkopíroval cizí zamčené zámky. Vlákna
+    metrik (endpoint, JSON výpis) ale běží po celý kernel - fork proto
+    proběhne s metrics.lock v ruce a proces parseru si založí nový zámek.
+    """
+    workers = PARSE_WORKERS if workers is None else workers
+    if workers <= 1:
+        return None
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        print("   ⚠️ Procesy parserů vyžadují fork (Linux / Colab) - parsuji ve vláknech")
+        return None
+    if SELECTOR_PLAN:
+        # Plány se kompilují až při prvním použití - zde předem, ať je zdědí všechny procesy
+        get_selector_plan(site_platform)
+        get_selector_plan(None)
+    pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'),
+                               initializer=init_parser_worker)
+    with metrics.lock:
+        # Všechny procesy se forkují při prvním submit, dál už pool nové nevytváří
+        started = [pool.submit(abs, n) for n in range(workers)]
+    for future in started:
+        future.result()
+    return pool
+
+def scrape_concurrently(urls, workers=None):
+    """Stáhne detaily produktů paralelně ve vláknech.
+    
+    Vlákna pouze stahují a parsují; products_data a processed_urls se mění
+    jen v hlavním vlákně po dokončení URL, takže přerušení (⏹️) zachová
+    stejnou sémantiku pokračování jako sekvenční smyčka.
+    
+    S PARSE_WORKERS > 1 vlákna jen stahují a HTML parsuje pool procesů.
+    Fronty mezi fázemi jsou omezené - když parsery nestíhají, nová
+    stahování se nezačínají (backpressure), takže paměť drží jen pár
+    desítek stránek.
+    """
+    workers = workers or CONCURRENT_WORKERS
+    parser_pool = open_parser_pool()
+    budget = PolitenessBudget()
+    total = len(urls)
+    start_time = time.time()
+    parse_limit = PARSE_WORKERS * 2
+    
+    def worker(url):
+        host = budget.acquire(url)
+        try:
+            if parser_pool:
+                return fetch_product(url)
+            return extract_product_data(url)
+        finally:
+            budget.release(host)
+    
+    pool = ThreadPoolExecutor(max_workers=workers)
+    fetching = {}        # future -> url
+    parsing = {}         # future -> (url, html, validátory)
+    ready = deque()      # Stažené stránky čekající na volný parser
+    url_iter = iter(urls)
+    done_count = 0
+    
+    def finish(url, data):
+        nonlocal done_count
+        record_product(url, data)
+        done_count += 1
+        print_progress(done_count, total, start_time)
+        if done_count % 50 == 0:
+            save_progress()
+    
+    try:
+        while True:
+            while parser_pool and ready and len(parsing) < parse_limit:
+                url, html, validators = ready.popleft()
+                parsing[parser_pool.submit(parse_in_worker, html, url)] = (url, html, validators)
+            
+            # Ve frontě držíme jen omezený počet úloh (ne celých 50k URL)
+            while len(fetching) < workers * 2 and (not parser_pool or len(ready) < parse_limit):
+                url = next(url_iter, None)
+                if url is None:
+                    break
+                if url in processed_urls:   # Mezitím zpracována přes rel=canonical
+                    done_count += 1
+                    continue
+                fetching[pool.submit(worker, url)] = url
+            if not fetching and not parsing and not ready:
+                break
+            
+            finished, _ = wait(list(fetching) + list(parsing), timeout=1, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future in fetching:
+                    url = fetching.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception:
+                        result = None
+                    if not parser_pool:
+                        finish(url, result)
+                        continue
+                    data, html, validators = result or (None, None, None)
+                    if html:
+                        ready.append((url, html, validators))
+                    else:
+                        finish(url, data)
+                else:
+                    url, html, validators = parsing.pop(future)
+                    try:
+                        data, stats, worker_metrics = future.result()
+                    except Exception:
+                        # Proces parseru spadl / výsledek nejde přenést - parsujeme tady
+                        worker_metrics = None
+                        try:
+                            data, stats = parse_product(html, url), {}
+                        except Exception:
+                            data, stats = None, {}
+                    for strategy, count in stats.items():
+                        with extraction_lock:
+                            extraction_stats[strategy] += count
+                    metrics.merge(worker_metrics)
+                    store_product(url, data, validators)
+                    finish(url, data)
+    finally:
+        # Při přerušení nečekáme na rozjeté úlohy - nezpracované URL zůstanou ve frontě
+        pool.shutdown(wait=False, cancel_futures=True)
+        if parser_pool:
+            parser_pool.shutdown(wait=False, cancel_futures=True)
+
+# ===========================================================================
+# DISTRIBUOVANÉ STAHOVÁNÍ (FÁZE 2 přes sdílenou frontu)
+# ===========================================================================
+
+class WorkQueue:
+    """Sdílená fronta URL produktů v SQLite (WAL) pro více procesů.
+    
+    Worker si URL vypůjčí (lease) na QUEUE_LEASE sekund a vrátí výsledek
+    s tokenem výpůjčky. Propadlá výpůjčka se rozdá znovu; výsledek se
+    přijme jen s platným tokenem, takže každá URL má právě jeden záznam.
+    Tabulka hosts drží společný rozestup požadavků na host (QUEUE_HOST_RATE).
+    """
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, isolation_level=None, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        # state: 'pending' / 'leased' / 'done'
+        self.conn.execute('CREATE TABLE IF NOT EXISTS tasks (seq INTEGER PRIMARY KEY, url TEXT UNIQUE, '
+                          'state TEXT, token TEXT, lease_until REAL, attempts INTEGER DEFAULT 0)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, seq)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY, url TEXT UNIQUE, '
+                          'record TEXT, worker TEXT)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS hosts (host TEXT PRIMARY KEY, next_slot REAL)')
+    
+    def transaction(self, fn, *args):
+        """Zápis v jedné transakci - BEGIN IMMEDIATE zamkne DB i pro ostatní procesy"""
+        with self.lock:
+            self.conn.execute('BEGIN IMMEDIATE')
+            try:
+                result = fn(*args)
+            except BaseException:
+                self.conn.execute('ROLLBACK')
+                raise
+            self.conn.execute('COMMIT')
+            return result
+    
+    def reset(self):
+        """Nový crawl - zahodí úlohy i výsledky předchozího"""
+        def clear():
+            for table in ('meta', 'tasks', 'results', 'hosts'):
+                self.conn.execute(f'DELETE FROM {table}')
+        self.transaction(clear)
+    
+    def publish(self, meta):
+        """Zveřejní web a platformu - workery začnou pracovat až potom"""
+        self.transaction(lambda: self.conn.executemany(
+            'INSERT OR REPLACE INTO meta VALUES (?, ?)', [(key, json.dumps(value)) for key, value in meta.items()]))
+    
+    def meta(self):
+        with self.lock:
+            return {key: json.loads(value) for key, value in self.conn.execute('SELECT key, value FROM meta')}
+    
+    def seed(self, urls):
+        """Přidá URL do fronty (už známé se přeskočí)"""
+        self.transaction(lambda: self.conn.executemany(
+            "INSERT OR IGNORE INTO tasks (url, state) VALUES (?, 'pending')", ((url,) for url in urls)))
+    
+    def lease(self, worker, count):
+        """Vypůjčí až count URL - vrací [(url, token)]"""
+        def take():
+            now = time.time()
+            # Propadlé výpůjčky zpět do fronty, po QUEUE_MAX_ATTEMPTS se URL vzdá (prázdný záznam)
+            expired = self.conn.execute("SELECT seq, url, attempts FROM tasks "
+                                        "WHERE state = 'leased' AND lease_until < ?", (now,)).fetchall()
+            for seq, url, attempts in expired:
+                if attempts >= QUEUE_MAX_ATTEMPTS:
+                    self.conn.execute("UPDATE tasks SET state = 'done' WHERE seq = ?", (seq,))
+                    self.conn.execute('INSERT OR IGNORE INTO results (url, record, worker) '
+                                      'VALUES (?, NULL, ?)', (url, ''))
+                else:
+                    self.conn.execute("UPDATE tasks SET state = 'pending' WHERE seq = ?", (seq,))
+            rows = self.conn.execute("SELECT seq, url FROM tasks WHERE state = 'pending' "
+                                     "ORDER BY seq LIMIT ?", (count,)).fetchall()
+            leases = []
+            for seq, url in rows:
+                token = f'{worker}/{uuid.uuid4().hex}'
+                self.conn.execute("UPDATE tasks SET state = 'leased', token = ?, lease_until = ?, "
+                                  "attempts = attempts + 1 WHERE seq = ?", (token, now + QUEUE_LEASE, seq))
+                leases.append((url, token))
+            return leases
+        return self.transaction(take)
+    
+    def complete(self, url, token, record):
+        """Zapíše výsledek; False = výpůjčka mezitím propadla a URL má jiný worker"""
+        def finish():
+            updated = self.conn.execute("UPDATE tasks SET state = 'done' WHERE url = ? AND token = ? "
+                                        "AND state = 'leased'", (url, token)).rowcount
+            if updated:
+                self.conn.execute('INSERT OR IGNORE INTO results (url, record, worker) VALUES (?, ?, ?)',
+                                  (url, json.dumps(record, ensure_ascii=False), token.split('/')[0]))
+            return bool(updated)
+        return self.transaction(finish)
+    
+    def reserve(self, host, interval):
+        """Zarezervuje další požadavek na host - vrací, kolik s ještě čekat"""
+        def take():
+            now = time.time()
+            row = self.conn.execute('SELECT next_slot FROM hosts WHERE host = ?', (host,)).fetchone()
+            slot = max(now, row[0] if row else now)
+            self.conn.execute('INSERT OR REPLACE INTO hosts VALUES (?, ?)', (host, slot + interval))
+            return slot - now
+        return self.transaction(take)
+    
+    def results(self, after=0):
+        """Výsledky s id > after - [(id, url, záznam, worker)]"""
+        with self.lock:
+            rows = self.conn.execute('SELECT id, url, record, worker FROM results WHERE id > ? ORDER BY id',
+                                     (after,)).fetchall()
+        return [(id_, url, json.loads(record) if record else None, worker) for id_, url, record, worker in rows]
+    
+    def progress(self):
+        """Počty úloh podle stavu"""
+        with self.lock:
+            return dict(self.conn.execute('SELECT state, COUNT(*) FROM tasks GROUP BY state'))
+    
+    def finished(self):
+        counts = self.progress()
+        return not counts.get('pending') and not counts.get('leased')
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+# Nastavení, která koordinátor předá workerům ve frontě (stahování a parsování
+# detailu) - worker jinak stahuje s výchozí konfigurací svého souboru
+WORKER_SETTINGS = [
+    'USER_AGENTS', 'HEADERS', 'DELAY_MIN', 'DELAY_MAX', 'MAX_RETRIES',
+    'TRACKING_PARAMS', 'PRODUCT_IGNORED_PARAMS', 'TRAILING_SLASH', 'USE_REL_CANONICAL',
+    'DOMAIN_URL_RULES', 'STRUCTURED_FIRST', 'STRUCTURED_REQUIRED_FIELDS', 'PRODUCT_SELECTORS',
+    'MAX_PAGE_BYTES', 'DOWNLOAD_CHUNK', 'EARLY_STOP', 'HTML_PARSER', 'SELECTOR_PLAN',
+    'MAX_PER_HOST', 'ADAPTIVE_RATE_LIMIT', 'RATE_START', 'RATE_MIN', 'RATE_MAX',
+    'RATE_INCREASE', 'RATE_BACKOFF', 'FAST_RESPONSE', 'MAX_RETRY_AFTER',
+    'QUEUE_LEASE_BATCH', 'QUEUE_HOST_RATE',
+]
+
+class RemoteQueue:
+    """Klient fronty jiného stroje (QueueHandler) - stejné metody jako WorkQueue"""
+    
+    def __init__(self, url):
+        self.url = url.rstrip('/')
+        self.http = requests.Session()
+        if QUEUE_TOKEN:
+            self.http.headers['X-Queue-Token'] = QUEUE_TOKEN
+    
+    def call(self, method, *args):
+        response = self.http.post(f'{self.url}/{method}', json=list(args), timeout=60)
+        response.raise_for_status()
+        return response.json()
+    
+    def meta(self):
+        return self.call('meta')
+    
+    def lease(self, worker, count):
+        return [tuple(lease) for lease in self.call('lease', worker, count)]
+    
+    def complete(self, url, token, record):
+        return self.call('complete', url, token, record)
+    
+    def reserve(self, host, interval):
+        return self.call('reserve', host, interval)
+    
+    def progress(self):
+        return self.call('progress')
+    
+    def finished(self):
+        return self.call('finished')
+    
+    def close(self):
+        self.http.close()
+
+class QueueHandler(BaseHTTPRequestHandler):
+    """POST /<metoda> s JSON argumenty -> JSON výsledek metody work_queue"""
+    
+    METHODS = {'meta', 'lease', 'complete', 'reserve', 'progress', 'finished'}
+    
+    def do_POST(self):
+        method = self.path.strip('/')
+        token = self.headers.get('X-Queue-Token') or ''
+        if method not in self.METHODS or (QUEUE_TOKEN and not hmac.compare_digest(token.encode(), QUEUE_TOKEN.encode())):
+            self.send_error(404 if method not in self.METHODS else 403)
+            return
+        try:
+            args = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'[]')
+            body = json.dumps(getattr(work_queue, method)(*args), ensure_ascii=False).encode('utf-8')
+        except Exception as e:
+            self.send_error(500, type(e).__name__)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, *args):
+        pass
+
+work_queue = None
+
+def open_work_queue(location=None):
+    """Fronta podle WORK_QUEUE - http(s)://... = RemoteQueue, jinak soubor SQLite"""
+    location = location or WORK_QUEUE
+    if location.startswith(('http://', 'https://')):
+        return RemoteQueue(location)
+    return WorkQueue(location)
+
+def queue_worker(queue, name, budget, stop, done):
+    """Smyčka jednoho vlákna workeru - půjčuje si URL, stahuje a vrací záznamy"""
+    errors = 0
+    while not stop.is_set():
+        try:
+            leases = queue.lease(name, QUEUE_LEASE_BATCH)
+            errors = 0
+        except Exception:
+            # Fronta nedostupná (koordinátor skončil / výpadek sítě)
+            errors += 1
+            if errors >= 5:
+                return
+            stop.wait(5)
+            continue
+        if not leases:
+            if queue.finished():
+                return
+            stop.wait(1)
+            continue
+        for url, token in leases:
+            if stop.is_set():
+                return
+            if QUEUE_HOST_RATE:
+                # Společný rozpočet hostu za všechny workery (všechny stroje)
+                wait_time = queue.reserve(urlparse(url).netloc, 1 / QUEUE_HOST_RATE)
+                if wait_time > 0:
+                    time.sleep(wait_time)
+                    count_wait(url, wait_time, 'queue')
+            host = budget.acquire(url)
+            try:
+                data = extract_product_data(url)
+            except Exception:
+                data = None
+            finally:
+                budget.release(host)
+            try:
+                accepted = queue.complete(url, token, data)
+            except Exception:
+                accepted = False
+            if accepted:
+                done.append(url)
+            else:
+                # Výpůjčka propadla - záznam zapíše worker, který URL dostal po nás
+                metrics.inc('queue_lost_leases_total', host=urlparse(url).netloc)
+
+def start_queue_workers(queue, workers):
+    """Spustí vlákna workeru - vrací (stop, vlákna, hotové URL)"""
+    name = f'{socket.gethostname()}-{os.getpid()}'
+    budget = PolitenessBudget()
+    stop = threading.Event()
+    done = []
+    threads = [threading.Thread(target=queue_worker, args=(queue, name, budget, stop, done), daemon=True)
+               for _ in range(max(workers, 1))]
+    for thread in threads:
+        thread.start()
+    return stop, threads, done
+
+def scrape_distributed(urls):
+    """FÁZE 2 přes sdílenou frontu WORK_QUEUE.
+    
+    Tento proces frontu naplní, pracuje jako jeden z workerů a průběžně
+    zapisuje vrácené záznamy (record_product, save_progress). Další
+    workery: python scraper.py --worker WORK_QUEUE (nebo http://stroj:QUEUE_PORT).
+    """
+    global work_queue
+    work_queue = WorkQueue(WORK_QUEUE)
+    if not processed_urls or work_queue.meta().get('base_url') != BASE_URL:
+        # Nový crawl - výsledky z fronty se přebírají jen při pokračování
+        work_queue.reset()
+    server = None
+    if QUEUE_PORT:
+        # Kdokoli s přístupem k frontě může vracet záznamy do výstupu - do sítě
+        # jen s heslem, jinak pouze pro workery na tomto stroji
+        bind = QUEUE_BIND if QUEUE_TOKEN else '127.0.0.1'
+        server = ThreadingHTTPServer((bind, QUEUE_PORT), QueueHandler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        if QUEUE_TOKEN:
+            print(f"   🌐 Fronta pro další workery: http://<tento stroj>:{QUEUE_PORT}")
+        else:
+            print(f"   🌐 Fronta jen pro tento stroj: http://127.0.0.1:{QUEUE_PORT} "
+                  f"(pro jiné stroje nastavte QUEUE_TOKEN)")
+    
+    last_id = 0
+    recorded = 0
+    workers = {}
+    start_time = time.time()
+    total = len(urls)
+    
+    def collect():
+        nonlocal last_id, recorded
+        for last_id, url, data, worker in work_queue.results(last_id):
+            workers[worker] = workers.get(worker, 0) + 1
+            if url in processed_urls:   # Mezitím zpracována přes rel=canonical / dřívější běh
+                continue
+            record_product(url, data)
+            recorded += 1
+            print_progress(recorded, max(total, recorded), start_time)
+            if recorded % 50 == 0:
+                save_progress()
+    
+    collect()
+    work_queue.seed(url for url in urls if url not in processed_urls)
+    work_queue.publish({'base_url': BASE_URL, 'platform': site_platform,
+                        'settings': {name: globals()[name] for name in WORKER_SETTINGS}})
+    stop, threads, _ = start_queue_workers(work_queue, CONCURRENT_WORKERS)
+    try:
+        while True:
+            finished = work_queue.finished()
+            collect()
+            if finished:
+                break
+            time.sleep(1)
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join(timeout=QUEUE_LEASE)
+        collect()
+        if server:
+            time.sleep(2)   # Vzdálené workery si ještě ověří, že je fronta hotová
+            server.shutdown()
+            server.server_close()
+        work_queue.close()
+        work_queue = None
+    if len(workers) > 1:
+        print("\n   👷 Workery: " + ', '.join(f"{name or 'vzdáno'} {count}" for name, count in workers.items()))
+
+def run_worker(location, workers=None):
+    """Worker na dalším procesu / stroji - pracuje, dokud není fronta hotová"""
+    global site_platform, platform_checked
+    queue = open_work_queue(location)
+    print(f"👷 Worker fronty {location}")
+    while True:
+        try:
+            meta = queue.meta()
+        except Exception:
+            meta = {}
+        if meta.get('base_url'):
+            break
+        time.sleep(2)   # Koordinátor frontu ještě neplní
+    configure(meta['base_url'], **meta.get('settings', {}))
+    site_platform = meta['platform']
+    platform_checked = True
+    print(f"🎯 Web: {BASE_URL} (platforma {site_platform or 'neznámá'})")
+    
+    stop, threads, done = start_queue_workers(queue, workers or CONCURRENT_WORKERS)
+    start_time = time.time()
+    try:
+        while any(thread.is_alive() for thread in threads):
+            time.sleep(1)
+            elapsed = time.time() - start_time
+            print(f"\r   Zpracováno: {len(done)} ({len(done) / elapsed:.1f}/s)   ", end="", flush=True)
+    except KeyboardInterrupt:
+        # Rozpracované výpůjčky po QUEUE_LEASE převezme jiný worker
+        print("\n⏹️ ZASTAVENO UŽIVATELEM")
+    finally:
+        stop.set()
+        queue.close()
+    print(f"\n✅ Worker hotov: {len(done)} URL")
+    return len(done)
+
+# ===========================================================================
+# KATALOGOVÁ API PLATFOREM (místo FÁZE 1 + 2)
+# ===========================================================================
+
+class PlatformAdapter:
+    """Základ adaptéru veřejného katalogového API platformy.
+    
+    Podtřída nastaví name, platforms (pro které detekované platformy se
+    zkouší) a endpoints a implementuje records(payload) -> seznam záznamů.
+    Nový adaptér stačí přidat do PLATFORM_ADAPTERS.
+    """
+    
+    name = None
+    platforms = ()
+    endpoints = []
+    
+    def __init__(self):
+        self.endpoint = None
+        self.first_payload = None
+    
+    def page_url(self, page):
+        raise NotImplementedError
+    
+    def records(self, payload):
+        raise NotImplementedError
+    
+    def fetch(self, page, retries=None):
+        """JSON jedné stránky katalogu (None = chyba / není JSON)"""
+        status, text, headers = fetch_page(self.page_url(page), retries,
+                                           extra_headers={'Accept': 'application/json'},
+                                           accept=JSON_CONTENT_TYPES)
+        if not text:
+            return None
+        try:
+            return json.loads(text)
+        except ValueError:
+            return None
+    
+    def probe(self):
+        """Zkusí endpointy - True, pokud první stránka vrací produkty"""
+        for endpoint in self.endpoints:
+            self.endpoint = endpoint
+            payload = self.fetch(1, retries=1)
+            try:
+                if payload is not None and self.records(payload):
+                    self.first_payload = payload
+                    return True
+            except (KeyError, TypeError, AttributeError, ValueError):
+                pass
+        return False
+    
+    def iter_records(self):
+        """Postupně prochází stránky katalogu a vrací záznamy"""
+        payload = self.first_payload
+        for page in range(1, API_MAX_PAGES + 1):
+            if payload is None:
+                payload = self.fetch(page)
+                if payload is None:
+                    print(f"\n   ⚠️ API stránka {page} selhala - zbytek doplní další běh")
+                    return
+            records = self.records(payload)
+            if not records:
+                return
+            yield from records
+            payload = None
+
+class ShopifyAdapter(PlatformAdapter):
+    """Shopify /products.json - varianty s cenou, SKU a čárovým kódem"""
+    
+    name = 'shopify'
+    platforms = ('shopify',)
+    endpoints = ['/products.json']
+    
+    def page_url(self, page):
+        return f"{BASE_URL}{self.endpoint}?limit={API_PAGE_SIZE}&page={page}"
+    
+    def records(self, payload):
+        records = []
+        for product in payload['products']:
+            url = canonical_url(f"{BASE_URL}/products/{product['handle']}", product=True)
+            variants = product.get('variants') or [{}]
+            multiple = len(variants) > 1
+            for variant in variants:
+                data = empty_record(url)
+                data['nazev'] = clean_text(product.get('title') or '')
+                if multiple and variant.get('title') not in (None, '', 'Default Title'):
+                    data['nazev'] += f" - {clean_text(variant['title'])}"
+                    data['url'] = f"{url}?variant={variant['id']}"
+                for key in ('barcode', 'sku'):
+                    value = str(variant.get(key) or '').strip()
+                    if EAN_RE.match(value):
+                        data['ean'] = value
+                        break
+                data['cena'] = schema_price(variant.get('price'))
+                compare_at = schema_price(variant.get('compare_at_price'))
+                if compare_at and data['cena'] and float(compare_at) > float(data['cena']):
+                    data['cena_puvodni'] = compare_at
+                if 'available' in variant:
+                    data['dostupnost'] = 'Skladem' if variant['available'] else 'Vyprodáno'
+                fill_discount(data)
+                records.append(data)
+        return records
+
+class WooStoreAdapter(PlatformAdapter):
+    """WooCommerce Store API - veřejné, bez klíčů (WooCommerce Blocks)"""
+    
+    name = 'woocommerce'
+    platforms = ('woocommerce',)
+    endpoints = ['/wp-json/wc/store/v1/products', '/wp-json/wc/store/products']
+    
+    def page_url(self, page):
+        return f"{BASE_URL}{self.endpoint}?per_page={min(API_PAGE_SIZE, 100)}&page={page}"
+    
+    def records(self, payload):
+        records = []
+        for product in payload:
+            data = empty_record(canonical_url(product['permalink'], product=True))
+            data['nazev'] = clean_text(unescape(product.get('name') or ''))
+            data['ean'] = find_ean_recursive(product) or ''
+            
+            # Ceny jsou v nejmenších jednotkách měny (haléře)
+            prices = product.get('prices') or {}
+            scale = 10 ** int(prices.get('currency_minor_unit', 2))
+            if prices.get('price'):
+                data['cena'] = schema_price(str(int(prices['price']) / scale))
+            regular = prices.get('regular_price')
+            if regular and prices.get('price') and int(regular) > int(prices['price']):
+                data['cena_puvodni'] = schema_price(str(int(regular) / scale))
+            if 'is_in_stock' in product:
+                data['dostupnost'] = 'Skladem' if product['is_in_stock'] else 'Vyprodáno'
+            fill_discount(data)
+            records.append(data)
+        return records
+
+PLATFORM_ADAPTERS = [ShopifyAdapter, WooStoreAdapter]
+
+def find_platform_adapter():
+    """Adaptér, jehož API na webu odpovídá (None = jen HTML)"""
+    candidates = [cls for cls in PLATFORM_ADAPTERS if site_platform in cls.platforms]
+    if not candidates and site_platform in (None, 'generic'):
+        candidates = PLATFORM_ADAPTERS
+    for cls in candidates:
+        adapter = cls()
+        if adapter.probe():
+            return adapter
+    return None
+
+def platform_api_pending():
+    """Zkusit API? Na začátku, nebo pokračování přerušeného běhu přes API"""
+    if not PLATFORM_API or pages_to_visit:
+        return False
+    used = platform_api_used or (crawl_state.get_meta('platform_api') if crawl_state else None)
+    return not all_product_urls or bool(used)
+
+def scrape_platform_api():
+    """Stáhne katalog přes API platformy; vrací počet nových záznamů (0 = API není)"""
+    global platform_api_used
+    adapter = find_platform_adapter()
+    if not adapter:
+        return 0
+    
+    print(f"\n🔌 FÁZE 1+2: Katalog přes API ({adapter.name}: {adapter.endpoint})\n")
+    platform_api_used = adapter.name
+    if crawl_state:
+        crawl_state.set_meta('platform_api', adapter.name)
+    
+    added = 0
+    for data in adapter.iter_records():
+        url = data['url']
+        if url in processed_urls:
+            continue
+        all_product_urls.add(url)
+        record_product(url, data)
+        added += 1
+        if added % 250 == 0:
+            print(f"   ✅ {added} produktů (celkem: {len(products_data)})")
+            save_progress()
+        if len(all_product_urls) >= MAX_PRODUCTS:
+            print(f"\n   ⚠️ Dosažen limit {MAX_PRODUCTS} produktů")
+            break
+    print(f"   ✅ Z API: {added} produktů (celkem: {len(products_data)})")
+    return added
+
+# ===========================================================================
+# TRVALÝ STAV CRAWLU (SQLite WAL)
+# ===========================================================================
+
+class CrawlState:
+    """Stav crawlu na disku - přežije pád procesu i restart kernelu.
+    
+    Fronta FÁZE 1, navštívené stránky, URL produktů, zpracované URL a
+    stažené záznamy se zapisují jako přírůstky a commitují po dávkách
+    STATE_BATCH. WAL režim drží databázi konzistentní k poslednímu commitu.
+    """
+    
+    SET_TABLES = ['product_urls', 'processed']
+    
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.held = 0           # Otevřené bloky deferred() - dávka se nekomituje
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        for table in self.SET_TABLES:
+            self.conn.execute(f'CREATE TABLE IF NOT EXISTS {table} (url TEXT PRIMARY KEY)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS lastmod (url TEXT PRIMARY KEY, value TEXT)')
+        # Navštívené stránky jen jako otisky (VisitedIndex)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS visited_fp (fp INTEGER PRIMARY KEY)')
+        # Prioritní fronta FÁZE 1 (CrawlFrontier)
+        self.conn.execute('CREATE TABLE IF NOT EXISTS frontier_queue '
+                          '(seq INTEGER PRIMARY KEY, priority INTEGER, depth INTEGER, url TEXT)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS frontier_order '
+                          'ON frontier_queue (priority, depth, seq)')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS products '
+                          '(id INTEGER PRIMARY KEY AUTOINCREMENT, record TEXT)')
+        self.conn.commit()
+    
+    def write(self, sql, params, defer=False):
+        """Zápis do dávky; defer=True = ještě nekomitovat, musí přijít párový
+        zápis (záznam produktu -> processed, vyjmutí z fronty -> visited)"""
+        with self.lock:
+            self.conn.execute(sql, params)
+            self.pending += 1
+            if self.pending >= STATE_BATCH and not defer and not self.held:
+                self.conn.commit()
+                self.pending = 0
+    
+    @contextmanager
+    def deferred(self):
+        """Zápisy uvnitř bloku skončí ve stejném commitu (celý výsledek jedné URL)"""
+        with self.lock:
+            self.held += 1
+        try:
+            yield
+        finally:
+            with self.lock:
+                self.held -= 1
+                if self.pending >= STATE_BATCH and not self.held:
+                    self.conn.commit()
+                    self.pending = 0
+    
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+            self.pending = 0
+    
+    def add_url(self, table, url):
+        self.write(f'INSERT OR IGNORE INTO {table} VALUES (?)', (url,))
+    
+    def remove_url(self, table, url, defer=False):
+        self.write(f'DELETE FROM {table} WHERE url = ?', (url,), defer)
+    
+    def clear_urls(self, table):
+        self.write(f'DELETE FROM {table}', ())
+    
+    def add_product(self, record):
+        self.write('INSERT INTO products (record) VALUES (?)',
+                   (json.dumps(record, ensure_ascii=False),), defer=True)
+    
+    def set_lastmod(self, url, value):
+        self.write('INSERT OR REPLACE INTO lastmod VALUES (?, ?)', (url, value))
+    
+    def add_fingerprint(self, fp):
+        self.write('INSERT OR IGNORE INTO visited_fp VALUES (?)', (fp,))
+    
+    def load_fingerprints(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute('SELECT fp FROM visited_fp')]
+    
+    def queue_push(self, entry):
+        priority, depth, seq, url = entry
+        self.write('INSERT OR REPLACE INTO frontier_queue VALUES (?, ?, ?, ?)',
+                   (seq, priority, depth, url))
+    
+    def queue_head(self):
+        with self.lock:
+            return self.conn.execute(
+                'SELECT priority, depth, seq, url FROM frontier_queue '
+                'ORDER BY priority, depth, seq LIMIT 1').fetchone()
+    
+    def queue_remove(self, seq):
+        self.write('DELETE FROM frontier_queue WHERE seq = ?', (seq,), defer=True)
+    
+    def queue_clear(self):
+        self.write('DELETE FROM frontier_queue', ())
+    
+    def queue_count(self):
+        with self.lock:
+            return self.conn.execute('SELECT COUNT(*) FROM frontier_queue').fetchone()[0]
+    
+    def queue_max_seq(self):
+        with self.lock:
+            return self.conn.execute('SELECT COALESCE(MAX(seq), -1) FROM frontier_queue').fetchone()[0]
+    
+    def queue_urls(self):
+        with self.lock:
+            return [row[0] for row in self.conn.execute('SELECT url FROM frontier_queue')]
+    
+    def load_urls(self, table):
+        with self.lock:
+            return {row[0] for row in self.conn.execute(f'SELECT url FROM {table}')}
+    
+    def load_products(self):
+        with self.lock:
+            return [json.loads(row[0]) for row in
+                    self.conn.execute('SELECT record FROM products ORDER BY id')]
+    
+    def load_lastmod(self):
+        with self.lock:
+            return dict(self.conn.execute('SELECT url, value FROM lastmod'))
+    
+    def get_meta(self, key):
+        with self.lock:
+            row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+    
+    def set_meta(self, key, value):
+        self.write('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, value))
+    
+    def close(self):
+        with self.lock:
+            self.conn.commit()
+            self.conn.close()
+
+class PersistentSet(set):
+    """set, který každou změnu zapisuje do tabulky CrawlState"""
+    
+    def __init__(self, items, state, table):
+        super().__init__(items)
+        self.state = state
+        self.table = table
+    
+    def add(self, item):
+        if item not in self:
+            super().add(item)
+            self.state.add_url(self.table, item)
+    
+    def update(self, *iterables):
+        for iterable in iterables:
+            for item in iterable:
+                self.add(item)
+    
+    def discard(self, item):
+        if item in self:
+            super().discard(item)
+            self.state.remove_url(self.table, item)
+    
+    def pop(self):
+        item = super().pop()
+        self.state.remove_url(self.table, item, defer=True)
+        return item
+    
+    def clear(self):
+        super().clear()
+        self.state.clear_urls(self.table)
+
+class PersistentStore(ProductStore):
+    """products_data, který každý přidaný záznam zapíše do CrawlState"""
+    
+    def __init__(self, items, state):
+        super().__init__(items)
+        self.state = state
+    
+    def append(self, record):
+        self.add(record)
+        self.state.add_product(record)
+
+class PersistentDict(dict):
+    """url_lastmod zapisovaný do CrawlState"""
+    
+    def __init__(self, items, state):
+        super().__init__(items)
+        self.state = state
+    
+    def __setitem__(self, url, value):
+        super().__setitem__(url, value)
+        self.state.set_lastmod(url, value)
+
+def attach_crawl_state():
+    """Napojí globální proměnné na STATE_DB - obnoví stav, nebo ho do DB zapíše"""
+    global crawl_state, products_data, all_product_urls, processed_urls
+    global visited_pages, pages_to_visit, url_lastmod
+    
+    if crawl_state is not None and crawl_state.path == STATE_DB:
+        return  # Už napojeno (opakované spuštění buňky)
+    
+    state = CrawlState(STATE_DB)
+    stored_base = state.get_meta('base_url')
+    if stored_base and stored_base != BASE_URL:
+        print(f"   ⚠️ {STATE_DB} patří webu {stored_base} - stav se neukládá")
+        return
+    state.set_meta('base_url', BASE_URL)
+    
+    def merge_set(memory, table):
+        stored = state.load_urls(table)
+        persistent = PersistentSet(stored, state, table)
+        persistent.update(memory)   # Co je jen v paměti, se dopíše do DB
+        return persistent
+    
+    all_product_urls = merge_set(all_product_urls, 'product_urls')
+    processed_urls = merge_set(processed_urls, 'processed')
+    
+    # Navštívené stránky - otisky z DB + co je navíc v paměti
+    visited = VisitedIndex()
+    for fp in state.load_fingerprints():
+        visited.add_fingerprint(fp)
+    visited.state = state
+    for fp in visited_pages.fingerprints():
+        visited.add_fingerprint(fp)
+    visited_pages = visited
     
-    for sel in name_selectors:
-        try:
-            el = soup.select_one(sel)
-            if el:
-                # Preferuj atribut nebo přímý text
-                text = el.get('content') or el.get('data-product-name') or el.get_text(strip=True)
-                if text and len(text) > 2 and len(text) < 500:
-                    data['nazev'] = clean_text(text)
-                    break
-        except:
-            pass
+    # Fronta FÁZE 1 celá v DB
+    frontier = CrawlFrontier(store=state)
+    while pages_to_visit:
+        priority, depth, url = pages_to_visit.pop_entry()
+        frontier.add(url, priority, depth)
+    pages_to_visit.close()
+    pages_to_visit = frontier
     
-    if not data['nazev']:
-        return None
+    stored_lastmod = state.load_lastmod()
+    memory_lastmod = url_lastmod
+    url_lastmod = PersistentDict(stored_lastmod, state)
+    for url, value in memory_lastmod.items():
+        if url not in stored_lastmod:
+            url_lastmod[url] = value
     
-    # === EAN / GTIN ===
-    # 1. JSON-LD strukturovaná data
-    for script in soup.select('script[type="application/ld+json"]'):
-        try:
-            json_text = script.string or ''
-            if not json_text.strip():
-                continue
-            json_data = json.loads(json_text)
-            
-            def find_ean_recursive(obj):
-                if isinstance(obj, dict):
-                    for key in ['gtin13', 'gtin', 'gtin8', 'gtin12', 'gtin14', 'ean', 'mpn', 'sku', 'productID']:
-                        if key in obj and obj[key]:
-                            val = str(obj[key]).strip()
-                            if re.match(r'^\d{8,14}$', val):
-                                return val
-                    for v in obj.values():
-                        result = find_ean_recursive(v)
-                        if result:
-                            return result
-                elif isinstance(obj, list):
-                    for item in obj:
-                        result = find_ean_recursive(item)
-                        if result:
-                            return result
-                return None
-            
-            ean = find_ean_recursive(json_data)
-            if ean:
-                data['ean'] = ean
-                break
-        except:
-            pass
+    stored_products = state.load_products()
+    memory_products = products_data
+    products_data = PersistentStore(stored_products, state)
+    if not stored_products:
+        # Stav zapnutý až během sezení - dosavadní záznamy se dopíšou do DB
+        for record in memory_products:
+            products_data.append(record)
     
-    # 2. Meta tagy
-    if not data['ean']:
-        meta_selectors = [
-            'meta[itemprop="gtin13"]', 'meta[itemprop="gtin"]', 'meta[itemprop="gtin8"]',
-            'meta[itemprop="ean"]', 'meta[property="product:ean"]', 'meta[property="og:ean"]',
-            'meta[name="ean"]', 'meta[name="gtin"]',
-        ]
-        for sel in meta_selectors:
-            try:
-                el = soup.select_one(sel)
-                if el and el.get('content'):
-                    val = el.get('content').strip()
-                    if re.match(r'^\d{8,14}$', val):
-                        data['ean'] = val
-                        break
-            except:
-                pass
+    state.commit()
+    crawl_state = state
+    print(f"   💾 Stav: {STATE_DB} ({len(products_data)} produktů, "
+          f"{len(all_product_urls)} URL, fronta {len(pages_to_visit)})")
+
+# ===========================================================================
+# PRŮBĚŽNÝ VÝSTUP (streamový sink)
+# ===========================================================================
+
+OUTPUT_FIELDS = ['nazev', 'ean', 'cena', 'cena_puvodni', 'sleva', 'dostupnost', 'url']
+
+class JsonLinesSink:
+    """Připisuje záznamy do JSON Lines - jeden produkt na řádek"""
     
-    # 3. Data atributy
-    if not data['ean']:
-        for attr in ['data-ean', 'data-gtin', 'data-gtin13', 'data-barcode', 'data-product-ean']:
-            try:
-                el = soup.select_one(f'[{attr}]')
-                if el:
-                    val = el.get(attr, '').strip()
-                    if re.match(r'^\d{8,14}$', val):
-                        data['ean'] = val
-                        break
-            except:
-                pass
+    extension = '.jsonl'
     
-    # 4. Tabulka parametrů
-    if not data['ean']:
-        param_containers = soup.select('table, .params, .product-params, .parameters, '
-                                        '.specifications, .attributes, dl, .p-params, '
-                                        '.product-properties, .product-attributes')
-        for container in param_containers:
-            try:
-                text = container.get_text(separator=' ')
-                match = re.search(r'(?:EAN|GTIN|Čárový\s*kód|Barcode)[:\s]*(\d{8,14})', text, re.I)
-                if match:
-                    data['ean'] = match.group(1)
-                    break
-            except:
-                pass
+    def __init__(self, path, append):
+        self.path = path
+        self.file = open(path, 'a' if append else 'w', encoding='utf-8')
     
-    # 5. Regex v celém HTML
-    if not data['ean']:
-        patterns = [
-            r'"gtin13"\s*:\s*"?(\d{13})"?',
-            r'"gtin"\s*:\s*"?(\d{8,14})"?',
-            r'"ean"\s*:\s*"?(\d{8,14})"?',
-            r'data-ean="(\d{8,14})"',
-            r'data-gtin="(\d{8,14})"',
-            r'>EAN[:\s]*(\d{8,14})<',
-        ]
-        for pattern in patterns:
-            try:
-                match = re.search(pattern, html)
-                if match:
-                    data['ean'] = match.group(1)
-                    break
-            except:
-                pass
+    @staticmethod
+    def count_existing(path):
+        with open(path, encoding='utf-8') as f:
+            return sum(1 for line in f if line.strip())
     
-    # === CENA ===
-    price_selectors = [
-        '[itemprop="price"]', 'meta[itemprop="price"]',
-        '.price-final', '.p-final', '.p-detail-price', '.p-main-price',
-        '.current-price', '.product-price', '.price', '.price-box .price',
-        '.woocommerce-Price-amount', '.amount', 
-        '.price-new', '.special-price', '.offer-price', '.sale-price',
-        'ins .amount', '.price ins', '.final-price',
-        '[data-price]', '.product-price-value',
-    ]
+    def write(self, records):
+        for record in records:
+            self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.file.flush()
     
-    for sel in price_selectors:
-        try:
-            el = soup.select_one(sel)
-            if el:
-                # Zkus content atribut, data atribut, nebo text
-                price = el.get('content') or el.get('data-price') or el.get_text(strip=True)
-                cleaned = clean_price(price)
-                if cleaned:
-                    try:
-                        if float(cleaned) > 0:
-                            data['cena'] = cleaned
-                            break
-                    except:
-                        pass
-        except:
-            pass
+    def close(self):
+        self.file.close()
+
+class CsvSink:
+    """Připisuje záznamy do CSV (UTF-8 s BOM kvůli Excelu)"""
     
-    # === PŮVODNÍ CENA ===
-    orig_selectors = [
-        '.price-standard', '.p-standard', '.p-before-price',
-        '.original-price', '.old-price', '.price-old', '.was-price',
-        '.regular-price', '.list-price', '.compare-price',
-        'del .amount', '.price del', 'del.price', 's.price', 's .amount',
-        '.price-before-discount', '.crossed-price',
-    ]
+    extension = '.csv'
     
-    for sel in orig_selectors:
-        try:
-            el = soup.select_one(sel)
-            if el:
-                price = clean_price(el.get_text(strip=True))
-                if price:
-                    try:
-                        if float(price) > 0:
-                            data['cena_puvodni'] = price
-                            break
-                    except:
-                        pass
-        except:
-            pass
+    def __init__(self, path, append):
+        self.path = path
+        new_file = not append or not os.path.exists(path) or os.path.getsize(path) == 0
+        self.file = open(path, 'w' if new_file else 'a', encoding='utf-8-sig', newline='')
+        self.writer = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS, extrasaction='ignore')
+        if new_file:
+            self.writer.writeheader()
     
-    # === SLEVA ===
-    if data['cena'] and data['cena_puvodni']:
-        try:
-            curr = float(data['cena'])
-            orig = float(data['cena_puvodni'])
-            if orig > curr > 0:
-                discount = ((orig - curr) / orig) * 100
-                data['sleva'] = f"{discount:.0f}%"
-        except:
-            pass
+    @staticmethod
+    def count_existing(path):
+        with open(path, encoding='utf-8-sig', newline='') as f:
+            return max(sum(1 for row in csv.reader(f)) - 1, 0)
     
-    # === DOSTUPNOST ===
-    avail_selectors = [
-        '.availability', '.p-availability', '.stock', '.stock-status',
-        '[itemprop="availability"]', '.in-stock', '.out-of-stock',
-        '.product-availability', '.delivery-info', '.skladem', '.dostupnost',
-        '.stock-info', '.availability-status', '.product-stock',
-        '[data-availability]', '.inventory-status',
-    ]
+    def write(self, records):
+        self.writer.writerows(records)
+        self.file.flush()
     
-    for sel in avail_selectors:
-        try:
-            el = soup.select_one(sel)
-            if el:
-                text = el.get('content') or el.get('data-availability') or el.get_text(strip=True)
-                if text:
-                    data['dostupnost'] = clean_text(text)[:100]  # Omezit délku
-                    break
-        except:
-            pass
+    def close(self):
+        self.file.close()
+
+class ParquetSink:
+    """Zapisuje záznamy do Parquet po skupinách řádků (vyžaduje pyarrow).
     
-    return data
+    Parquet nejde doplňovat po zavření - při novém otevření se soubor
+    přepíše celým products_data (count_existing vrací None).
+    """
+    
+    extension = '.parquet'
+    
+    def __init__(self, path, append):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self.pa = pa
+        self.path = path
+        self.schema = pa.schema([(field, pa.string()) for field in OUTPUT_FIELDS])
+        self.writer = pq.ParquetWriter(path, self.schema)
+    
+    @staticmethod
+    def count_existing(path):
+        return None
+    
+    def write(self, records):
+        columns = {field: [str(r.get(field, '')) for r in records] for field in OUTPUT_FIELDS}
+        self.writer.write_table(self.pa.table(columns, schema=self.schema))
+    
+    def close(self):
+        self.writer.close()
+
+OUTPUT_SINKS = {
+    'jsonl': JsonLinesSink,
+    'csv': CsvSink,
+    'parquet': ParquetSink,
+}
+
+output_sink = None
+# Kolik záznamů z products_data už je v sinku (a ve kterém souboru) - přežije
+# opakované spuštění buňky, aby pokračování v témže kernelu jen připisovalo
+if 'saved_count' not in dir(): saved_count = 0
+if 'saved_path' not in dir(): saved_path = None
+
+def open_output_sink():
+    """Otevře sink a srovná ho s products_data (pokračování / nový běh).
+    
+    Připisuje se jen při skutečném pokračování - ze STATE_DB, nebo v témže
+    kernelu do souboru, který má právě saved_count záznamů. Jinak je soubor
+    pozůstatek jiného běhu a založí se znovu.
+    """
+    global output_sink, saved_count, saved_path
+    sink_class = OUTPUT_SINKS[OUTPUT_FORMAT]
+    path = OUTPUT_PATH + sink_class.extension
+    
+    existing = None
+    if products_data and os.path.exists(path):
+        if crawl_state is not None:
+            existing = sink_class.count_existing(path)
+        elif saved_count and saved_path == path and sink_class.count_existing(path) == saved_count:
+            existing = saved_count
+    saved_path = path
+    
+    if existing is not None and existing <= len(products_data):
+        # Pokračování - připíšeme jen to, co v souboru ještě není
+        output_sink = sink_class(path, append=True)
+        saved_count = existing
+    else:
+        # Nový běh (nebo nesouhlasí počet) - soubor se založí znovu
+        output_sink = sink_class(path, append=False)
+        saved_count = 0
+    return output_sink
+
+def close_output_sink():
+    global output_sink
+    if output_sink:
+        output_sink.close()
+        output_sink = None
+
+# Hlavičky sloupců v Excelu pro stažení (BUŇKA 4)
+EXPORT_HEADERS = {
+    'nazev': 'Název produktu', 'ean': 'EAN', 'cena': 'Cena', 'cena_puvodni': 'Původní cena',
+    'sleva': 'Sleva', 'dostupnost': 'Dostupnost', 'url': 'URL',
+}
+# Řídicí znaky, které Excel (openpyxl) odmítne
+CONTROL_CHARS = r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]'
+XLSX_CHUNK = 10000
+
+def export_frame(store):
+    """Dávkové dočištění products_data pro export - celé sloupce najednou.
+    
+    Ceny jsou už čísla (ProductStore), sleva se dopočítá z cen, z textů
+    zmizí řídicí znaky, duplicity (název + URL) se zahodí a řádky seřadí
+    podle názvu.
+    """
+    import numpy as np
+    df = store.dataframe()
+    for column in ('nazev', 'ean', 'dostupnost', 'url'):
+        df[column] = df[column].astype(str).str.replace(CONTROL_CHARS, '', regex=True).str.strip()
+    current = df['cena'].to_numpy()
+    original = df['cena_puvodni'].to_numpy()
+    # Stejně jako fill_discount(): jen když původní > aktuální > 0
+    with np.errstate(invalid='ignore', divide='ignore'):
+        valid = (original > current) & (current > 0)
+        discount = np.rint((original - current) / original * 100)
+    df['sleva'] = np.where(valid, percent_texts(discount), '')
+    df = df.drop_duplicates(subset=['nazev', 'url'])
+    return df.sort_values('nazev', kind='stable').reset_index(drop=True)
+
+def write_xlsx(df, path):
+    """Zapíše DataFrame přes write-only sešit openpyxl.
+    
+    Řádky jdou po dávkách XLSX_CHUNK rovnou do souboru, paměť tak
+    nezávisí na počtu řádků (DataFrame.to_excel drží celý sešit i se
+    styly buněk). Chybějící hodnoty (NaN) = prázdné buňky.
+    """
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append([str(column) for column in df.columns])
+    for start in range(0, len(df), XLSX_CHUNK):
+        chunk = df.iloc[start:start + XLSX_CHUNK]
+        columns = [chunk[column].astype(object).where(chunk[column].notna(), None).tolist()
+                   for column in chunk.columns]
+        for row in zip(*columns):
+            sheet.append(row)
+    workbook.save(path)
+
+def export_excel_from_sink():
+    """Na konci dopíše a zavře průběžný výstup a vygeneruje Excel (EXCEL_EXPORT).
+    
+    Sink obsahuje totéž co products_data, Excel se proto skládá rovnou
+    ze sloupců úložiště (export_frame -> write_xlsx) - soubor se znovu
+    nečte ani neparsuje.
+    """
+    if OUTPUT_FORMAT is None or not products_data:
+        return
+    save_progress()
+    path = output_sink.path if output_sink else OUTPUT_PATH
+    close_output_sink()
+    if not EXCEL_EXPORT:
+        return
+    try:
+        df = export_frame(products_data)
+        write_xlsx(df, PROGRESS_EXCEL)
+        print(f"   📄 Excel: {PROGRESS_EXCEL} ({len(df)} řádků, průběžně v {path})")
+    except Exception as e:
+        print(f"   ⚠️ Excel se nepodařilo vytvořit: {e}")
 
 def save_progress():
-    """Uloží průběžné výsledky"""
-    if products_data:
+    """Uloží průběžné výsledky - do sinku připíše jen nové záznamy"""
+    global saved_count
+    if crawl_state:
+        crawl_state.commit()
+    if not products_data:
+        return
+    if OUTPUT_FORMAT is None:
+        # Původní chování - celý Excel znovu
         try:
-            df = pd.DataFrame(products_data)
-            df.to_excel('/content/eshop_prubezne.xlsx', index=False)
+            write_xlsx(export_frame(products_data), PROGRESS_EXCEL)
         except:
             pass
+        return
+    try:
+        sink = output_sink or open_output_sink()
+        if saved_count < len(products_data):
+            sink.write(products_data[saved_count:])
+            saved_count = len(products_data)
+    except Exception as e:
+        print(f"\n   ⚠️ Průběžné uložení selhalo: {e}")
+
+# ===========================================================================
+# HISTORIE CEN A DOSTUPNOSTI (SQLite, jen změny)
+# ===========================================================================
+
+class PriceHistory:
+    """Historie cen a dostupnosti mezi běhy - řádek jen při změně.
+    
+    products drží produkt (klíč EAN + URL) s posledními hodnotami, changes
+    řádek pro každou změnu ceny, původní ceny, slevy či dostupnosti
+    (a nový / zmizelý produkt) s číslem běhu. Velikost i porovnání běhů
+    tak rostou s počtem změn, ne s velikostí katalogu.
+    """
+    
+    TRACKED = ['cena', 'cena_puvodni', 'sleva', 'dostupnost']
+    
+    def __init__(self, path):
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=60, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.executescript('''
+            CREATE TABLE IF NOT EXISTS runs (
+                id INTEGER PRIMARY KEY, site TEXT, started TEXT, products INTEGER, complete INTEGER);
+            CREATE TABLE IF NOT EXISTS products (
+                id INTEGER PRIMARY KEY, site TEXT, ean TEXT, url TEXT, nazev TEXT,
+                cena REAL, cena_puvodni REAL, sleva INTEGER, dostupnost TEXT, removed INTEGER DEFAULT 0,
+                UNIQUE (ean, url));
+            CREATE INDEX IF NOT EXISTS products_site ON products (site);
+            CREATE TABLE IF NOT EXISTS changes (
+                product_id INTEGER, run_id INTEGER,
+                cena REAL, cena_puvodni REAL, sleva INTEGER, dostupnost TEXT, removed INTEGER DEFAULT 0);
+            CREATE INDEX IF NOT EXISTS changes_product ON changes (product_id, run_id);
+            CREATE INDEX IF NOT EXISTS changes_run ON changes (run_id);
+        ''')
+        self.conn.commit()
+    
+    def record_run(self, site, store, complete):
+        """Zapíše změny z products_data (ProductStore) jako nový běh - vrací (běh, počty).
+        
+        Zmizelé produkty se označí jen po úplném běhu (complete) - přerušený
+        běh nebo limit MAX_PRODUCTS by jinak „smazal“ zbytek katalogu.
+        """
+        availability = store.availability
+        current = {}
+        for ean, url, nazev, cena, original, discount, code in zip(
+                store.ean, store.url, store.nazev, store.cena, store.cena_puvodni,
+                store.sleva, store.dostupnost):
+            current[(ean, url)] = (nazev, None if cena != cena else cena,
+                                   None if original != original else original,
+                                   discount if discount >= 0 else None, availability[code])
+        counts = {'new': 0, 'changed': 0, 'removed': 0, 'unchanged': 0}
+        with self.lock:
+            known = {(ean, url): (id_, values, removed) for id_, ean, url, removed, *values in self.conn.execute(
+                'SELECT id, ean, url, removed, cena, cena_puvodni, sleva, dostupnost FROM products '
+                'WHERE site = ?', (site,))}
+            # Vše v jedné krátké transakci - v dávkovém režimu zapisuje do DB více webů
+            with self.conn:
+                run_id = self.conn.execute(
+                    'INSERT INTO runs (site, started, products, complete) VALUES (?, ?, ?, ?)',
+                    (site, datetime.now().isoformat(timespec='seconds'), len(current), int(complete))).lastrowid
+                for key, (nazev, *values) in current.items():
+                    previous = known.get(key)
+                    if previous and previous[1] == values and not previous[2]:
+                        counts['unchanged'] += 1
+                        continue
+                    if previous:
+                        product_id = previous[0]
+                        self.conn.execute('UPDATE products SET nazev = ?, cena = ?, cena_puvodni = ?, sleva = ?, '
+                                          'dostupnost = ?, removed = 0 WHERE id = ?', (nazev, *values, product_id))
+                        counts['changed'] += 1
+                    else:
+                        product_id = self.conn.execute(
+                            'INSERT INTO products (site, ean, url, nazev, cena, cena_puvodni, sleva, dostupnost) '
+                            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)', (site, *key, nazev, *values)).lastrowid
+                        counts['new'] += 1
+                    self.conn.execute('INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?, 0)',
+                                      (product_id, run_id, *values))
+                if complete:
+                    for key, (product_id, values, removed) in known.items():
+                        if key not in current and not removed:
+                            self.conn.execute('UPDATE products SET removed = 1 WHERE id = ?', (product_id,))
+                            self.conn.execute('INSERT INTO changes VALUES (?, ?, ?, ?, ?, ?, 1)',
+                                              (product_id, run_id, *values))
+                            counts['removed'] += 1
+        return run_id, counts
+    
+    def last_run(self, site=None):
+        """Číslo posledního běhu (webu)"""
+        with self.lock:
+            if site:
+                return self.conn.execute('SELECT MAX(id) FROM runs WHERE site = ?', (site,)).fetchone()[0]
+            return self.conn.execute('SELECT MAX(id) FROM runs').fetchone()[0]
+    
+    def changes(self, since_run=None, site=None):
+        """Změny i s předchozími hodnotami - v bězích po since_run, nebo (None)
+        v posledním běhu každého webu"""
+        if since_run is None:
+            where, params = ['c.run_id = (SELECT MAX(id) FROM runs WHERE site = p.site)'], []
+        else:
+            where, params = ['c.run_id > ?'], [since_run]
+        if site:
+            where.append('p.site = ?')
+            params.append(site)
+        query = '''
+            SELECT r.id, r.started, p.site, p.ean, p.url, p.nazev,
+                   c.cena, c.cena_puvodni, c.sleva, c.dostupnost, c.removed,
+                   o.cena, o.cena_puvodni, o.sleva, o.dostupnost
+            FROM changes c
+            JOIN runs r ON r.id = c.run_id
+            JOIN products p ON p.id = c.product_id
+            LEFT JOIN changes o ON o.product_id = c.product_id AND o.run_id = (
+                SELECT MAX(run_id) FROM changes WHERE product_id = c.product_id AND run_id < c.run_id)
+            WHERE ''' + ' AND '.join(where) + ' ORDER BY c.run_id, p.id'
+        columns = ['run', 'cas', 'web', 'ean', 'url', 'nazev'] + self.TRACKED + ['zmizel'] + \
+                  [f'{name}_predtim' for name in self.TRACKED]
+        with self.lock:
+            rows = self.conn.execute(query, params).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def series(self, ean=None, url=None):
+        """Časová řada jednoho produktu (podle EAN a/nebo URL)"""
+        conditions = [name + ' = ?' for name, value in (('p.ean', ean), ('p.url', url)) if value]
+        query = ('SELECT r.started, p.ean, p.url, c.cena, c.cena_puvodni, c.sleva, c.dostupnost, c.removed '
+                 'FROM products p JOIN changes c ON c.product_id = p.id JOIN runs r ON r.id = c.run_id '
+                 'WHERE ' + ' AND '.join(conditions) + ' ORDER BY p.id, c.run_id')
+        columns = ['cas', 'ean', 'url'] + self.TRACKED + ['zmizel']
+        with self.lock:
+            rows = self.conn.execute(query, [value for value in (ean, url) if value]).fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+    
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+def record_price_history(complete):
+    """Na konci běhu zapíše změny do PRICE_HISTORY_DB"""
+    if not PRICE_HISTORY_DB or not products_data:
+        return
+    try:
+        history = PriceHistory(PRICE_HISTORY_DB)
+        run_id, counts = history.record_run(DOMAIN, products_data, complete)
+        history.close()
+    except Exception as e:
+        print(f"   ⚠️ Historii cen se nepodařilo zapsat: {e}")
+        return
+    print(f"   📈 Historie cen (běh #{run_id}): nové {counts['new']}, změněné {counts['changed']}, "
+          f"zmizelé {counts['removed']}, beze změny {counts['unchanged']}")
+
+def price_changes(since_run=None, site=None, path=None):
+    """Co se změnilo od běhu since_run (None = poslední běh) - seznam slovníků"""
+    history = PriceHistory(path or PRICE_HISTORY_DB)
+    try:
+        return history.changes(since_run, site)
+    finally:
+        history.close()
 
 # ===========================================================================
 # HLAVNÍ SCRAPING
 # ===========================================================================
 
-print("=" * 70)
-print("🛒 UNIVERZÁLNÍ E-SHOP SCRAPER")
-print("=" * 70)
-print(f"🎯 Web: {BASE_URL}")
-print(f"📊 Již staženo: {len(products_data)} produktů")
-print(f"🔗 URL v paměti: {len(all_product_urls)}")
-print(f"📁 Navštíveno stránek: {len(visited_pages)}")
-print("=" * 70)
-print("💡 Pro ZASTAVENÍ klikněte ⏹️ Stop")
-print("💡 Po zastavení spusťte BUŇKU 4 pro stažení")
-print("💡 Pro pokračování znovu spusťte tuto buňku")
-print("=" * 70)
+def run():
+    """Celý běh pro nastavený web - FÁZE 1 + 2, souhrn a export (BUŇKA 3 v Colabu)"""
+    print("=" * 70)
+    print("🛒 UNIVERZÁLNÍ E-SHOP SCRAPER")
+    print("=" * 70)
+    prepare_frontier()
+    prepare_products()
+    if STATE_DB:
+        attach_crawl_state()
+    remember_canonical_forms(all_product_urls)
+    print(f"🎯 Web: {BASE_URL}")
+    print(f"📊 Již staženo: {len(products_data)} produktů")
+    print(f"🔗 URL v paměti: {len(all_product_urls)}")
+    print(f"📁 Navštíveno stránek: {len(visited_pages)}")
+    print("=" * 70)
+    print("💡 Pro ZASTAVENÍ klikněte ⏹️ Stop")
+    print("💡 Po zastavení spusťte BUŇKU 4 pro stažení")
+    print("💡 Pro pokračování znovu spusťte tuto buňku")
+    print("=" * 70)
+    start_metrics_export()
+    interrupted = False
 
-try:
-    # =========================================================================
-    # FÁZE 1: Objevování stránek a URL produktů
-    # =========================================================================
-    if len(all_product_urls) == 0:
-        print(f"\n📁 FÁZE 1: Prozkoumávání webu\n")
-        
-        # Začneme od hlavní stránky a známých kategorií
-        pages_to_visit = {BASE_URL}
-        
-        # Přidáme známé kategorie
-        known_cats = get_known_categories()
-        if known_cats:
-            print(f"   📂 Nalezeno {len(known_cats)} známých kategorií")
-            pages_to_visit.update(known_cats)
-        
-        pages_visited_this_run = 0
-        
-        while pages_to_visit and len(visited_pages) < MAX_PAGES:
-            url = pages_to_visit.pop()
-            
-            if url in visited_pages:
-                continue
-            
-            pages_visited_this_run += 1
-            print(f"   [{pages_visited_this_run}|{len(visited_pages)+1}] {url[:65]}...", end=" ", flush=True)
-            
-            html = get_page(url)
-            if not html:
-                print("❌")
+    try:
+        # Platforma se zjišťuje jednou pro web - určuje profil selektorů obou fází
+        metrics.phase('platforma')
+        ensure_platform()
+
+        # =========================================================================
+        # FÁZE 1: Objevování stránek a URL produktů
+        # =========================================================================
+        crawl_pending = bool(pages_to_visit)   # Přerušené procházení webu z minula
+        if platform_api_pending():
+            metrics.phase('api')
+            scrape_platform_api()
+        resumed = len(all_product_urls) > 0 and not crawl_pending
+        # Data z výpisů vyžadují procházení kategorií - sitemap je tehdy jen na přání
+        use_sitemap = DISCOVERY_MODE == 'sitemap' or (DISCOVERY_MODE == 'auto' and not LISTING_EXTRACTION)
+        if not resumed and not crawl_pending and use_sitemap:
+            print("\n🗺️ FÁZE 1: Objevování produktů ze sitemap\n")
+            metrics.phase('sitemap')
+            added = discover_from_sitemaps()
+            if added == 0 and DISCOVERY_MODE == 'auto':
+                print("   ⚠️ Sitemap bez produktů - procházím web")
+
+        if (len(all_product_urls) == 0 or crawl_pending) and DISCOVERY_MODE != 'sitemap':
+            print("\n📁 FÁZE 1: Prozkoumávání webu\n")
+            metrics.phase('crawl')
+
+            if crawl_pending:
+                print(f"   ↩️ Pokračuji ve frontě: {len(pages_to_visit)} stránek")
+            else:
+                # Začneme od hlavní stránky a známých kategorií
+                pages_to_visit.add(BASE_URL, PRIORITY_PAGINATION, 0)
+
+                # Přidáme známé kategorie
+                known_cats = get_known_categories()
+                if known_cats:
+                    print(f"   📂 Nalezeno {len(known_cats)} známých kategorií")
+                    pages_to_visit.update(known_cats, PRIORITY_PAGINATION, 0)
+
+            pages_visited_this_run = 0
+            listing_recorded = 0
+
+            while pages_to_visit and len(visited_pages) < MAX_PAGES:
+                url, depth = pages_to_visit.pop()
+
+                if url in visited_pages:
+                    continue
+
+                pages_visited_this_run += 1
+                print(f"   [{pages_visited_this_run}|{len(visited_pages)+1}] {url[:65]}...", end=" ", flush=True)
+
+                html = get_page(url)
+                if not html:
+                    print("❌")
+                    visited_pages.add(url)
+                    pause()
+                    continue
+
+                soup = BeautifulSoup(html, HTML_PARSER)
                 visited_pages.add(url)
-                time.sleep(get_delay())
-                continue
-            
-            soup = BeautifulSoup(html, 'html.parser')
-            visited_pages.add(url)
-            
-            # Najdi produkty
-            new_products = find_product_links(soup, url)
-            before = len(all_product_urls)
-            all_product_urls.update(new_products)
-            added = len(all_product_urls) - before
-            
-            # Najdi další stránky k prozkoumání
-            cat_links = find_category_links(soup, url)
-            pag_links = find_pagination_links(soup, url)
-            
-            new_pages = (cat_links | pag_links) - visited_pages
-            pages_to_visit.update(new_pages)
-            
-            print(f"✅ +{added} (celkem: {len(all_product_urls)}, fronta: {len(pages_to_visit)})")
-            
-            time.sleep(get_delay())
-            
-            if len(all_product_urls) >= MAX_PRODUCTS:
-                print(f"\n   ⚠️ Dosažen limit {MAX_PRODUCTS} produktů")
-                break
-        
-        print(f"\n{'='*70}")
-        print(f"📊 FÁZE 1 DOKONČENA")
-        print(f"   Navštíveno stránek: {len(visited_pages)}")
-        print(f"   Nalezeno URL produktů: {len(all_product_urls)}")
-        print("=" * 70)
-    else:
-        print(f"\n📊 Pokračuji - {len(all_product_urls)} URL v paměti\n")
+
+                # Najdi produkty
+                new_products = find_product_links(soup, url)
+                before = len(all_product_urls)
+                all_product_urls.update(new_products)
+                if LISTING_EXTRACTION:
+                    listing_recorded += record_listing_products(soup, url)
+                added = len(all_product_urls) - before
+
+                # Najdi další stránky k prozkoumání
+                cat_links = find_category_links(soup, url)
+                pag_links = find_pagination_links(soup, url)
+
+                # Další strana téže výpisu má přednost před hlubšími kategoriemi
+                for link in pag_links:
+                    if link not in visited_pages:
+                        pages_to_visit.add(link, PRIORITY_PAGINATION, depth)
+                for link in cat_links - pag_links:
+                    if link not in visited_pages:
+                        pages_to_visit.add(link, PRIORITY_CATEGORY, depth + 1)
+
+                print(f"✅ +{added} (celkem: {len(all_product_urls)}, fronta: {len(pages_to_visit)})")
+
+                pause()
+
+                if len(all_product_urls) >= MAX_PRODUCTS:
+                    print(f"\n   ⚠️ Dosažen limit {MAX_PRODUCTS} produktů")
+                    break
+
+            # FÁZE 1 dokončena - zbytek fronty se při pokračování neobnovuje
+            pages_to_visit.clear()
+
+            print(f"\n{'='*70}")
+            print("📊 FÁZE 1 DOKONČENA")
+            print(f"   Navštíveno stránek: {len(visited_pages)}")
+            print(f"   Nalezeno URL produktů: {len(all_product_urls)}")
+            if LISTING_EXTRACTION:
+                print(f"   Kompletních záznamů z výpisů: {listing_recorded} (detail se nestahuje)")
+            print("=" * 70)
+        elif resumed and not platform_api_used:
+            print(f"\n📊 Pokračuji - {len(all_product_urls)} URL v paměti\n")
+
+        # =========================================================================
+        # FÁZE 2: Stahování detailů produktů
+        # =========================================================================
+        print("\n📦 FÁZE 2: Stahování detailů produktů\n")
+        metrics.phase('detail')
+
+        # Podle <lastmod> ze sitemap - nejdřív nedávno změněné produkty
+        urls_to_process = lastmod_order(all_product_urls - processed_urls)
+        total = len(urls_to_process)
+
+        print(f"   Ke zpracování: {total}")
+        print(f"   Již hotovo: {len(processed_urls)}")
+        print(f"   Staženo produktů: {len(products_data)}\n")
+
+        if total == 0:
+            print("   ✅ Všechny URL již zpracovány!")
+
+        start_time = time.time()
+
+        if WORK_QUEUE:
+            print(f"   🌐 Distribuovaně přes frontu {WORK_QUEUE}, zde {max(CONCURRENT_WORKERS, 1)} vláken\n")
+            scrape_distributed(urls_to_process)
+        elif CONCURRENT_WORKERS > 1 or PARSE_WORKERS > 1:
+            workers = max(CONCURRENT_WORKERS, 1)
+            print(f"   ⚡ Souběžně: {workers} vláken, max {MAX_PER_HOST} na host"
+                  + (f", {PARSE_WORKERS} procesů parseru" if PARSE_WORKERS > 1 else "") + "\n")
+            scrape_concurrently(urls_to_process, workers)
+        else:
+            for i, url in enumerate(urls_to_process, 1):
+                print_progress(i, total, start_time)
+                if url in processed_urls:   # Mezitím zpracována přes rel=canonical
+                    continue
+
+                try:
+                    data = extract_product_data(url)
+                except Exception:
+                    data = None
+
+                record_product(url, data)
+                pause()
+
+                # Průběžné ukládání každých 50 produktů
+                if i % 50 == 0:
+                    save_progress()
+
+    except KeyboardInterrupt:
+        print("\n\n⏹️ ZASTAVENO UŽIVATELEM")
+        interrupted = True
+        save_progress()
+
+    # Závěrečná statistika
+    metrics.phase(None)
+    print(f"\n\n{'='*70}")
+    print("📊 AKTUÁLNÍ STAV")
+    print("="*70)
+    print(f"   Web:                 {BASE_URL}")
+    counts = products_data.summary()
+    print(f"   Staženo produktů:    {counts['products']}")
+    print(f"   S EAN kódem:         {counts['ean']}")
+    print(f"   S cenou:             {counts['cena']}")
+    print(f"   Ve slevě:            {counts['sleva']}")
+    print(f"   Zpracováno URL:      {len(processed_urls)}/{len(all_product_urls)}")
+    print(f"   Zbývá:               {len(all_product_urls) - len(processed_urls)}")
+    if canonical_duplicates:
+        print(f"   Duplicity (canonical): {canonical_duplicates}")
+    if crawl_state:
+        crawl_state.commit()
+    if page_validators:
+        page_validators.commit()
+        unchanged = incremental_stats['lastmod'] + incremental_stats['304'] + incremental_stats['hash']
+        print(f"   Beze změny:          {unchanged} (lastmod {incremental_stats['lastmod']}, "
+              f"304 {incremental_stats['304']}, hash {incremental_stats['hash']})")
+    resolved = ', '.join(f"{name} {extraction_stats[name]}"
+                         for name in ('json-ld', 'microdata', 'opengraph', 'selektory'))
+    print(f"   Přeneseno:           {download_stats['bytes'] / 1e6:.1f} MB "
+          f"(zkráceno {download_stats['truncated']}, předčasný konec {download_stats['early_stop']}, "
+          f"jiný typ {download_stats['wrong_type']})")
+    if response_cache:
+        response_cache.commit()
+        print(f"   Cache odpovědí:      z cache {cache_stats['hit']}, chybělo {cache_stats['miss']}, "
+              f"uloženo {cache_stats['stored']}, vyřazeno {cache_stats['evicted']}")
+    waits = metrics.by_label('wait_seconds_total', 'reason')
+    print(f"   Čas (součet vláken): síť {metrics.total('fetch_seconds'):.1f} s, "
+          f"parsování {metrics.total('parse_seconds'):.1f} s, čekání {sum(waits.values()):.1f} s "
+          f"(limit {waits.get('rate_limit', 0):.1f}, backoff {waits.get('backoff', 0):.1f}, "
+          f"pauzy {waits.get('pause', 0):.1f})")
+    statuses = metrics.by_label('http_responses_total', 'status')
+    if statuses:
+        print("   HTTP:                " + ', '.join(f"{code} ×{count}" for code, count in sorted(statuses.items()))
+              + f", opakování {metrics.total('fetch_retries_total'):g}, chyby {metrics.total('fetch_errors_total'):g}")
+    phases = metrics.by_label('phase_seconds_total', 'phase')
+    if phases:
+        print("   Fáze:                " + ', '.join(f"{name} {seconds:.1f} s" for name, seconds in phases.items()))
+    if any(extraction_stats.values()):
+        print(f"   Zdroj dat:           {resolved}")
+        print(f"   EAN záložně:         tabulka {extraction_stats['ean_tabulka']}, "
+              f"regex {extraction_stats['ean_regex']}")
+    print("="*70)
+    # Zmizelé produkty jen po úplném běhu (ne po přerušení či limitu MAX_PRODUCTS)
+    record_price_history(complete=not interrupted and len(processed_urls) >= len(all_product_urls)
+                         and len(products_data) < MAX_PRODUCTS)
+    export_excel_from_sink()
+    dump_metrics()
+    if EXCEL_EXPORT:
+        print("\n✅ Spusťte BUŇKU 4 pro stažení Excel souboru")
+    print("💡 Nebo znovu tuto buňku pro pokračování")
+
+    session.close()
+
+# ===========================================================================
+# KNIHOVNA A PŘÍKAZOVÁ ŘÁDKA
+# ===========================================================================
+
+def configure(url=None, **settings):
+    """Nastaví web a konstanty z KONFIGURACE (stejná jména jako v souboru).
     
-    # =========================================================================
-    # FÁZE 2: Stahování detailů produktů
-    # =========================================================================
-    print(f"\n📦 FÁZE 2: Stahování detailů produktů\n")
+    Znovu vytvoří objekty, které se z konfigurace počítají při načtení
+    modulu (session, cache odpovědí, klasifikátor URL, validátory...).
+    """
+    global BASE_URL, DOMAIN, session, response_cache, page_validators
+    global url_classifier, rate_limiter, metrics
+    module = globals()
+    for name, value in settings.items():
+        if not name.isupper() or name not in module:
+            raise ValueError(f"Neznámé nastavení: {name}")
+        module[name] = value
+    if url:
+        BASE_URL = url.strip().rstrip('/')
+        DOMAIN = urlparse(BASE_URL).netloc
     
-    urls_to_process = list(all_product_urls - processed_urls)
-    total = len(urls_to_process)
+    session.close()
+    session = open_session()
+    if response_cache:
+        response_cache.commit()
+    response_cache = open_response_cache()
+    if page_validators:
+        page_validators.commit()
+    page_validators = open_page_validators()
+    url_classifier = UrlClassifier.for_domain(DOMAIN)
+    selector_profiles.clear()
+    selector_plans.clear()
+    is_product_url.cache_clear()
+    is_category_url.cache_clear()
+    rate_limiter = AdaptiveRateLimiter()
+    metrics = Metrics()
+    for stats in (download_stats, extraction_stats, cache_stats, incremental_stats):
+        stats.update(dict.fromkeys(stats, 0))
+
+def reset_state(delete_state_db=False):
+    """Zapomene data i frontu předchozího webu (jako BUŇKA 5)"""
+    global products_data, all_product_urls, processed_urls, visited_pages, category_urls
+    global site_platform, platform_checked, platform_api_used, url_lastmod, pages_to_visit
+    global crawl_state, canonical_forms, canonical_duplicates, saved_count, saved_path
+    products_data = []
+    all_product_urls = set()
+    processed_urls = set()
+    visited_pages = set()
+    category_urls = set()
+    site_platform = None
+    platform_checked = False
+    platform_api_used = None
+    url_lastmod = {}
+    if isinstance(pages_to_visit, CrawlFrontier):
+        pages_to_visit.close()
+    pages_to_visit = set()
+    crawl_state = None
+    canonical_forms = {}
+    canonical_duplicates = 0
+    close_output_sink()
+    saved_count = 0
+    saved_path = None
+    if delete_state_db:
+        # Smazat i uložený stav crawlu na disku
+        for suffix in ['', '-wal', '-shm']:
+            if STATE_DB and os.path.exists(STATE_DB + suffix):
+                os.remove(STATE_DB + suffix)
+
+class Scraper:
+    """Scraper jednoho e-shopu pro použití z Pythonu.
     
-    print(f"   Ke zpracování: {total}")
-    print(f"   Již hotovo: {len(processed_urls)}")
-    print(f"   Staženo produktů: {len(products_data)}\n")
+        from scraper import Scraper
+        products = Scraper('https://shop.cz', CONCURRENT_WORKERS=8,
+                           OUTPUT_PATH='/tmp/shop', EXCEL_EXPORT=False).run()
     
-    if total == 0:
-        print("   ✅ Všechny URL již zpracovány!")
+    Nastavení jsou konstanty z KONFIGURACE. Stav běhu zůstává v modulu
+    (jako v Colabu), takže v jednom modulu běží naráz jen jeden Scraper;
+    více e-shopů souběžně viz run_batch().
+    """
     
-    start_time = time.time()
+    def __init__(self, url, **settings):
+        self.url = url
+        self.settings = settings
     
-    for i, url in enumerate(urls_to_process, 1):
-        elapsed = time.time() - start_time
-        rate = i / elapsed if elapsed > 0 else 0
-        eta = (total - i) / rate if rate > 0 else 0
-        
-        print(f"\r   [{i}/{total}] {(i/total)*100:.1f}% | "
-              f"Produktů: {len(products_data)} | "
-              f"ETA: {int(eta//60)}m {int(eta%60)}s   ", end="", flush=True)
-        
-        try:
-            data = extract_product_data(url)
-            if data and data['nazev']:
-                products_data.append(data)
-        except Exception as e:
-            pass
-        
-        processed_urls.add(url)
-        time.sleep(get_delay())
-        
-        # Průběžné ukládání každých 50 produktů
-        if i % 50 == 0:
-            save_progress()
+    def run(self, resume=False):
+        """Projde web a vrátí seznam záznamů; resume=True = pokračovat v předchozím stavu"""
+        configure(self.url, **self.settings)
+        if not resume:
+            reset_state()
+        run()
+        return products_data
+    
+    @property
+    def products(self):
+        return products_data
 
-except KeyboardInterrupt:
-    print("\n\n⏹️ ZASTAVENO UŽIVATELEM")
-    save_progress()
+def site_defaults(url, directory=''):
+    """Výchozí výstupní soubory podle domény (příkazová řádka, dávkový režim)"""
+    domain = urlparse(url).netloc.replace('www.', '').replace('.', '_').replace(':', '_')
+    base = os.path.join(directory, f'eshop_{domain}')
+    return {
+        'OUTPUT_PATH': base,
+        'PROGRESS_EXCEL': base + '.xlsx',
+        'INCREMENTAL_DB': base + '_incremental.sqlite',
+        'EXCEL_EXPORT': False,
+    }
+
+def load_site_module(name, log):
+    """Nová, nezávislá kopie tohoto modulu - vlastní globální stav pro jeden web.
+    
+    Zdroj se bere z linecache, takže funguje i pro kód vložený do buňky
+    Colabu; výpisy kopie jdou do souboru log.
+    """
+    filename = run.__code__.co_filename
+    source = ''.join(linecache.getlines(filename))
+    if not source:
+        raise RuntimeError("Zdrojový kód scraperu není k dispozici pro dávkový režim")
+    module = types.ModuleType(name)
+    # print se hledá nejdřív v globálních jménech modulu
+    module.print = partial(print, file=log)
+    sys.modules[name] = module
+    exec(compile(source, filename, 'exec'), module.__dict__)
+    return module
+
+def run_site(site, number, common, slots, directory, log_dir):
+    """Jeden web dávky v kopii modulu - vrací souhrn pro run_batch()"""
+    if isinstance(site, str):
+        site = {'url': site}
+    site = dict(site)
+    url = site.pop('url')
+    domain = urlparse(url).netloc
+    categories = site.pop('categories', None)
+    settings = {**site_defaults(url, directory), **common, **site}
+    if categories:
+        settings['KNOWN_CATEGORIES'] = {domain: categories}
+    # Stav crawlu a cache zvlášť pro každý web, metriky se exportují za celou
+    # dávku; procesy parseru se z vícevláknového procesu nespouští (fork)
+    # a distribuovaná fronta patří jednomu webu
+    if settings.get('STATE_DB', STATE_DB) and 'STATE_DB' not in site:
+        settings['STATE_DB'] = settings['OUTPUT_PATH'] + '_state.sqlite'
+    if settings.get('RESPONSE_CACHE', RESPONSE_CACHE) and 'RESPONSE_CACHE' not in site:
+        settings['RESPONSE_CACHE'] = os.path.join(settings.get('RESPONSE_CACHE', RESPONSE_CACHE),
+                                                  domain.replace(':', '_'))
+    settings.update(METRICS_PORT=None, METRICS_JSON=None, PARSE_WORKERS=0, WORK_QUEUE=None, QUEUE_PORT=None)
+    
+    name = f'eshop_site_{number}'
+    log = open(os.path.join(log_dir, domain.replace(':', '_') + '.log') if log_dir else os.devnull,
+               'w', encoding='utf-8')
+    started = time.monotonic()
+    result = {'url': url, 'products': 0, 'output': None, 'seconds': 0.0, 'error': None}
+    try:
+        module = load_site_module(name, log)
+        module.request_slots = slots
+        products = module.Scraper(url, **settings).run(resume=bool(settings.get('STATE_DB', module.STATE_DB)))
+        result['products'] = len(products)
+        if module.OUTPUT_FORMAT:
+            result['output'] = module.OUTPUT_PATH + module.OUTPUT_SINKS[module.OUTPUT_FORMAT].extension
+        metrics.merge(module.metrics.raw())
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        print(result['error'], file=log)
+    finally:
+        sys.modules.pop(name, None)
+        result['seconds'] = time.monotonic() - started
+        log.close()
+    return result
+
+def run_batch(sites, settings=None, directory='', max_sites=None, max_requests=None, log_dir=None):
+    """Stáhne více e-shopů souběžně v jednom procesu.
+    
+    sites = seznam URL nebo slovníků {'url': ..., 'categories': [...],
+    'NÁZEV': hodnota, ...} (categories jako v KNOWN_CATEGORIES, ostatní
+    klíče jako v KONFIGURACI); settings platí pro všechny weby, pokud je
+    web nepřepíše, výstupy jdou do directory. Každý web běží v nezávislé kopii modulu -
+    vlastní stav, výstup, pauzy a tempo per host; všechny sdílí strop
+    souběžných HTTP požadavků, který se během pauz uvolňuje pro ostatní.
+    """
+    max_sites = max_sites or BATCH_SITES
+    slots = threading.BoundedSemaphore(max_requests or BATCH_MAX_REQUESTS)
+    log_dir = log_dir or BATCH_LOG_DIR
+    if log_dir:
+        os.makedirs(log_dir, exist_ok=True)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    start_metrics_export()
+    
+    print(f"🛒 Dávka: {len(sites)} webů, současně {max_sites}, "
+          f"max. {max_requests or BATCH_MAX_REQUESTS} požadavků naráz")
+    started = time.monotonic()
+    results = []
+    with ThreadPoolExecutor(max_workers=max_sites) as executor:
+        futures = [executor.submit(run_site, site, number, settings or {}, slots, directory, log_dir)
+                   for number, site in enumerate(sites)]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = f"❌ {result['error']}" if result['error'] else f"✅ {result['products']} produktů"
+            print(f"   [{len(results)}/{len(sites)}] {result['url']}: {status} ({result['seconds']:.0f} s)")
+    
+    elapsed = time.monotonic() - started
+    total = sum(result['products'] for result in results)
+    failed = sum(1 for result in results if result['error'])
+    print(f"📊 Hotovo za {elapsed:.0f} s: {total} produktů z {len(results) - failed} webů"
+          + (f", {failed} chyb" if failed else ""))
+    dump_metrics()
+    return results
+
+def read_sites(path):
+    """Seznam webů ze souboru - JSON (viz run_batch) nebo jedna URL na řádek"""
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    try:
+        return json.loads(text)
+    except ValueError:
+        return [line.strip() for line in text.splitlines()
+                if line.strip() and not line.lstrip().startswith('#')]
 
-# Závěrečná statistika
-print(f"\n\n{'='*70}")
-print("📊 AKTUÁLNÍ STAV")
-print("="*70)
-print(f"   Web:                 {BASE_URL}")
-print(f"   Staženo produktů:    {len(products_data)}")
-print(f"   S EAN kódem:         {len([p for p in products_data if p.get('ean')])}")
-print(f"   S cenou:             {len([p for p in products_data if p.get('cena')])}")
-print(f"   Ve slevě:            {len([p for p in products_data if p.get('sleva')])}")
-print(f"   Zpracováno URL:      {len(processed_urls)}/{len(all_product_urls)}")
-print(f"   Zbývá:               {len(all_product_urls) - len(processed_urls)}")
-print("="*70)
-print("\n✅ Spusťte BUŇKU 4 pro stažení Excel souboru")
-print("💡 Nebo znovu tuto buňku pro pokračování")
+def parse_setting(text):
+    """NÁZEV=HODNOTA z příkazové řádky - hodnota jako JSON, jinak řetězec"""
+    name, _, value = text.partition('=')
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    return name.strip(), value
+
+def main(argv=None):
+    """Příkazová řádka: python scraper.py https://shop.cz [volby] / --batch weby.json / --worker FRONTA
+    / --changes HISTORIE.sqlite"""
+    import argparse
+    parser = argparse.ArgumentParser(description='Univerzální e-shop scraper')
+    parser.add_argument('url', nargs='?', help='adresa e-shopu')
+    parser.add_argument('--batch', metavar='SOUBOR',
+                        help='dávka webů - JSON seznam (viz run_batch) nebo jedna URL na řádek')
+    parser.add_argument('--worker', metavar='FRONTA',
+                        help='jen stahovat detaily ze sdílené fronty (soubor WORK_QUEUE nebo http://stroj:port)')
+    parser.add_argument('-o', '--output', help='průběžný výstup bez přípony (výchozí: podle domény); '
+                                               'u dávky adresář výstupů')
+    parser.add_argument('-f', '--format', choices=list(OUTPUT_SINKS), default='jsonl')
+    parser.add_argument('--excel', metavar='SOUBOR', help='na konci vytvořit i Excel (pandas + openpyxl)')
+    parser.add_argument('-w', '--workers', type=int, help='souběžná stahování (CONCURRENT_WORKERS)')
+    parser.add_argument('--parse-workers', type=int, help='procesy parseru (PARSE_WORKERS)')
+    parser.add_argument('--state', help='SQLite se stavem crawlu pro pokračování (STATE_DB)')
+    parser.add_argument('--cache', help='adresář cache odpovědí (RESPONSE_CACHE)')
+    parser.add_argument('--history', help='historie cen a dostupnosti mezi běhy (PRICE_HISTORY_DB)')
+    parser.add_argument('--changes', metavar='HISTORIE',
+                        help='jen vypsat změny posledního běhu (nebo od --since) z historie cen jako CSV')
+    parser.add_argument('--since', type=int, metavar='BĚH', help='--changes: změny po tomto běhu')
+    parser.add_argument('--site', help='--changes: jen tento web (doména)')
+    parser.add_argument('--queue', help='FÁZI 2 rozdělit přes sdílenou frontu v tomto souboru (WORK_QUEUE)')
+    parser.add_argument('--queue-port', type=int, help='zpřístupnit frontu workerům na jiných strojích (QUEUE_PORT)')
+    parser.add_argument('--sites', type=int, help='dávka: webů současně (BATCH_SITES)')
+    parser.add_argument('--max-requests', type=int, help='dávka: požadavků naráz (BATCH_MAX_REQUESTS)')
+    parser.add_argument('--logs', help='dávka: adresář s výpisem každého webu (BATCH_LOG_DIR)')
+    parser.add_argument('--set', action='append', default=[], metavar='NÁZEV=HODNOTA',
+                        help='libovolná konstanta z KONFIGURACE, hodnota jako JSON')
+    args = parser.parse_args(argv)
+    if sum(map(bool, (args.url, args.batch, args.worker, args.changes))) != 1:
+        parser.error('zadejte buď URL, nebo --batch, --worker či --changes')
+    if args.changes:
+        rows = price_changes(args.since, args.site, args.changes)
+        out = open(args.output, 'w', encoding='utf-8-sig', newline='') if args.output else sys.stdout
+        writer = csv.DictWriter(out, fieldnames=list(rows[0]) if rows else ['run'])
+        writer.writeheader()
+        writer.writerows(rows)
+        if args.output:
+            out.close()
+        return 0
+    
+    settings = {'OUTPUT_FORMAT': args.format}
+    if args.workers is not None:
+        settings['CONCURRENT_WORKERS'] = args.workers
+    if args.parse_workers is not None:
+        settings['PARSE_WORKERS'] = args.parse_workers
+    if args.state:
+        settings['STATE_DB'] = args.state
+    if args.cache:
+        settings['RESPONSE_CACHE'] = args.cache
+    if args.history:
+        settings['PRICE_HISTORY_DB'] = args.history
+    if args.queue:
+        settings['WORK_QUEUE'] = args.queue
+    if args.queue_port:
+        settings['QUEUE_PORT'] = args.queue_port
+    settings.update(parse_setting(item) for item in args.set)
+    if args.worker:
+        # Výstup zapisuje koordinátor - worker jen vrací záznamy do fronty
+        configure(**settings)
+        run_worker(args.worker)
+        return 0
+    if args.batch:
+        # Excel a stav crawlu se pojmenují podle domény každého webu
+        if args.excel:
+            settings['EXCEL_EXPORT'] = True
+        # Export metrik patří celé dávce (weby ho mají vypnutý)
+        configure(**{name: settings.pop(name)
+                     for name in ('METRICS_PORT', 'METRICS_HOST', 'METRICS_JSON', 'METRICS_INTERVAL')
+                     if name in settings})
+        results = run_batch(read_sites(args.batch), settings, args.output or '',
+                            args.sites, args.max_requests, args.logs)
+        return 1 if any(result['error'] for result in results) else 0
+    
+    settings = {**site_defaults(args.url), **settings}
+    if args.output:
+        settings['OUTPUT_PATH'] = args.output
+    if args.excel:
+        settings.update(EXCEL_EXPORT=True, PROGRESS_EXCEL=args.excel)
+    Scraper(args.url, **settings).run(resume=bool(args.state))
+    return 0
 
-session.close()
+if __name__ == '__main__':
+    # Colab / Jupyter (URL_WEBU z BUŇKY 2) = běh hned jako dřív, jinak příkazová řádka
+    if 'URL_WEBU' in dir() or 'ipykernel' in sys.modules:
+        run()
+    else:
+        sys.exit(main())
 
 
 # =============================================================================
@@ -773,36 +4844,10 @@ session.close()
 from google.colab import files
 from datetime import datetime
 from urllib.parse import urlparse
-import pandas as pd
-import re
-
-def clean_for_excel(text):
-    if not isinstance(text, str):
-        return str(text) if text else ""
-    text = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\x9f]', '', text)
-    return text.strip()
 
 if 'products_data' in dir() and products_data:
-    # Vyčistit data
-    clean_data = []
-    for p in products_data:
-        clean_p = {k: clean_for_excel(v) for k, v in p.items()}
-        clean_data.append(clean_p)
-    
-    df = pd.DataFrame(clean_data)
-    df = df.rename(columns={
-        'nazev': 'Název produktu',
-        'ean': 'EAN',
-        'cena': 'Cena',
-        'cena_puvodni': 'Původní cena',
-        'sleva': 'Sleva',
-        'dostupnost': 'Dostupnost',
-        'url': 'URL'
-    })
-    
-    # Odstranit duplikáty
-    df = df.drop_duplicates(subset=['Název produktu', 'URL'])
-    df = df.sort_values('Název produktu')
+    # Dočištění, slevy, duplicity a řazení po sloupcích (export_frame)
+    df = export_frame(products_data).rename(columns=EXPORT_HEADERS)
     
     # Název souboru podle domény
     domain = urlparse(BASE_URL).netloc.replace('www.', '').replace('.', '_')
@@ -813,12 +4858,12 @@ if 'products_data' in dir() and products_data:
     print("="*70)
     print(f"   Web:              {BASE_URL}")
     print(f"   Celkem produktů:  {len(df)}")
-    print(f"   S EAN kódem:      {len(df[df['EAN'].astype(str).str.len() > 0])}")
-    print(f"   S cenou:          {len(df[df['Cena'].astype(str).str.len() > 0])}")
-    print(f"   Ve slevě:         {len(df[df['Sleva'].astype(str).str.len() > 0])}")
+    print(f"   S EAN kódem:      {(df['EAN'] != '').sum()}")
+    print(f"   S cenou:          {df['Cena'].notna().sum()}")
+    print(f"   Ve slevě:         {(df['Sleva'] != '').sum()}")
     print("="*70)
     
-    df.to_excel(filename, index=False)
+    write_xlsx(df, filename)
     files.download(filename)
     print(f"\n✅ Stahuji: {filename}")
 else:
@@ -830,10 +4875,36 @@ else:
 # BUŇKA 5: RESET (pro nový web)
 # =============================================================================
 """
-products_data = []
-all_product_urls = set()
-processed_urls = set()
-visited_pages = set()
-category_urls = set()
+reset_state(delete_state_db=True)
 print("🔄 Reset dokončen - změňte URL_WEBU v BUŇCE 2 a spusťte BUŇKU 3")
 """
+
+
+# =============================================================================
+# BUŇKA 6: MIKROBENCHMARK KLASIFIKACE URL (volitelné, po BUŇCE 3)
+# =============================================================================
+"""
+benchmark_url_classifier()
+"""
+
+
+# =============================================================================
+# BUŇKA 7: DÁVKA VÍCE E-SHOPŮ (volitelné, po BUŇCE 3 místo ní)
+# =============================================================================
+"""
+vysledky = run_batch([
+    'https://aktin.cz',
+    {'url': 'https://www.brainmarket.cz', 'categories': ['/doplnky-stravy/'], 'CONCURRENT_WORKERS': 2},
+], directory='/content/davka', log_dir='/content/davka/logy')
+"""
+
+
+# =============================================================================
+# BUŇKA 8: ZMĚNY CEN OD MINULÉHO BĚHU (volitelné, s PRICE_HISTORY_DB)
+# =============================================================================
+"""
+import pandas as pd
+zmeny = pd.DataFrame(price_changes(site=DOMAIN))
+print(f"📈 Změn v posledním běhu: {len(zmeny)}")
+zmeny
+"""
@@ -0,0 +1,33 @@
+"""Společné fixtures testů - scraper.py jako modul, stránky z benchmark fixtures"""
+
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, 'benchmark')]
+
+import scraper as scraper_module  # noqa: E402
+from bench import FixtureShop, PLATFORMS  # noqa: E402
+
+BASE_URL = 'https://www.shop.cz'
+
+@pytest.fixture
+def scraper(tmp_path):
+    """Modul scraperu nastavený na testovací web; po testu výchozí konfigurace"""
+    module = scraper_module
+    defaults = {name: getattr(module, name) for name in dir(module) if name.isupper()}
+    module.configure(BASE_URL, OUTPUT_PATH=str(tmp_path / 'vystup'), PROGRESS_EXCEL=str(tmp_path / 'vystup.xlsx'),
+                     EXCEL_EXPORT=False, STATE_DB=None, INCREMENTAL=False, RESPONSE_CACHE=None)
+    module.reset_state()
+    yield module
+    module.reset_state()
+    changed = {name: value for name, value in defaults.items()
+               if getattr(module, name) is not value and name not in ('BASE_URL', 'DOMAIN')}
+    module.configure(defaults['BASE_URL'], **changed)
+
+@pytest.fixture(scope='session', params=list(PLATFORMS))
+def shop(request):
+    """Fixture e-shop jedné platformy (vyrenderované stránky, bez serveru)"""
+    return FixtureShop(request.param, categories=2, per_category=6, per_page=4, page_kb=2)
@@ -0,0 +1,104 @@
+"""Adaptéry katalogových API platforem (Shopify products.json, WooCommerce Store API)"""
+
+import json
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from conftest import BASE_URL
+
+def shopify_product(i, variants):
+    return {'handle': f'protein-{i}', 'title': f'Protein {i}', 'variants': variants}
+
+def woo_product(i, price, regular=None, **extra):
+    return dict({'permalink': f'{BASE_URL}/produkt/kreatin-{i}/', 'name': f'Kreatin {i} &amp; more',
+                 'prices': {'price': str(price), 'regular_price': str(regular or price),
+                            'currency_minor_unit': 2},
+                 'is_in_stock': bool(i % 2)}, **extra)
+
+class Catalogue:
+    """Náhrada fetch_page - JSON stránky katalogu podle cesty a čísla stránky"""
+
+    def __init__(self, pages):
+        self.pages = pages          # (cesta, stránka) -> payload
+        self.requests = []
+
+    def __call__(self, url, retries=None, extra_headers=None, accept=None, early_stop=None):
+        parsed = urlparse(url)
+        page = int(parse_qs(parsed.query).get('page', ['1'])[0])
+        self.requests.append((parsed.path, page))
+        payload = self.pages.get((parsed.path, page))
+        if payload is None:
+            return 404, None, {}
+        return 200, json.dumps(payload), {'Content-Type': 'application/json'}
+
+@pytest.fixture
+def catalogue(scraper, monkeypatch):
+    def install(pages):
+        fake = Catalogue(pages)
+        monkeypatch.setattr(scraper, 'fetch_page', fake)
+        return fake
+    return install
+
+def test_shopify_records(scraper):
+    payload = {'products': [
+        shopify_product(1, [{'id': 11, 'title': 'Default Title', 'price': '1299.00',
+                             'compare_at_price': '1499.00', 'barcode': '8594000000011', 'available': True}]),
+        shopify_product(2, [{'id': 21, 'title': 'Vanilka', 'price': '599.50', 'compare_at_price': '599.50',
+                             'barcode': '', 'sku': '8594000000028', 'available': False},
+                            {'id': 22, 'title': 'Čokoláda', 'price': '599.50', 'compare_at_price': None}]),
+    ]}
+    one, vanilla, chocolate = scraper.ShopifyAdapter().records(payload)
+    assert one == dict(scraper.empty_record(f'{BASE_URL}/products/protein-1'), nazev='Protein 1',
+                       ean='8594000000011', cena='1299', cena_puvodni='1499', sleva='13%',
+                       dostupnost='Skladem')
+    # Více variant = záznam na variantu; sleva jen při vyšší compare_at_price
+    assert vanilla['nazev'] == 'Protein 2 - Vanilka' and vanilla['url'].endswith('/products/protein-2?variant=21')
+    assert (vanilla['ean'], vanilla['cena'], vanilla['cena_puvodni'], vanilla['dostupnost']) == \
+        ('8594000000028', '599.50', '', 'Vyprodáno')
+    assert chocolate['url'].endswith('?variant=22') and chocolate['ean'] == ''
+
+def test_woocommerce_records(scraper):
+    records = scraper.WooStoreAdapter().records([
+        woo_product(1, 129900, 149900, extensions={'gtin': {'ean': '8594000000035'}}),
+        woo_product(2, 59950),
+    ])
+    assert [record['nazev'] for record in records] == ['Kreatin 1 & more', 'Kreatin 2 & more']
+    assert [(r['cena'], r['cena_puvodni'], r['dostupnost']) for r in records] == \
+        [('1299', '1499', 'Skladem'), ('599.50', '', 'Vyprodáno')]
+    assert records[0]['url'] == f'{BASE_URL}/produkt/kreatin-1/'
+    assert [record['ean'] for record in records] == ['8594000000035', '']
+
+def test_adapter_falls_back_to_next_endpoint(scraper, catalogue):
+    """Starší WooCommerce bez /v1 - zkusí se další endpoint"""
+    fake = catalogue({('/wp-json/wc/store/products', 1): [woo_product(1, 10000)]})
+    scraper.site_platform = 'woocommerce'
+    adapter = scraper.find_platform_adapter()
+    assert isinstance(adapter, scraper.WooStoreAdapter)
+    assert adapter.endpoint == '/wp-json/wc/store/products'
+    assert [path for path, _ in fake.requests] == ['/wp-json/wc/store/v1/products', '/wp-json/wc/store/products']
+
+@pytest.mark.parametrize('platform, expected', [
+    ('shoptet', []),
+    (None, ['/products.json', '/wp-json/wc/store/v1/products', '/wp-json/wc/store/products']),
+])
+def test_adapter_candidates_by_platform(scraper, catalogue, platform, expected):
+    fake = catalogue({})
+    scraper.site_platform = platform
+    assert scraper.find_platform_adapter() is None
+    assert [path for path, _ in fake.requests] == expected
+
+def test_scrape_platform_api_pages_through_catalogue(scraper, catalogue):
+    scraper.configure(API_PAGE_SIZE=2)
+    scraper.site_platform = 'shopify'
+    pages = {('/products.json', page): {'products': [
+        shopify_product(page * 10 + i, [{'id': i, 'price': '100'}]) for i in range(2)]} for page in (1, 2)}
+    pages[('/products.json', 3)] = {'products': []}
+    fake = catalogue(pages)
+    scraper.processed_urls.add(f'{BASE_URL}/products/protein-11')    # Z minulého běhu
+    assert scraper.scrape_platform_api() == 3
+    assert scraper.platform_api_used == 'shopify'
+    assert [record['url'].rsplit('/', 1)[-1] for record in scraper.products_data] == \
+        ['protein-10', 'protein-20', 'protein-21']
+    # První stránka se po probe() nestahuje znovu, prázdná stránka katalog ukončí
+    assert fake.requests == [('/products.json', 1), ('/products.json', 2), ('/products.json', 3)]
@@ -0,0 +1,78 @@
+"""Dávkový režim - více webů v kopiích modulu (run_batch / run_site)"""
+
+import json
+
+import pytest
+
+from bench import FixtureShop, start_server
+
+FAST = dict(DELAY_MIN=0, DELAY_MAX=0, RATE_START=1000.0, RATE_MAX=1000.0, RESPONSE_CACHE=None, INCREMENTAL=False)
+
+@pytest.fixture(scope='module')
+def servers():
+    shops = [FixtureShop(platform, categories=1, per_category=3, per_page=2, page_kb=2)
+             for platform in ('shoptet', 'woocommerce')]
+    running = [start_server(shop) for shop in shops]
+    yield [(f'http://127.0.0.1:{server.server_address[1]}', shop) for server, shop in zip(running, shops)]
+    for server in running:
+        server.shutdown()
+        server.server_close()
+
+@pytest.fixture
+def resumes(scraper, monkeypatch):
+    """Zaznamená resume= předané Scraper.run() v každé kopii modulu"""
+    calls = []
+    load = scraper.load_site_module
+
+    def load_recording(name, log):
+        module = load(name, log)
+        run = module.Scraper.run
+
+        def run_recording(self, resume=False):
+            calls.append(resume)
+            return run(self, resume)
+        module.Scraper.run = run_recording
+        return module
+    monkeypatch.setattr(scraper, 'load_site_module', load_recording)
+    return calls
+
+def test_batch_writes_output_per_site(scraper, servers, tmp_path):
+    results = scraper.run_batch([url for url, _ in servers], FAST, directory=str(tmp_path))
+    assert not [result['error'] for result in results if result['error']]
+    for url, shop in servers:
+        result, = [result for result in results if result['url'] == url]
+        assert result['products'] == len(shop.products)
+        with open(result['output'], encoding='utf-8') as f:
+            urls = {json.loads(line)['url'] for line in f}
+        assert urls == {url + item['url'] for item in shop.products}
+    # Stav hlavního modulu dávka nemění
+    assert scraper.products_data == []
+
+def test_batch_reports_failed_site(scraper, servers, tmp_path):
+    """Chyba jednoho webu se zapíše do výsledku, ostatní weby doběhnou"""
+    (broken, _), (url, shop) = servers
+    results = scraper.run_batch([{'url': broken, 'OUTPUT_FORMAT': 'xyz'}, url], FAST, directory=str(tmp_path))
+    errors = {result['url']: result['error'] for result in results}
+    assert errors == {broken: "KeyError: 'xyz'", url: None}
+    assert [result['products'] for result in results if result['url'] == url] == [len(shop.products)]
+
+@pytest.mark.parametrize('where', ['common', 'site'])
+def test_batch_resumes_with_state_db(scraper, servers, tmp_path, resumes, where):
+    """STATE_DB ze settings (ne výchozí hodnota modulu) = navázat na uložený stav"""
+    url, shop = servers[0]
+    common, site = dict(FAST), {'url': url}
+    if where == 'common':
+        common['STATE_DB'] = True
+    else:
+        site['STATE_DB'] = str(tmp_path / 'stav.sqlite')
+    for _ in range(2):
+        result, = scraper.run_batch([site], common, directory=str(tmp_path))
+        assert result['error'] is None and result['products'] == len(shop.products)
+    assert resumes == [True, True]
+    with open(result['output'], encoding='utf-8') as f:
+        assert sum(1 for _ in f) == len(shop.products)
+
+def test_batch_without_state_db_starts_fresh(scraper, servers, tmp_path, resumes):
+    url, _ = servers[0]
+    scraper.run_batch([url], FAST, directory=str(tmp_path))
+    assert resumes == [False]
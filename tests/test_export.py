@@ -0,0 +1,57 @@
+"""Export - dávkové dočištění sloupců (export_frame) a write-only Excel (write_xlsx)"""
+
+import math
+
+import pytest
+
+from conftest import BASE_URL
+
+pytest.importorskip('pandas')
+openpyxl = pytest.importorskip('openpyxl')
+
+def record(scraper, i, nazev, cena='', cena_puvodni='', **values):
+    data = dict(scraper.empty_record(f'{BASE_URL}/p{i}/'), nazev=nazev, cena=cena, cena_puvodni=cena_puvodni,
+                **values)
+    scraper.fill_discount(data)
+    return data
+
+def test_export_frame_cleans_columns(scraper):
+    records = [
+        record(scraper, 0, 'Protein\x07 ', '100', '120', dostupnost=' Skladem\x1f'),
+        record(scraper, 1, 'Amino', '99.50'),
+        record(scraper, 2, 'Creatin', 'zdarma', '10'),
+        record(scraper, 0, 'Protein\x07 ', '100', '120'),     # Duplicita název + URL
+        record(scraper, 3, 'Protein', '90', '80'),            # Původní nižší = bez slevy
+    ]
+    df = scraper.export_frame(scraper.ProductStore(records))
+    rows = df.to_dict('records')
+    assert [(row['nazev'], row['url'][-3:]) for row in rows] == \
+        [('Amino', 'p1/'), ('Creatin', 'p2/'), ('Protein', 'p0/'), ('Protein', 'p3/')]
+    assert rows[2]['dostupnost'] == 'Skladem' and rows[2]['sleva'] == '17%'
+    assert rows[0]['cena'] == 99.5 and math.isnan(rows[0]['cena_puvodni'])
+    assert math.isnan(rows[1]['cena']) and rows[1]['sleva'] == ''
+    assert rows[3]['sleva'] == ''
+
+def test_export_frame_discount_matches_fill_discount(scraper, shop):
+    """Vektorová sleva = fill_discount() po jednotlivých záznamech"""
+    scraper.site_platform = shop.platform
+    records = [scraper.parse_product(shop.pages[item['url']].decode('utf-8'), BASE_URL + item['url'])
+               for item in shop.products]
+    df = scraper.export_frame(scraper.ProductStore(records))
+    assert dict(zip(df['url'], df['sleva'])) == {data['url']: data['sleva'] for data in records}
+
+def test_write_xlsx_round_trip(scraper, tmp_path):
+    scraper.configure(XLSX_CHUNK=2)
+    records = [record(scraper, i, f'Produkt {i}', str(100 + i), '150' if i % 2 else '', ean=f'85940000000{i:02d}')
+               for i in range(5)]
+    df = scraper.export_frame(scraper.ProductStore(records))
+    path = str(tmp_path / 'vystup.xlsx')
+    scraper.write_xlsx(df, path)
+    rows = list(openpyxl.load_workbook(path, read_only=True).active.iter_rows(values_only=True))
+    assert rows[0] == tuple(df.columns)
+    assert len(rows) == 6
+    first = dict(zip(rows[0], rows[1]))
+    # NaN = prázdná buňka, EAN zůstává textem
+    assert first['nazev'] == 'Produkt 0' and first['cena'] == 100 and first['cena_puvodni'] is None
+    assert first['ean'] == '8594000000000'
+    assert dict(zip(rows[0], rows[2]))['sleva'] == '33%'
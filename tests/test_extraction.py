@@ -0,0 +1,168 @@
+"""Extrakce záznamů z detailu a výpisu, sloupcové úložiště ProductStore"""
+
+import multiprocessing
+import subprocess
+import sys
+import threading
+
+import pytest
+from bs4 import BeautifulSoup
+
+from conftest import BASE_URL, ROOT
+
+def detail_pages(shop):
+    return [(BASE_URL + item['url'], shop.pages[item['url']].decode('utf-8')) for item in shop.products]
+
+@pytest.mark.parametrize('profile', [None, 'platform'])
+def test_selector_plan_matches_select_one(scraper, shop, profile):
+    """Jeden průchod plánem = samostatné select_one() pro každý selektor"""
+    platform = shop.platform if profile else None
+    fields = scraper.product_selector_profile(platform)
+    plan = scraper.SelectorPlan(fields, collect_all={'ld_json': [scraper.JSON_LD_SELECTOR]})
+    listing = [(BASE_URL + path, body.decode('utf-8')) for path, body in shop.pages.items()
+               if path.endswith('/') or '?' in path][:3]
+    for _, html in detail_pages(shop)[:3] + listing:
+        soup = BeautifulSoup(html, 'lxml')
+        matches = plan.match(soup)
+        for field, selectors in fields.items():
+            expected = [soup.select_one(sel) for sel in selectors]
+            assert len(matches[field]) == len(expected)
+            assert all(found is el for found, el in zip(matches[field], expected)), field
+        scripts = soup.select(scraper.JSON_LD_SELECTOR)
+        assert len(matches['ld_json']) == len(scripts)
+        assert all(found is el for found, el in zip(matches['ld_json'], scripts))
+
+TRICKY_HTML = """<html><body>
+<div class="y"><span class="price">1</span></div>
+<div class="x"><span data-x="a.b">2</span><ul><li class="x">3</li><li>4</li></ul></div>
+<p title="a b" class="title">5</p><h1>6</h1><em class="b">7</em><i class="b">8</i>
+</body></html>"""
+
+@pytest.mark.parametrize('selector', [
+    'div:not(.y)', 'ul>li', 'li + li', '.price ~ .b', 'em+.b', '[data-x="a.b"]', '.b',
+    'p, h1', 'h1, p', '*', '[title="a b"]', 'li:first-child', 'div.x > ul li.x', 'span[data-x]',
+])
+def test_selector_plan_complex_selectors(scraper, selector):
+    """Složitější selektory (pseudotřídy, kombinátory bez mezer, tečky v hodnotách)
+    dávají stejný výsledek jako select_one()"""
+    soup = BeautifulSoup(TRICKY_HTML, 'lxml')
+    plan = scraper.SelectorPlan({'pole': [selector]}, collect_all={'vse': [selector]})
+    matches = plan.match(soup)
+    assert [id(el) for el in matches['pole']] == [id(soup.select_one(selector))]
+    assert [id(el) for el in matches['vse']] == [id(el) for el in soup.select(selector)]
+
+@pytest.mark.parametrize('structured', [True, False])
+def test_selector_plan_and_cascade_agree(scraper, shop, structured):
+    """parse_product dává stejné záznamy s plánem i s původní kaskádou select_one()"""
+    scraper.site_platform = shop.platform
+    pages = detail_pages(shop)
+    scraper.configure(SELECTOR_PLAN=True, STRUCTURED_FIRST=structured)
+    with_plan = [scraper.parse_product(html, url) for url, html in pages]
+    scraper.configure(SELECTOR_PLAN=False, STRUCTURED_FIRST=structured)
+    cascade = [scraper.parse_product(html, url) for url, html in pages]
+    assert with_plan == cascade
+    assert all(record['nazev'] and record['ean'] and record['cena'] for record in cascade)
+
+def test_product_store_round_trip(scraper, shop):
+    """ProductStore vrací záznamy přesně v podobě z parse_product"""
+    scraper.site_platform = shop.platform
+    records = [scraper.parse_product(html, url) for url, html in detail_pages(shop)]
+    assert all(record['nazev'] and record['cena'] for record in records)
+    store = scraper.ProductStore()
+    for record in records:
+        store.append(record)
+    assert list(store) == records
+    assert store[1:3] == records[1:3]
+    assert store[-1] == records[-1]
+
+@pytest.mark.parametrize('cena, cena_puvodni, sleva', [
+    ('1299.00', '1499.5', '13%'),
+    ('12.5', '', ''),
+    ('', '0.10', ''),
+    ('.5', '1e3', '12.5%'),
+    ('99999999999999999999', 'nan', '150%'),
+])
+def test_product_store_keeps_texts(scraper, cena, cena_puvodni, sleva):
+    record = {'nazev': 'Protein', 'ean': '8594000000001', 'cena': cena, 'cena_puvodni': cena_puvodni,
+              'sleva': sleva, 'dostupnost': 'Skladem', 'url': f'{BASE_URL}/protein/'}
+    store = scraper.ProductStore([record])
+    assert store[0] == record
+    assert store.summary() == {'products': 1, 'ean': 1, 'cena': int(bool(cena)), 'sleva': int(bool(sleva))}
+
+def test_clean_price_round_trip(scraper):
+    texts = ['1 299,00 Kč', '12,5 €', '1.299,-', '€ 3.50', '1,234.56', '199 Kč', '']
+    records = [dict(scraper.empty_record(f'{BASE_URL}/p{i}/'), nazev='P', cena=scraper.clean_price(text))
+               for i, text in enumerate(texts)]
+    assert list(scraper.ProductStore(records)) == records
+
+@pytest.mark.parametrize('structured, text', [
+    ('1299.00', '1 299,00 Kč'), (1299, '1 299 Kč'), (12.5, '12,50 €'), ('12.5', '12,5 €'),
+    ('1234.56', '1.234,56 Kč'), ('0.99', '0,99'),
+])
+def test_schema_price_matches_clean_price(scraper, structured, text):
+    """Cena ze strukturovaných dat i z textu stránky ve stejném tvaru"""
+    assert scraper.schema_price(structured) == scraper.clean_price(text)
+
+def test_listing_tiles(scraper, shop):
+    """Dlaždice výpisu - název a cena všude, EAN jen u Shoptetu (data-micro-identifier)"""
+    scraper.site_platform = shop.platform
+    expected = {BASE_URL + item['url']: item for item in shop.products}
+    path = next(path for path in shop.pages if path not in ('/', '/robots.txt', '/sitemap.xml')
+                and path not in {item['url'] for item in shop.products})
+    records = scraper.extract_listing_products(BeautifulSoup(shop.pages[path], 'lxml'), BASE_URL + path)
+    assert records
+    for url, record in records.items():
+        item = expected[url]
+        assert record['nazev'] == item['name']
+        assert record['cena']
+        assert record['ean'] == (item['ean'] if shop.platform == 'shoptet' else '')
+
+def test_structured_name_is_validated(scraper):
+    """Prázdný nebo příliš dlouhý název z JSON-LD nestačí - doplní ho selektory"""
+    for name in ['', 'ab', 'x' * 600]:
+        html = ('<html><head><script type="application/ld+json">{"@type": "Product", "name": "%s", '
+                '"gtin13": "8594000000001", "offers": {"price": "10", '
+                '"availability": "https://schema.org/InStock"}}</script></head>'
+                '<body><h1>Syrovátkový protein</h1></body></html>') % name
+        assert scraper.parse_product(html, f'{BASE_URL}/protein/')['nazev'] == 'Syrovátkový protein'
+
+def test_only_parser_warnings_are_silenced():
+    """Import modulu tlumí jen upozornění BeautifulSoup na ne-HTML stránky
+    (v čistém interpretu - pytest filtry varování po sběru testů obnovuje)"""
+    code = (
+        "import warnings, scraper\n"
+        "from bs4 import BeautifulSoup\n"
+        "with warnings.catch_warnings(record=True) as caught:\n"
+        "    BeautifulSoup('<?xml version=\"1.0\"?><urlset><url></url></urlset>', scraper.HTML_PARSER)\n"
+        "    warnings.warn('jiné varování', UserWarning)\n"
+        "print([str(warning.message) for warning in caught])\n"
+    )
+    output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, capture_output=True,
+                            text=True, check=True).stdout
+    assert output.splitlines()[-1] == "['jiné varování']"
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='procesy parserů jen s fork')
+def test_parser_pool_forks_with_metrics_lock_free(scraper, shop):
+    """Fork ve chvíli, kdy vlákno metrik drží zámek - parser se nezasekne"""
+    held, release = threading.Event(), threading.Event()
+
+    def holder():
+        with scraper.metrics.lock:
+            held.set()
+            release.wait(5)
+    thread = threading.Thread(target=holder)
+    thread.start()
+    held.wait()
+    threading.Timer(0.2, release.set).start()
+    pool = scraper.open_parser_pool(2)
+    try:
+        url, html = detail_pages(shop)[0]
+        futures = [pool.submit(scraper.parse_in_worker, html, url) for _ in range(4)]
+        records = [future.result(timeout=10)[0] for future in futures]
+        assert records == [scraper.parse_product(html, url)] * 4
+    finally:
+        release.set()
+        thread.join()
+        for process in list(pool._processes.values()):
+            process.kill()
+        pool.shutdown(wait=False, cancel_futures=True)
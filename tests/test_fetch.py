@@ -0,0 +1,117 @@
+"""Čtení těla odpovědi (read_body) - limit MAX_PAGE_BYTES a předčasný konec; cache odpovědí;
+adaptivní tempo požadavků per host"""
+
+import time
+
+import pytest
+
+from bench import FixtureShop, start_server
+
+class Response:
+    """Odpověď s tělem po kouscích jako requests.Response.iter_content()"""
+
+    def __init__(self, body):
+        self.body = body
+        self.read = 0
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), chunk_size):
+            self.read = start + chunk_size
+            yield self.body[start:start + chunk_size]
+
+@pytest.mark.parametrize('size, truncated', [(99, 0), (100, 0), (101, 1), (1000, 1)])
+def test_size_cap_boundary(scraper, size, truncated):
+    scraper.configure(MAX_PAGE_BYTES=100, DOWNLOAD_CHUNK=10)
+    response = Response(b'x' * size)
+    body, complete = scraper.read_body(response)
+    assert body == b'x' * min(size, 100)
+    assert complete == (not truncated)
+    assert scraper.download_stats['truncated'] == truncated
+    assert scraper.download_stats['bytes'] == len(body)
+    # Za limitem se čte nejvýš jeden kousek navíc
+    assert response.read <= 100 + 10
+
+def test_cap_with_chunk_larger_than_cap(scraper):
+    scraper.configure(MAX_PAGE_BYTES=100, DOWNLOAD_CHUNK=64 * 1024)
+    assert scraper.read_body(Response(b'x' * 100)) == (b'x' * 100, True)
+    assert scraper.download_stats['truncated'] == 0
+    assert scraper.read_body(Response(b'x' * 5000)) == (b'x' * 100, False)
+    assert scraper.download_stats['truncated'] == 1
+
+def test_early_stop(scraper):
+    scraper.configure(DOWNLOAD_CHUNK=10)
+    response = Response(b'<head></head>' + b'x' * 1000)
+    body, complete = scraper.read_body(response, early_stop=lambda buffer: b'</head>' in buffer)
+    assert not complete
+    assert body.startswith(b'<head></head>') and len(body) == 20
+    assert scraper.download_stats['early_stop'] == 1
+
+@pytest.fixture
+def server():
+    shop = FixtureShop('shoptet', categories=1, per_category=2, per_page=2, page_kb=40)
+    server = start_server(shop)
+    yield f'http://127.0.0.1:{server.server_address[1]}', shop
+    server.shutdown()
+    server.server_close()
+
+@pytest.mark.parametrize('limit', [{'MAX_PAGE_BYTES': 2000}, {'EARLY_STOP': True}])
+def test_cut_body_is_not_cached(scraper, server, tmp_path, limit):
+    """Zkrácené / předčasně ukončené tělo se do cache neuloží jako celé"""
+    url, shop = server
+    path = shop.products[0]['url']
+    scraper.configure(url, RESPONSE_CACHE=str(tmp_path / 'cache'), CACHE_MODE='use',
+                      RATE_START=1000.0, RATE_MAX=1000.0, **limit)
+    early_stop = (lambda: lambda buffer: b'</head>' in buffer) if 'EARLY_STOP' in limit else None
+    status, text, _ = scraper.fetch_page(url + path, early_stop=early_stop)
+    assert status == 200 and len(text) < len(shop.pages[path])
+    scraper.configure(MAX_PAGE_BYTES=5_000_000, EARLY_STOP=False, CACHE_MODE='replay')
+    assert scraper.fetch_page(url + path) == (None, None, {})   # Není v cache
+    scraper.configure(CACHE_MODE='use')
+    assert scraper.fetch_page(url + path)[1].encode() == shop.pages[path]
+    scraper.configure(CACHE_MODE='replay')
+    assert scraper.fetch_page(url + path)[1].encode() == shop.pages[path]
+
+def timed_waits(limiter, url, count):
+    started = time.monotonic()
+    for _ in range(count):
+        limiter.wait(url)
+    return time.monotonic() - started
+
+def test_rate_grows_on_fast_responses(scraper):
+    scraper.configure(RATE_START=1.0, RATE_MAX=2.0, RATE_INCREASE=0.25, FAST_RESPONSE=1.0)
+    limiter = scraper.AdaptiveRateLimiter()
+    url = 'https://a.cz/p/'
+    limiter.report(url, 200, 2.5)          # Pomalá odpověď tempo nemění
+    assert limiter.hosts['a.cz']['rate'] == 1.0
+    for _ in range(3):
+        limiter.report(url, 304, 0.1)
+    assert limiter.hosts['a.cz']['rate'] == 1.75
+    for _ in range(10):
+        limiter.report(url, 200, 0.1)
+    assert limiter.hosts['a.cz']['rate'] == 2.0
+
+@pytest.mark.parametrize('status', [429, 403, 503, None])
+def test_rate_backs_off_on_errors(scraper, status):
+    scraper.configure(RATE_START=1.0, RATE_MIN=0.3, RATE_BACKOFF=0.5)
+    limiter = scraper.AdaptiveRateLimiter()
+    limiter.report('https://a.cz/p/', status, 0.1)
+    assert limiter.hosts['a.cz']['rate'] == 0.5 and limiter.hosts['a.cz']['tokens'] <= 0
+    limiter.report('https://a.cz/p/', status, 0.1)
+    assert limiter.hosts['a.cz']['rate'] == 0.3
+    limiter.report('https://a.cz/p/', 404, 0.1)   # Chyba stránky, ne přetížení
+    assert limiter.hosts['a.cz']['rate'] == 0.3
+
+def test_rate_paces_each_host_separately(scraper):
+    scraper.configure(RATE_START=20.0)
+    limiter = scraper.AdaptiveRateLimiter()
+    # První token je hned, další po 1/20 s
+    assert timed_waits(limiter, 'https://a.cz/1/', 5) >= 0.19
+    assert timed_waits(limiter, 'https://b.cz/1/', 1) < 0.1
+
+def test_retry_after_blocks_host(scraper):
+    scraper.configure(RATE_START=20.0, RATE_BACKOFF=1.0)
+    limiter = scraper.AdaptiveRateLimiter()
+    limiter.wait('https://a.cz/1/')
+    limiter.report('https://a.cz/1/', 429, 0.1, retry_after=0.3)
+    assert timed_waits(limiter, 'https://b.cz/1/', 1) < 0.1
+    assert timed_waits(limiter, 'https://a.cz/2/', 1) >= 0.29
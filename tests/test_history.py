@@ -0,0 +1,52 @@
+"""Historie cen (PriceHistory) - ukládají se jen změny"""
+
+import pytest
+
+SITE = 'shop.cz'
+
+def product(i, cena, dostupnost='Skladem', cena_puvodni='', sleva=''):
+    return {'nazev': f'Produkt {i}', 'ean': f'859400000000{i}', 'cena': cena, 'cena_puvodni': cena_puvodni,
+            'sleva': sleva, 'dostupnost': dostupnost, 'url': f'https://www.shop.cz/produkt-{i}/'}
+
+@pytest.fixture
+def history(scraper, tmp_path):
+    db = scraper.PriceHistory(str(tmp_path / 'historie.sqlite'))
+    yield db
+    db.close()
+
+def run(scraper, history, records, complete=True):
+    return history.record_run(SITE, scraper.ProductStore(records), complete)
+
+def test_first_run_records_everything(scraper, history):
+    _, counts = run(scraper, history, [product(1, '100'), product(2, '200')])
+    assert counts == {'new': 2, 'changed': 0, 'removed': 0, 'unchanged': 0}
+
+def test_unchanged_run_writes_no_changes(scraper, history):
+    records = [product(1, '100'), product(2, '200')]
+    run(scraper, history, records)
+    run_id, counts = run(scraper, history, records)
+    assert counts == {'new': 0, 'changed': 0, 'removed': 0, 'unchanged': 2}
+    assert history.changes(since_run=run_id - 1) == []
+
+def test_change_detection(scraper, history):
+    run(scraper, history, [product(1, '100'), product(2, '200'), product(3, '300')])
+    run_id, counts = run(scraper, history, [
+        product(1, '90', cena_puvodni='100', sleva='10%'),  # Sleva
+        product(2, '200', dostupnost='Na objednávku'),      # Dostupnost
+        product(4, '400'),                                  # Nový; 3 zmizel
+    ])
+    assert counts == {'new': 1, 'changed': 2, 'removed': 1, 'unchanged': 0}
+    changes = {row['ean'][-1]: row for row in history.changes()}
+    assert changes['1']['cena'] == 90 and changes['1']['cena_predtim'] == 100 and changes['1']['sleva'] == 10
+    assert changes['2']['dostupnost'] == 'Na objednávku' and changes['2']['dostupnost_predtim'] == 'Skladem'
+    assert changes['3']['zmizel'] == 1
+    assert changes['4']['cena_predtim'] is None
+    assert all(row['run'] == run_id for row in changes.values())
+
+def test_incomplete_run_removes_nothing(scraper, history):
+    run(scraper, history, [product(1, '100'), product(2, '200')])
+    _, counts = run(scraper, history, [product(1, '100')], complete=False)
+    assert counts['removed'] == 0
+    # Po návratu se produkt nepočítá jako nový ani změněný
+    _, counts = run(scraper, history, [product(1, '100'), product(2, '200')])
+    assert counts == {'new': 0, 'changed': 0, 'removed': 0, 'unchanged': 2}
@@ -0,0 +1,70 @@
+"""Inkrementální režim - <lastmod>, podmíněné požadavky (304) a hash obsahu"""
+
+import pytest
+
+from conftest import BASE_URL
+
+class Origin:
+    """Náhrada fetch_page - stránky s volitelným ETagem, 304 na shodný If-None-Match"""
+
+    def __init__(self, pages):
+        self.pages = pages          # url -> (html, etag)
+        self.requests = []
+
+    def __call__(self, url, retries=None, extra_headers=None, accept=None, early_stop=None):
+        self.requests.append((url, dict(extra_headers or {})))
+        html, etag = self.pages[url]
+        if etag and (extra_headers or {}).get('If-None-Match') == etag:
+            return 304, None, {'ETag': etag}
+        return 200, html, {'ETag': etag} if etag else {}
+
+@pytest.fixture
+def incremental(scraper, shop, tmp_path, monkeypatch):
+    scraper.configure(INCREMENTAL=True, INCREMENTAL_DB=str(tmp_path / 'inkrementalni.sqlite'), TRUST_LASTMOD=True)
+    scraper.site_platform = shop.platform
+    item = shop.products[0]
+    url = BASE_URL + item['url']
+    origin = Origin({url: (shop.pages[item['url']].decode('utf-8'), '"v1"')})
+    monkeypatch.setattr(scraper, 'fetch_page', origin)
+    first = scraper.extract_product_data(url)
+    assert first['nazev'] and scraper.incremental_stats['changed'] == 1
+    return url, origin, first
+
+def test_unchanged_page_answers_304(scraper, incremental):
+    url, origin, first = incremental
+    assert scraper.extract_product_data(url) == first
+    assert origin.requests[-1][1] == {'If-None-Match': '"v1"'}
+    assert scraper.incremental_stats['304'] == 1
+
+def test_same_lastmod_skips_request(scraper, incremental):
+    url, origin, first = incremental
+    scraper.url_lastmod[url] = '2026-10-01'
+    scraper.extract_product_data(url)                 # Uloží <lastmod> k záznamu
+    requests = len(origin.requests)
+    assert scraper.extract_product_data(url) == first
+    assert len(origin.requests) == requests and scraper.incremental_stats['lastmod'] == 1
+    scraper.url_lastmod[url] = '2026-10-02'           # Nové datum = znovu se ptáme serveru
+    scraper.extract_product_data(url)
+    assert len(origin.requests) == requests + 1
+
+def test_same_content_without_validators(scraper, incremental):
+    url, origin, first = incremental
+    html, _ = origin.pages[url]
+    origin.pages[url] = (html, None)
+    assert scraper.extract_product_data(url) == first
+    assert scraper.incremental_stats['hash'] == 1
+
+def test_changed_page_is_parsed_again(scraper, incremental):
+    url, origin, first = incremental
+    html, _ = origin.pages[url]
+    origin.pages[url] = (html.replace(first['nazev'], first['nazev'] + ' Nový'), '"v2"')
+    assert scraper.extract_product_data(url)['nazev'] == first['nazev'] + ' Nový'
+    assert scraper.incremental_stats['changed'] == 2
+
+def test_validators_survive_new_run(scraper, incremental):
+    """Validátory jsou v INCREMENTAL_DB - další běh (nové spojení) je použije"""
+    url, origin, first = incremental
+    scraper.page_validators.commit()
+    scraper.configure(INCREMENTAL=True)
+    assert scraper.extract_product_data(url) == first
+    assert scraper.incremental_stats == {'lastmod': 0, '304': 1, 'hash': 0, 'changed': 0}
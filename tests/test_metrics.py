@@ -0,0 +1,80 @@
+"""Metriky - čítače, histogramy, Prometheus/JSON export a endpoint"""
+
+import json
+import socket
+import urllib.request
+
+import pytest
+
+@pytest.fixture
+def endpoint(scraper):
+    """Spuštěný endpoint metrik na volném portu; po testu zastavený"""
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        port = probe.getsockname()[1]
+    scraper.configure(METRICS_PORT=port)
+    scraper.start_metrics_export()
+    yield scraper.metrics_server
+    scraper.metrics_server.shutdown()
+    scraper.metrics_server.server_close()
+    scraper.metrics_server = None
+
+def test_counters_and_histograms(scraper):
+    metrics = scraper.Metrics()
+    metrics.inc('requests_total', host='a.cz', status=200)
+    metrics.inc('requests_total', 2, host='b.cz', status=200)
+    metrics.inc('requests_total', host='a.cz', status=404)
+    metrics.observe('fetch_seconds', 0.3, host='a.cz')
+    metrics.observe('fetch_seconds', 100.0, host='a.cz')
+    assert metrics.total('requests_total') == 4
+    assert metrics.by_label('requests_total', 'host') == {'a.cz': 2, 'b.cz': 2}
+    assert metrics.total('fetch_seconds') == pytest.approx(100.3)
+    histogram, = metrics.snapshot()['histograms']
+    assert histogram['count'] == 2 and histogram['buckets']['+Inf'] == 1
+
+def test_merge_from_parser_process(scraper):
+    """raw() z procesu parseru se přičte k hlavním metrikám"""
+    main, worker = scraper.Metrics(), scraper.Metrics()
+    main.inc('fields_total', field='cena')
+    main.observe('parse_seconds', 0.01)
+    worker.inc('fields_total', 3, field='cena')
+    worker.observe('parse_seconds', 0.02)
+    main.merge(worker.raw())
+    main.merge(None)
+    assert main.total('fields_total') == 4
+    assert main.total('parse_seconds') == pytest.approx(0.03)
+    assert main.snapshot()['histograms'][0]['count'] == 2
+
+def test_prometheus_text(scraper):
+    metrics = scraper.Metrics()
+    metrics.inc('requests_total', host='a"b\\c.cz')
+    metrics.observe('fetch_seconds', 0.3)
+    text = metrics.prometheus()
+    assert '# TYPE eshop_requests_total counter' in text
+    assert 'eshop_requests_total{host="a\\"b\\\\c.cz"} 1' in text
+    buckets = [line for line in text.splitlines() if line.startswith('eshop_fetch_seconds_bucket')]
+    # Kumulativní koše, poslední +Inf = počet pozorování
+    assert buckets[-1] == 'eshop_fetch_seconds_bucket{le="+Inf"} 1'
+    assert 'eshop_fetch_seconds_count 1' in text
+    assert 'eshop_products gauge' in text
+
+def test_endpoint_listens_on_localhost(scraper, endpoint):
+    assert scraper.METRICS_HOST == '127.0.0.1'
+    assert endpoint.server_address[0] == '127.0.0.1'
+    scraper.metrics.inc('requests_total', host='a.cz')
+    base = f'http://127.0.0.1:{endpoint.server_address[1]}'
+    with urllib.request.urlopen(base + '/metrics') as response:
+        assert 'eshop_requests_total{host="a.cz"} 1' in response.read().decode('utf-8')
+    with urllib.request.urlopen(base + '/metrics.json') as response:
+        counters = json.load(response)['counters']
+    assert counters == [{'name': 'requests_total', 'labels': {'host': 'a.cz'}, 'value': 1}]
+
+def test_metrics_json_dump(scraper, tmp_path):
+    path = str(tmp_path / 'metriky.json')
+    scraper.configure(METRICS_JSON=path)
+    scraper.metrics.inc('requests_total', host='a.cz')
+    scraper.dump_metrics()
+    with open(path, encoding='utf-8') as f:
+        snapshot = json.load(f)
+    assert snapshot['web'] == scraper.BASE_URL and snapshot['gauges']['products'] == 0
+    assert snapshot['counters'][0]['value'] == 1
@@ -0,0 +1,59 @@
+"""Detekce platformy e-shopu a profily selektorů podle platformy"""
+
+import pytest
+
+from bench import PLATFORMS, start_server
+from conftest import BASE_URL
+
+FAST = dict(DELAY_MIN=0, DELAY_MAX=0, RATE_START=1000.0, RATE_MAX=1000.0)
+
+@pytest.fixture
+def served(shop):
+    server = start_server(shop)
+    yield f'http://127.0.0.1:{server.server_address[1]}', shop
+    server.shutdown()
+    server.server_close()
+
+def test_detect_platform_from_home_page(scraper, shop):
+    assert scraper.detect_platform(shop.pages['/'].decode('utf-8')) == shop.platform
+
+@pytest.mark.parametrize('platform, cookies', [
+    ('shoptet', ['shoptet_cart']), ('woocommerce', ['wp_woocommerce_session_abc']),
+    ('prestashop', ['PrestaShop-1f2e']), ('shopify', ['_shopify_y', 'cart_currency']),
+])
+def test_detect_platform_from_cookies(scraper, platform, cookies):
+    assert scraper.detect_platform('<html><body></body></html>', cookies) == platform
+
+def test_unknown_platform(scraper):
+    assert scraper.detect_platform('<html><head><title>Obchod</title></head></html>', ['sessionid']) is None
+
+def test_ensure_platform_checks_home_page_once(scraper, served):
+    url, shop = served
+    scraper.configure(url, **FAST)
+    assert scraper.ensure_platform() == shop.platform
+    scraper.BASE_URL = url + '/neexistuje'     # Druhé volání už nestahuje
+    assert scraper.ensure_platform() == shop.platform
+
+def test_fixed_platform_skips_detection(scraper):
+    scraper.configure(PLATFORM='prestashop')
+    assert scraper.ensure_platform() == 'prestashop' and not scraper.platform_checked
+
+@pytest.mark.parametrize('platform', list(PLATFORMS))
+def test_profile_drops_foreign_selectors(scraper, platform):
+    profile = scraper.product_selector_profile(platform)
+    own = scraper.PLATFORM_PRODUCT_SELECTORS[platform]
+    foreign = set().union(*(selectors for other, selectors in scraper.PLATFORM_PRODUCT_SELECTORS.items()
+                            if other != platform))
+    for field, selectors in scraper.PRODUCT_SELECTORS.items():
+        assert profile[field] == [sel for sel in selectors if sel in own or sel not in foreign]
+    assert all(profile[field] for field in scraper.PROFILE_REQUIRED_FIELDS)
+    assert scraper.product_selector_profile(None) is scraper.PRODUCT_SELECTORS
+
+def test_platform_profile_extracts_same_records(scraper, shop):
+    """Profil platformy najde na jejích stránkách totéž co všechny selektory"""
+    pages = [(item['url'], shop.pages[item['url']].decode('utf-8')) for item in shop.products]
+    scraper.site_platform = None
+    everything = [scraper.parse_product(html, BASE_URL + path) for path, html in pages]
+    scraper.site_platform = shop.platform
+    profiled = [scraper.parse_product(html, BASE_URL + path) for path, html in pages]
+    assert profiled == everything
@@ -0,0 +1,62 @@
+"""Sdílená fronta FÁZE 2 (WorkQueue) - výpůjčky a právě jeden záznam na URL"""
+
+import time
+
+import pytest
+
+URLS = [f'https://www.shop.cz/produkt-{i}/' for i in range(5)]
+
+@pytest.fixture
+def queue(scraper, tmp_path):
+    scraper.configure(QUEUE_LEASE=60, QUEUE_MAX_ATTEMPTS=3)
+    work_queue = scraper.WorkQueue(str(tmp_path / 'fronta.sqlite'))
+    work_queue.seed(URLS)
+    yield work_queue
+    work_queue.close()
+
+def record(url):
+    return {'nazev': 'P', 'url': url}
+
+def test_lease_hands_out_each_url_once(queue):
+    first = queue.lease('a', 3)
+    second = queue.lease('b', 10)
+    assert [url for url, _ in first + second] == URLS
+    assert queue.lease('c', 10) == []
+    assert queue.progress() == {'leased': 5}
+
+def test_complete_exactly_once(queue):
+    (url, token), = queue.lease('a', 1)
+    assert queue.complete(url, token, record(url))
+    assert not queue.complete(url, token, record(url))          # Podruhé už ne
+    assert not queue.complete(URLS[1], token, record(URLS[1]))  # Cizí token
+    assert [(u, data, worker) for _, u, data, worker in queue.results()] == [(url, record(url), 'a')]
+
+def test_expired_lease_goes_to_another_worker(scraper, queue):
+    scraper.configure(QUEUE_LEASE=0)
+    (url, old_token), = queue.lease('a', 1)
+    time.sleep(0.01)
+    scraper.configure(QUEUE_LEASE=60)
+    (again, new_token), = queue.lease('b', 1)
+    assert again == url and new_token != old_token
+    # Pozdní výsledek původního workeru se zahodí, platí jen nová výpůjčka
+    assert not queue.complete(url, old_token, record(url))
+    assert queue.complete(url, new_token, dict(record(url), nazev='B'))
+    assert [data['nazev'] for _, _, data, _ in queue.results()] == ['B']
+
+def test_gives_up_after_max_attempts(scraper, queue):
+    scraper.configure(QUEUE_LEASE=0, QUEUE_MAX_ATTEMPTS=2)
+    for _ in range(2):
+        assert URLS[0] in [url for url, _ in queue.lease('a', 1)]
+        time.sleep(0.01)
+    scraper.configure(QUEUE_LEASE=60)
+    leased = [url for url, _ in queue.lease('b', 10)]
+    assert URLS[0] not in leased
+    assert [(url, data) for _, url, data, _ in queue.results()] == [(URLS[0], None)]
+
+def test_finished(queue):
+    assert not queue.finished()
+    for url, token in queue.lease('a', 10):
+        queue.complete(url, token, record(url))
+    assert queue.finished()
+    assert len(queue.results()) == len(URLS)
+    assert [r[1] for r in queue.results(after=queue.results()[2][0])] == URLS[3:]
@@ -0,0 +1,69 @@
+"""Průběžný výstup (sink) - připisuje se jen při skutečném pokračování"""
+
+import json
+
+import pytest
+
+def products(scraper, count, start=0):
+    return [dict(scraper.empty_record(f'https://www.shop.cz/p{i}/'), nazev=f'Produkt {i}', cena=str(100 + i))
+            for i in range(start, start + count)]
+
+def lines(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+@pytest.fixture
+def sink_path(scraper, tmp_path):
+    scraper.configure(OUTPUT_FORMAT='jsonl', OUTPUT_PATH=str(tmp_path / 'vystup'))
+    scraper.prepare_products()
+    yield str(tmp_path / 'vystup.jsonl')
+    scraper.close_output_sink()
+
+def test_fresh_run_replaces_stale_file(scraper, sink_path):
+    stale = [dict(record, nazev='starý') for record in products(scraper, 5)]
+    with open(sink_path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(record) + '\n' for record in stale)
+    records = products(scraper, 20)
+    for record in records:
+        scraper.products_data.append(record)
+    scraper.save_progress()
+    scraper.close_output_sink()
+    assert lines(sink_path) == records
+
+def test_resume_in_same_kernel_appends(scraper, sink_path):
+    records = products(scraper, 5)
+    for record in records[:3]:
+        scraper.products_data.append(record)
+    scraper.save_progress()
+    scraper.close_output_sink()         # Přerušený běh
+    for record in records[3:]:
+        scraper.products_data.append(record)
+    scraper.save_progress()
+    scraper.close_output_sink()
+    assert lines(sink_path) == records
+
+def test_reset_state_starts_new_file(scraper, sink_path):
+    scraper.products_data.append(products(scraper, 1)[0])
+    scraper.save_progress()
+    scraper.reset_state()
+    scraper.prepare_products()
+    records = products(scraper, 2, start=10)
+    for record in records:
+        scraper.products_data.append(record)
+    scraper.save_progress()
+    scraper.close_output_sink()
+    assert lines(sink_path) == records
+
+def test_resume_from_state_db_appends(scraper, sink_path, tmp_path):
+    records = products(scraper, 5)
+    with open(sink_path, 'w', encoding='utf-8') as f:
+        f.writelines(json.dumps(record, ensure_ascii=False) + '\n' for record in records[:3])
+    scraper.configure(STATE_DB=str(tmp_path / 'stav.sqlite'))
+    scraper.prepare_frontier()
+    scraper.attach_crawl_state()
+    for record in records:
+        scraper.products_data.append(record)
+    scraper.save_progress()
+    scraper.close_output_sink()
+    assert lines(sink_path) == records
+    scraper.crawl_state.conn.close()
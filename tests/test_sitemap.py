@@ -0,0 +1,80 @@
+"""Objevování produktů ze sitemap (robots.txt, indexy, .xml.gz, lastmod)"""
+
+import gzip
+
+import pytest
+
+from bench import FixtureShop, start_server
+
+FAST = dict(DELAY_MIN=0, DELAY_MAX=0, RATE_START=1000.0, RATE_MAX=1000.0)
+
+def urlset(entries):
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + ''.join(f'<url><loc>{loc}</loc>' + (f'<lastmod>{lastmod}</lastmod>' if lastmod else '') + '</url>'
+                      for loc, lastmod in entries)
+            + '</urlset>').encode()
+
+def sitemap_index(locs):
+    return ('<?xml version="1.0" encoding="UTF-8"?>'
+            '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+            + ''.join(f'<sitemap><loc>{loc}</loc></sitemap>' for loc in locs)
+            + '</sitemapindex>').encode()
+
+@pytest.fixture
+def site(scraper):
+    """Vlastní fixture e-shop (stránky se v testu mění) na běžícím serveru"""
+    shop = FixtureShop('shoptet', categories=2, per_category=3, per_page=3, page_kb=1)
+    server = start_server(shop)
+    base = f'http://127.0.0.1:{server.server_address[1]}'
+    scraper.configure(base, **FAST)
+    scraper.reset_state()
+    yield base, shop
+    server.shutdown()
+    server.server_close()
+
+def test_sitemap_from_robots(scraper, site):
+    base, shop = site
+    assert scraper.discover_from_sitemaps() == len(shop.products)
+    assert scraper.all_product_urls == {base + item['url'] for item in shop.products}
+
+def test_sitemap_index_gzip_and_lastmod(scraper, site):
+    base, shop = site
+    first, second = shop.products[:3], shop.products[3:]
+    shop.pages['/robots.txt'] = f'Sitemap: {base}/sitemap_index.xml\n'.encode()
+    shop.pages['/sitemap_index.xml'] = sitemap_index(
+        [f'{base}/produkty-1.xml.gz', f'{base}/produkty-2.xml', f'{base}/post-sitemap.xml'])
+    shop.pages['/produkty-1.xml.gz'] = gzip.compress(urlset(
+        [(base + item['url'], f'2026-0{i + 1}-01') for i, item in enumerate(first)]))
+    shop.pages['/produkty-2.xml'] = urlset([(base + item['url'], None) for item in second])
+    # Sitemapa článků se přeskočí - její URL se nestáhne
+    shop.pages['/post-sitemap.xml'] = urlset([(base + '/skryty-produkt-999/', None)])
+    assert scraper.discover_from_sitemaps() == len(shop.products)
+    assert scraper.all_product_urls == {base + item['url'] for item in shop.products}
+    assert base + '/skryty-produkt-999/' not in scraper.all_product_urls
+    assert scraper.url_lastmod == {base + item['url']: f'2026-0{i + 1}-01' for i, item in enumerate(first)}
+    ordered = scraper.lastmod_order(scraper.all_product_urls)
+    assert ordered[:3] == [base + item['url'] for item in reversed(first)]
+
+def test_sitemap_candidates_without_robots(scraper, site):
+    """Bez Sitemap: v robots.txt se zkusí obvyklá umístění - stačí první nalezené"""
+    base, shop = site
+    shop.pages['/robots.txt'] = b'User-agent: *\n'
+    shop.pages['/sitemap_index.xml'] = sitemap_index([f'{base}/jina.xml'])
+    shop.pages['/jina.xml'] = urlset([(base + '/jina-produkt-999/', None)])
+    assert scraper.discover_from_sitemaps() == len(shop.products)
+    assert base + '/jina-produkt-999/' not in scraper.all_product_urls
+
+def test_broken_sitemap_keeps_parsed_entries(scraper, site):
+    base, shop = site
+    body = urlset([(base + item['url'], None) for item in shop.products])
+    shop.pages['/rozbita.xml'] = body[:body.index(b'</url>', len(body) // 2) + 6] + b'<url><loc>'
+    entries = list(scraper.iter_sitemap(base + '/rozbita.xml'))
+    assert entries and all(kind == 'url' for kind, _, _ in entries)
+    assert [loc for _, loc, _ in entries] == [base + item['url'] for item in shop.products[:len(entries)]]
+
+def test_missing_sitemap(scraper, site):
+    base, shop = site
+    shop.pages['/robots.txt'] = b'User-agent: *\n'
+    del shop.pages['/sitemap.xml']
+    assert scraper.discover_from_sitemaps() == 0 and not scraper.all_product_urls
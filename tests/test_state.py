@@ -0,0 +1,86 @@
+"""Stav crawlu v STATE_DB - záznam a značky zpracování v jednom commitu,
+odkládání fronty FÁZE 1 do dočasného souboru"""
+
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+from conftest import BASE_URL
+
+class CommitProbe:
+    """Spojení CrawlState, které při každém commitu zjistí, co je v DB vidět"""
+
+    def __init__(self, conn, path):
+        self.conn = conn
+        self.path = path
+        self.seen = []
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
+
+    def commit(self):
+        self.conn.commit()
+        with sqlite3.connect(self.path) as other:
+            self.seen.append((other.execute('SELECT COUNT(*) FROM products').fetchone()[0],
+                              other.execute('SELECT COUNT(*) FROM processed').fetchone()[0]))
+
+def test_record_and_processed_commit_together(scraper, tmp_path):
+    path = str(tmp_path / 'stav.sqlite')
+    scraper.configure(STATE_DB=path, STATE_BATCH=2)
+    scraper.prepare_frontier()
+    scraper.prepare_products()
+    scraper.attach_crawl_state()
+    probe = scraper.crawl_state.conn = CommitProbe(scraper.crawl_state.conn, path)
+    for i in range(7):
+        # Detail s jinou rel=canonical - zapisuje se i kanonická URL
+        scraper.record_product(f'https://www.shop.cz/p{i}/?varianta=1',
+                               dict(scraper.empty_record(f'https://www.shop.cz/p{i}/'), nazev=f'P{i}'))
+    scraper.crawl_state.commit()
+    # Po pádu kdykoli mezi commity pokračování neuvidí záznam bez značek zpracování
+    assert probe.seen and all(processed == 2 * products for products, processed in probe.seen)
+    assert probe.seen[-1] == (7, 14)
+    probe.conn.close()
+
+@pytest.fixture
+def spill_dir(tmp_path, monkeypatch):
+    """Dočasné soubory přetečení fronty do vlastního adresáře"""
+    directory = tmp_path / 'tmp'
+    directory.mkdir()
+    monkeypatch.setattr(tempfile, 'tempdir', str(directory))
+    return directory
+
+def open_fds():
+    return len(os.listdir('/proc/self/fd')) if os.path.isdir('/proc/self/fd') else 0
+
+def test_frontier_spill_is_removed_on_clear(scraper, spill_dir):
+    fds = open_fds()
+    frontier = scraper.CrawlFrontier(memory_limit=3)
+    urls = [f'{BASE_URL}/kategorie-{i}/' for i in range(10)]
+    frontier.update(urls)
+    assert frontier.stored == 7 and os.listdir(spill_dir)
+    assert [frontier.pop()[0] for _ in range(4)] == urls[:4]
+    frontier.clear()
+    assert not frontier and os.listdir(spill_dir) == []
+    # mkstemp nenechá otevřený deskriptor
+    assert open_fds() == fds
+
+def test_reset_state_removes_frontier_spill(scraper, spill_dir):
+    scraper.pages_to_visit = scraper.CrawlFrontier(memory_limit=1)
+    scraper.pages_to_visit.update(f'{BASE_URL}/kategorie-{i}/' for i in range(3))
+    assert os.listdir(spill_dir)
+    scraper.reset_state()
+    assert os.listdir(spill_dir) == []
+
+def test_state_db_takes_over_spilled_frontier(scraper, spill_dir, tmp_path):
+    """Fronta přejde do STATE_DB, dočasný soubor zmizí"""
+    urls = [f'{BASE_URL}/kategorie-{i}/' for i in range(5)]
+    scraper.configure(STATE_DB=str(tmp_path / 'stav.sqlite'))
+    scraper.pages_to_visit = scraper.CrawlFrontier(memory_limit=2)
+    scraper.pages_to_visit.update(urls)
+    scraper.prepare_frontier()
+    scraper.prepare_products()
+    scraper.attach_crawl_state()
+    assert os.listdir(spill_dir) == []
+    assert [scraper.pages_to_visit.pop()[0] for _ in range(5)] == urls
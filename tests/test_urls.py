@@ -0,0 +1,67 @@
+"""Kanonizace a klasifikace URL"""
+
+import pytest
+
+from conftest import BASE_URL
+
+@pytest.mark.parametrize('url, product, expected', [
+    # Schéma, host a www. podle BASE_URL, bez výchozího portu a fragmentu
+    ('http://shop.cz/protein/', False, 'https://www.shop.cz/protein/'),
+    ('HTTPS://WWW.SHOP.CZ:443/protein/#recenze', False, 'https://www.shop.cz/protein/'),
+    # Sledovací parametry pryč, ostatní seřazené
+    ('https://www.shop.cz/protein/?utm_source=x&b=2&a=1&fbclid=y', False, 'https://www.shop.cz/protein/?a=1&b=2'),
+    ('https://www.shop.cz/protein/?utm_campaign=&gclid=1', False, 'https://www.shop.cz/protein/'),
+    # Parametry variant jen u produktů
+    ('https://www.shop.cz/protein/?variant=5', True, 'https://www.shop.cz/protein/'),
+    ('https://www.shop.cz/protein/?variant=5', False, 'https://www.shop.cz/protein/?variant=5'),
+    # Cizí web zůstane cizí
+    ('http://other.cz/protein/', False, 'http://other.cz/protein/'),
+    ('https://www.shop.cz', False, 'https://www.shop.cz/'),
+])
+def test_canonical_url(scraper, url, product, expected):
+    assert scraper.canonical_url(url, product=product) == expected
+
+def test_canonical_url_trailing_slash_auto(scraper):
+    """'auto' - platí první viděná podoba cesty s lomítkem i bez něj"""
+    assert scraper.canonical_url(f'{BASE_URL}/protein') == f'{BASE_URL}/protein'
+    assert scraper.canonical_url(f'{BASE_URL}/protein/') == f'{BASE_URL}/protein'
+    assert scraper.canonical_url(f'{BASE_URL}/kreatin/') == f'{BASE_URL}/kreatin/'
+    assert scraper.canonical_url(f'{BASE_URL}/kreatin') == f'{BASE_URL}/kreatin/'
+
+def test_canonical_forms_keep_only_fingerprints(scraper):
+    scraper.TRAILING_SLASH = 'auto'
+    for i in range(200):
+        scraper.canonical_url(f'{BASE_URL}/kategorie-{i}/')
+        scraper.canonical_url(f'{BASE_URL}/kategorie-{i}')
+    assert len(scraper.canonical_forms) == 200
+    assert all(type(k) is int and type(v) is bool for k, v in scraper.canonical_forms.items())
+    assert scraper.canonical_url(f'{BASE_URL}/kategorie-7') == f'{BASE_URL}/kategorie-7/'
+
+@pytest.mark.parametrize('mode, expected', [
+    ('add', 'https://www.shop.cz/protein/'),
+    ('strip', 'https://www.shop.cz/protein'),
+    ('keep', 'https://www.shop.cz/protein'),
+])
+def test_canonical_url_trailing_slash_modes(scraper, mode, expected):
+    scraper.configure(TRAILING_SLASH=mode)
+    assert scraper.canonical_url('https://www.shop.cz/protein') == expected
+    # Soubory lomítko nedostanou
+    assert scraper.canonical_url('https://www.shop.cz/a/obrazek.jpg') == 'https://www.shop.cz/a/obrazek.jpg'
+
+def test_url_classifier_matches_linear(scraper, shop):
+    """Zkompilovaný klasifikátor = původní lineární průchod vzory"""
+    urls = [BASE_URL + path for path in shop.pages]
+    urls += [BASE_URL + path for path in scraper.PRODUCT_URL_EXCLUDE + scraper.CATEGORY_URL_EXCLUDE]
+    urls += [BASE_URL + path.upper() + '/x' for path in scraper.PRODUCT_URL_EXCLUDE]
+    urls += [f'{BASE_URL}/produkt?a=1?b=2', f'{BASE_URL}/abc', 'https://other.cz/produkt-123/',
+             'mailto:info@shop.cz', 'javascript:void(0)', '']
+    assert [scraper.url_classifier.is_product(url) for url in urls] == \
+           [scraper.is_product_url_linear(url) for url in urls]
+    assert all(scraper.is_product_url(BASE_URL + item['url']) for item in shop.products)
+
+def test_url_classifier_domain_rules(scraper):
+    scraper.configure(DOMAIN_URL_RULES={'shop.cz': {'product_exclude': ['/akce-'],
+                                                     'product_pattern': r'-p\d+/?$'}})
+    assert scraper.is_product_url(f'{BASE_URL}/protein-p12/')
+    assert not scraper.is_product_url(f'{BASE_URL}/protein/')
+    assert not scraper.is_product_url(f'{BASE_URL}/akce-protein-p12/')